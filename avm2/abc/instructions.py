@@ -1,20 +1,103 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, fields
-from typing import Any, Callable, ClassVar, Dict, Tuple, Type, TypeVar, NewType, Optional
+from typing import TYPE_CHECKING, Any, Callable, ClassVar, Dict, List, Tuple, Type, TypeVar, NewType, Optional
 
-import avm2.vm
-from avm2.exceptions import ASReturnException, ASJumpException
-from avm2.runtime import undefined
+from avm2.exceptions import ASThrowException
+from avm2.runtime import ASObject, Shape, undefined
 from avm2.abc.parser import read_array
+from avm2.abc.types import ABCScriptIndex
 from avm2.io import MemoryViewReader
-from avm2.abc.enums import MultinameKind
+
+if TYPE_CHECKING:
+    import avm2.verifier
+    import avm2.vm
 
 
 def read_instruction(reader: MemoryViewReader) -> Instruction:
-    # noinspection PyCallingNonCallable
-    return opcode_to_instruction[reader.read_u8()](reader)
+    return opcode_to_decoder[reader.read_u8()](reader)
+
+
+def decode_code(code: memoryview) -> DecodedCode:
+    """
+    Read all the instructions of a method body.
+    """
+    reader = MemoryViewReader(code)
+    buffer = reader.buffer
+    size = len(buffer)
+    decoders = opcode_to_decoder
+    instructions: List[Instruction] = []
+    offsets: List[int] = []
+    # This is `read_instruction` inlined, since it is the hottest loop of loading.
+    while reader.position < size:
+        position = reader.position
+        offsets.append(position)
+        reader.position = position + 1
+        instructions.append(decoders[buffer[position]](reader))
+    offsets.append(reader.position)  # the end offset of the last instruction
+    return DecodedCode(
+        instructions=instructions,
+        offsets=offsets,
+        offset_to_index={offset: index for index, offset in enumerate(offsets)},
+        handlers=[instruction.execute for instruction in instructions],
+    )
+
 
+@dataclass
+class DecodedCode:
+    """
+    Method body code which is read once and then executed many times.
+    """
+
+    instructions: List[Instruction]
+    offsets: List[int]  # instruction index to its byte offset, plus the end offset of the code
+    offset_to_index: Dict[int, int]  # byte offset to instruction index
+    handlers: List[Handler]  # threaded code: bound `execute` methods of the instructions
+    verification: Optional[avm2.verifier.Verification] = None  # set if the code has passed the verification
+    fused: Optional[DecodedCode] = None  # the code with superinstructions for the interpreter, see `avm2.fusion`
+
+    # Set if instructions have been removed or replaced, see `avm2.peephole`.
+    source_offsets: Optional[List[int]] = None  # instruction index to its byte offset in the original code
+    line_numbers: Optional[List[Optional[int]]] = None  # instruction index to the line of the preceding `debugline`
+    # Instruction index to the original instructions which it does the work of, including the removed ones.
+    source_instructions: Optional[List[Tuple[Instruction, ...]]] = None
+
+    def get_jump_index(self, index: int, offset: int) -> int:
+        """
+        Get index of the instruction which is `offset` bytes after the end of the instruction at `index`.
+        """
+        return self.offset_to_index[self.offsets[index + 1] + offset]
+
+    def get_source_offset(self, index: int) -> int:
+        """
+        Get the byte offset of the instruction in the original code.
+        """
+        return self.offsets[index] if self.source_offsets is None else self.source_offsets[index]
+
+    def get_source_instructions(self, index: int) -> Tuple[Instruction, ...]:
+        """
+        Get the original instructions which the instruction stands for.
+        """
+        return (self.instructions[index],) if self.source_instructions is None else self.source_instructions[index]
+
+    def get_line_number(self, index: int) -> Optional[int]:
+        """
+        Get the source line of the instruction, `None` if the code has no debug information.
+        """
+        if self.line_numbers is not None:
+            return self.line_numbers[index]
+        for instruction in reversed(self.instructions[:index + 1]):
+            if isinstance(instruction, DebugLine):
+                return instruction.linenum
+        return None
+
+
+# Returned by `Instruction.execute` to return from the method. It is out of `s24` range,
+# so it could never be confused with a jump offset.
+RETURN = -0x1000000
+
+# Returned by the call instructions when the callee must be interpreted, see `VirtualMachine.call_from`.
+CALL = RETURN - 1
 
 u8 = NewType('u8', int)
 u30 = NewType('u30', int)
@@ -27,7 +110,7 @@ class Instruction:
     readers: ClassVar[Dict[str, Callable[[MemoryViewReader], Any]]] = {
         u8.__name__: MemoryViewReader.read_u8,
         u30.__name__: MemoryViewReader.read_int,
-        uint.__name__: MemoryViewReader.read_u32,
+        uint.__name__: MemoryViewReader.read_int,
         s24.__name__: MemoryViewReader.read_s24,
     }
 
@@ -36,21 +119,138 @@ class Instruction:
             setattr(self, field.name, self.readers[field.type](reader))
 
     def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment) -> Optional[int]:
+        """
+        Execute the instruction and get where to continue:
+
+        - `None` means the next instruction,
+        - an integer is a jump offset in bytes relative to the end of the instruction,
+        - `RETURN` means return from the method, the return value is in `environment.return_value`,
+        - `CALL` means enter the callee frame in `machine.pending_frame`, its return value is then pushed
+          onto the operand stack, and the execution continues with the next instruction.
+        """
         raise NotImplementedError(self)
 
 
 T = TypeVar('T', bound=Instruction)
+Handler = Callable[['avm2.vm.VirtualMachine', 'avm2.vm.MethodEnvironment'], Optional[int]]
+Decoder = Callable[[MemoryViewReader], Instruction]
 opcode_to_instruction: Dict[int, Type[T]] = {}
+opcode_to_decoder: Dict[int, Decoder] = {}
 
 
 def instruction(opcode: int) -> Callable[[], Type[T]]:
     def wrapper(class_: Type[T]) -> Type[T]:
         assert opcode not in opcode_to_instruction, opcode_to_instruction[opcode]
+        class_ = dataclass(init=False)(class_)
         opcode_to_instruction[opcode] = class_
-        return dataclass(init=False)(class_)
+        opcode_to_decoder[opcode] = make_decoder(class_)
+        return class_
     return wrapper
 
 
+def make_decoder(class_: Type[T]) -> Decoder:
+    """
+    Generate a function which reads the instruction operands without looking up the field types.
+    """
+    if class_.__init__ is not Instruction.__init__:
+        # The instruction reads itself.
+        return class_
+    fields_ = fields(class_)
+    if not fields_:
+        # Instructions without operands are immutable, so all of them could share the same instance.
+        instance = class_.__new__(class_)
+        return lambda reader: instance
+    lines = [
+        f'def decode_{class_.__name__}(reader):',
+        f'    instruction = new(class_)',
+        f'    buffer = reader.buffer',
+    ]
+    for field in fields_:
+        if field.type == u8.__name__:
+            lines.append(f'    instruction.{field.name} = buffer[reader.position]')
+            lines.append(f'    reader.position += 1')
+        elif field.type in (u30.__name__, uint.__name__):
+            # Fast path for one-byte values which are the most common ones.
+            lines.append(f'    value = buffer[reader.position]')
+            lines.append(f'    if value < 0x80:')
+            lines.append(f'        reader.position += 1')
+            lines.append(f'    else:')
+            lines.append(f'        value = read_{field.type}(reader)')
+            lines.append(f'    instruction.{field.name} = value')
+        else:
+            lines.append(f'    instruction.{field.name} = read_{field.type}(reader)')
+    lines.append('    return instruction')
+    namespace = {f'read_{type_}': read for type_, read in Instruction.readers.items()}
+    namespace.update(new=object.__new__, class_=class_)
+    exec('\n'.join(lines), namespace)
+    return namespace[f'decode_{class_.__name__}']
+
+
+# Inline cache of `ScopeLookup`.
+ScopeCache = Tuple[int, int, ASObject, int, Tuple[Shape, ...], Optional[ABCScriptIndex]]
+
+
+class ScopeLookup(Instruction):
+    """
+    Base of the instructions which search the scope stack for a property with a qualified name.
+
+    Each instruction has an inline cache of its last lookup: the scope stack size, the depth and the object
+    which had the property, the property slot index and the shapes of the objects above, which did not have it.
+    Shapes only grow, so the slot index stays valid for the same object.
+
+    The decoded code is shared by the virtual machines of a program, while the cached objects belong to a heap.
+    So the caches are kept by the virtual machine, `VirtualMachine.scope_caches`, indexed by the lookup site,
+    which the program assigns when it decodes the code, see `Program.get_scope_lookup_site`.
+    Instructions decoded elsewhere have no site and are not cached.
+
+    A property which is not found on the scope stack is looked up in the script objects,
+    see `VirtualMachine.find_global_property`. Such a lookup is cached with the depth -1, the script index,
+    and the shapes of all the scope objects. The script object is checked by identity,
+    since it is created again if its initialisation fails, and on `VirtualMachine.reset`.
+    """
+
+    index: u30
+    site = None  # not a field: set for each instruction by the program
+
+    def find_property(self, machine: avm2.vm.VirtualMachine, scope_stack: List[ASObject]) -> Tuple[ASObject, int]:
+        """
+        Find the object which has the property and get the object along with the property slot index.
+        """
+        cache = machine.scope_caches.get(self.site)
+        if cache is not None:
+            size, depth, object_, slot, shapes, script_index = cache
+            if len(scope_stack) == size and (
+                scope_stack[depth] is object_ if script_index is None
+                else machine.script_objects.get(script_index) is object_
+            ):
+                for shape_depth, shape in enumerate(shapes, depth + 1):
+                    if scope_stack[shape_depth].shape is not shape:
+                        break
+                else:
+                    machine.inline_cache_hits += 1
+                    return object_, slot
+        machine.inline_cache_misses += 1
+
+        key = machine.resolved_names[self.index].qname
+        # TODO: other kinds of multinames.
+        assert key is not None, machine.resolved_names[self.index]
+        for depth in range(len(scope_stack) - 1, -1, -1):
+            object_ = scope_stack[depth]
+            slot = object_.shape.slots.get(key)
+            if slot is not None:
+                if self.site is not None:
+                    shapes = tuple(scope_object.shape for scope_object in scope_stack[depth + 1:])
+                    machine.scope_caches[self.site] = (len(scope_stack), depth, object_, slot, shapes, None)
+                return object_, slot
+        # Before the script initialisation, which might add the property to the scope objects.
+        shapes = tuple(scope_object.shape for scope_object in scope_stack)
+        object_, slot = machine.find_global_property(key)
+        if self.site is not None:
+            script_index = machine.name_to_script[key]
+            machine.scope_caches[self.site] = (len(scope_stack), -1, object_, slot, shapes, script_index)
+        return object_, slot
+
+
 # Instructions implementation.
 # ----------------------------------------------------------------------------------------------------------------------
 
@@ -76,6 +276,11 @@ class AddInteger(Instruction):
         environment.operand_stack.append(int(value_1) + int(value_2))
 
 
+@instruction(83)
+class ApplyType(Instruction):
+    arg_count: u30
+
+
 @instruction(134)
 class AsType(Instruction):
     index: u30
@@ -140,6 +345,16 @@ class CallStatic(Instruction):
     index: u30
     arg_count: u30
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment) -> Optional[int]:
+        operand_stack = environment.operand_stack
+        if self.arg_count:
+            args = operand_stack[-self.arg_count:]
+            del operand_stack[-self.arg_count:]
+        else:
+            args = []
+        receiver = operand_stack.pop()
+        return machine.call_from(environment, self.index, receiver, args)
+
 
 @instruction(69)
 class CallSuper(Instruction):
@@ -185,7 +400,7 @@ class ConstructProp(Instruction):
 
 
 @instruction(73)
-class Construct(Instruction):
+class ConstructSuper(Instruction):
     arg_count: u30
 
 
@@ -332,7 +547,7 @@ class FindProperty(Instruction):
 
 
 @instruction(93)
-class FindPropStrict(Instruction):
+class FindPropStrict(ScopeLookup):
     """
     `index` is a `u30` that must be an index into the `multiname` constant pool. If the multiname at
     that index is a runtime multiname the name and/or namespace will also appear on the stack
@@ -354,19 +569,8 @@ class FindPropStrict(Instruction):
     index: u30
 
     def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
-        multiname = machine.multinames[self.index]
-        # TODO: other kinds of multinames.
-        assert multiname.kind in (MultinameKind.Q_NAME, MultinameKind.Q_NAME_A), multiname
-        try:
-            object_, _, _ = machine.resolve_multiname(
-                environment.scope_stack,
-                machine.strings[multiname.name_index],
-                [machine.strings[machine.namespaces[multiname.namespace_index].name_index]],
-            )
-        except KeyError:
-            raise NotImplementedError('ReferenceError')
-        else:
-            environment.operand_stack.append(object_)
+        object_, _ = self.find_property(machine, environment.scope_stack)
+        environment.operand_stack.append(object_)
 
 
 @instruction(89)
@@ -376,7 +580,13 @@ class GetDescendants(Instruction):
 
 @instruction(100)
 class GetGlobalScope(Instruction):
-    pass
+    """
+    Gets the global scope object from the scope chain, and pushes it onto the stack. The global
+    scope object is the object at the bottom of the scope chain.
+    """
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        environment.operand_stack.append(environment.scope_stack[0])
 
 
 @instruction(110)
@@ -385,7 +595,7 @@ class GetGlobalSlot(Instruction):
 
 
 @instruction(96)
-class GetLex(Instruction):
+class GetLex(ScopeLookup):
     """
     `index` is a `u30` that must be an index into the multiname constant pool. The multiname at
     `index` must not be a runtime multiname, so there are never any optional namespace or name
@@ -402,18 +612,8 @@ class GetLex(Instruction):
     index: u30
 
     def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
-        multiname = machine.multinames[self.index]
-        assert multiname.kind in (MultinameKind.Q_NAME, MultinameKind.Q_NAME_A)
-        try:
-            object_, name, namespace = machine.resolve_multiname(
-                environment.scope_stack,
-                machine.strings[multiname.name_index],
-                [machine.strings[machine.namespaces[multiname.namespace_index].name_index]],
-            )
-        except KeyError:
-            raise NotImplementedError('ReferenceError')
-        else:
-            environment.operand_stack.append(object_.properties[namespace, name])
+        object_, slot = self.find_property(machine, environment.scope_stack)
+        environment.operand_stack.append(object_.values[slot])
 
 
 @instruction(98)
@@ -511,8 +711,20 @@ class HasNext2(Instruction):
 
 @instruction(19)
 class IfEq(Instruction):
+    """
+    Compute `value1 == value2` using the abstract equality comparison algorithm in ECMA-262
+    section 11.9.3 and ECMA-347 section 11.5.1. If the result of the comparison is `true`, jump the
+    number of bytes indicated by `offset`. Otherwise continue executing code from this point.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value_2 = environment.operand_stack.pop()
+        value_1 = environment.operand_stack.pop()
+        if value_1 == value_2:
+            return self.offset
+
 
 @instruction(18)
 class IfFalse(Instruction):
@@ -525,23 +737,59 @@ class IfFalse(Instruction):
 
     def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
         if not environment.operand_stack.pop():
-            raise ASJumpException(self.offset)
+            return self.offset
 
 
 @instruction(24)
 class IfGE(Instruction):
+    """
+    Compute `value1 < value2` using the abstract relational comparison algorithm in ECMA-262
+    section 11.8.5. If the result of the comparison is `false`, jump the number of bytes indicated
+    by `offset`. Otherwise continue executing code from this point.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value_2 = environment.operand_stack.pop()
+        value_1 = environment.operand_stack.pop()
+        if value_1 >= value_2:
+            return self.offset
+
 
 @instruction(23)
 class IfGT(Instruction):
+    """
+    Compute `value2 < value1` using the abstract relational comparison algorithm in ECMA-262
+    section 11.8.5. If the result of the comparison is `true`, jump the number of bytes indicated
+    by `offset`. Otherwise continue executing code from this point.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value_2 = environment.operand_stack.pop()
+        value_1 = environment.operand_stack.pop()
+        if value_1 > value_2:
+            return self.offset
+
 
 @instruction(22)
 class IfLE(Instruction):
+    """
+    Compute `value2 < value1` using the abstract relational comparison algorithm in ECMA-262
+    section 11.8.5. If the result of the comparison is `false`, jump the number of bytes indicated
+    by `offset`. Otherwise continue executing code from this point.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value_2 = environment.operand_stack.pop()
+        value_1 = environment.operand_stack.pop()
+        if value_1 <= value_2:
+            return self.offset
+
 
 @instruction(21)
 class IfLT(Instruction):
@@ -559,13 +807,26 @@ class IfLT(Instruction):
         value_2 = environment.operand_stack.pop()
         value_1 = environment.operand_stack.pop()
         if value_1 < value_2:
-            raise ASJumpException(self.offset)
+            return self.offset
 
 
 @instruction(15)
 class IfNGE(Instruction):
+    """
+    Compute `value1 < value2` using the abstract relational comparison algorithm in ECMA-262
+    section 11.8.5. If the result of the comparison is not `false`, jump the number of bytes
+    indicated by `offset`. Otherwise continue executing code from this point.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value_2 = environment.operand_stack.pop()
+        value_1 = environment.operand_stack.pop()
+        # FIXME: NaN.
+        if not value_1 >= value_2:
+            return self.offset
+
 
 @instruction(14)
 class IfNGT(Instruction):
@@ -582,13 +843,26 @@ class IfNGT(Instruction):
         value_1 = environment.operand_stack.pop()
         # FIXME: NaN.
         if not value_1 > value_2:
-            raise ASJumpException(self.offset)
+            return self.offset
 
 
 @instruction(13)
 class IfNLE(Instruction):
+    """
+    Compute `value2 < value1` using the abstract relational comparison algorithm in ECMA-262
+    section 11.8.5. If the result of the comparison is `true` or `undefined`, jump the number of
+    bytes indicated by `offset`. Otherwise continue executing code from this point.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value_2 = environment.operand_stack.pop()
+        value_1 = environment.operand_stack.pop()
+        # FIXME: NaN.
+        if not value_1 <= value_2:
+            return self.offset
+
 
 @instruction(12)
 class IfNLT(Instruction):
@@ -610,13 +884,25 @@ class IfNLT(Instruction):
         value_1 = environment.operand_stack.pop()
         # FIXME: NaN.
         if not value_1 < value_2:
-            raise ASJumpException(self.offset)
+            return self.offset
 
 
 @instruction(20)
 class IfNE(Instruction):
+    """
+    Compute `value1 == value2` using the abstract equality comparison algorithm in ECMA-262
+    section 11.9.3 and ECMA-347 section 11.5.1. If the result of the comparison is `false`, jump the
+    number of bytes indicated by `offset`. Otherwise continue executing code from this point.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value_2 = environment.operand_stack.pop()
+        value_1 = environment.operand_stack.pop()
+        if value_1 != value_2:
+            return self.offset
+
 
 @instruction(25)
 class IfStrictEq(Instruction):
@@ -630,8 +916,17 @@ class IfStrictNE(Instruction):
 
 @instruction(17)
 class IfTrue(Instruction):
+    """
+    Pop value off the stack and convert it to a `Boolean`. If the converted value is `true`, jump the
+    number of bytes indicated by `offset`. Otherwise continue executing code from this point.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        if environment.operand_stack.pop():
+            return self.offset
+
 
 @instruction(180)
 class In(Instruction):
@@ -660,8 +955,25 @@ class IncrementInteger(Instruction):
 
 @instruction(104)
 class InitProperty(Instruction):
+    """
+    `index` is a `u30` that must be an index into the `multiname` constant pool.
+
+    The value to assign is popped off the stack. If the multiname at `index` is a runtime multiname,
+    the name and/or namespace will also appear on the stack. The object is then popped off the stack.
+
+    The property with the name specified by the multiname at `index` is resolved in the object, and set
+    to the value. This is used to initialize properties in the initializer method, including the `const` ones.
+    """
+
     index: u30
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value = environment.operand_stack.pop()
+        key = machine.resolved_names[self.index].qname
+        # TODO: runtime multinames.
+        assert key is not None, machine.resolved_names[self.index]
+        environment.operand_stack.pop().set_property(key, value)
+
 
 @instruction(177)
 class InstanceOf(Instruction):
@@ -680,8 +992,15 @@ class IsTypeLate(Instruction):
 
 @instruction(16)
 class Jump(Instruction):
+    """
+    Jump the number of bytes indicated by `offset`.
+    """
+
     offset: s24
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        return self.offset
+
 
 @instruction(8)
 class Kill(Instruction):
@@ -703,6 +1022,31 @@ class LessThan(Instruction):
     pass
 
 
+@instruction(53)
+class LoadInteger8(Instruction):
+    pass
+
+
+@instruction(54)
+class LoadInteger16(Instruction):
+    pass
+
+
+@instruction(55)
+class LoadInteger32(Instruction):
+    pass
+
+
+@instruction(56)
+class LoadFloat32(Instruction):
+    pass
+
+
+@instruction(57)
+class LoadFloat64(Instruction):
+    pass
+
+
 @instruction(27)
 class LookupSwitch(Instruction):
     default_offset: s24
@@ -762,8 +1106,20 @@ class NewCatch(Instruction):
 
 @instruction(88)
 class NewClass(Instruction):
+    """
+    `index` is a `u30` that is an index of the `ClassInfo` that is to be created. `basetype` must be the
+    base class of the class being created, or `null` if there is no base class.
+
+    The class that is represented by the `ClassInfo` at `index` is created. Once the class has been created,
+    the static initializer of the class is executed. The new class object, `newclass`, will be pushed onto the stack.
+    """
+
     index: u30
 
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        environment.operand_stack.pop()  # TODO: base type.
+        environment.operand_stack.append(machine.new_class(self.index))
+
 
 @instruction(64)
 class NewFunction(Instruction):
@@ -807,7 +1163,12 @@ class Pop(Instruction):
 
 @instruction(29)
 class PopScope(Instruction):
-    pass
+    """
+    Pop the top object off of the scope stack and discard it.
+    """
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        environment.scope_stack.pop()
 
 
 @instruction(36)
@@ -866,7 +1227,12 @@ class PushNaN(Instruction):
 
 @instruction(32)
 class PushNull(Instruction):
-    pass
+    """
+    Push the `null` value onto the stack.
+    """
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        environment.operand_stack.append(None)
 
 
 @instruction(48)
@@ -925,7 +1291,8 @@ class ReturnValue(Instruction):
 
     def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
         # FIXME: coerce to the expected return type.
-        raise ASReturnException(environment.operand_stack.pop())
+        environment.return_value = environment.operand_stack.pop()
+        return RETURN
 
 
 @instruction(71)
@@ -936,7 +1303,8 @@ class ReturnVoid(Instruction):
     """
 
     def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
-        raise ASReturnException(undefined)
+        environment.return_value = undefined
+        return RETURN
 
 
 @instruction(166)
@@ -998,6 +1366,46 @@ class SetSuper(Instruction):
     index: u30
 
 
+@instruction(80)
+class SignExtend1(Instruction):
+    pass
+
+
+@instruction(81)
+class SignExtend8(Instruction):
+    pass
+
+
+@instruction(82)
+class SignExtend16(Instruction):
+    pass
+
+
+@instruction(58)
+class StoreInteger8(Instruction):
+    pass
+
+
+@instruction(59)
+class StoreInteger16(Instruction):
+    pass
+
+
+@instruction(60)
+class StoreInteger32(Instruction):
+    pass
+
+
+@instruction(61)
+class StoreFloat32(Instruction):
+    pass
+
+
+@instruction(62)
+class StoreFloat64(Instruction):
+    pass
+
+
 @instruction(172)
 class StrictEquals(Instruction):
     pass
@@ -1029,7 +1437,13 @@ class Swap(Instruction):
 
 @instruction(3)
 class Throw(Instruction):
-    pass
+    """
+    Pop `value` off of the stack and throw it. `value` is thrown as an exception
+    which can be caught by an exception handler.
+    """
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        raise ASThrowException(environment.operand_stack.pop())
 
 
 @instruction(149)
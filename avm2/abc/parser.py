@@ -1,10 +1,11 @@
 from __future__ import annotations
 
-from typing import Callable, List, Optional, TypeVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, TypeVar, Union, overload
 
 from avm2.io import MemoryViewReader
 
 T = TypeVar('T')
+R = TypeVar('R')
 
 
 def read_string(reader: MemoryViewReader) -> str:
@@ -25,3 +26,85 @@ def read_array_with_default(reader: MemoryViewReader, read: Callable[[MemoryView
     Read variable-length array where 0-th element has a "special meaning".
     """
     return [default, *(read(reader) for _ in range(1, reader.read_int()))]
+
+
+def skip_array(reader: MemoryViewReader, skip: Callable[[MemoryViewReader], None], size: Optional[int] = None):
+    """
+    Skip variable-length array.
+    """
+    if size is None:
+        size = reader.read_int()
+    for _ in range(size):
+        skip(reader)
+
+
+def read_lazy_array(
+    reader: MemoryViewReader,
+    read: Callable[[MemoryViewReader], T],
+    skip: Callable[[MemoryViewReader], None],
+    size: Optional[int] = None,
+) -> LazyArray[T]:
+    """
+    Skip variable-length array remembering its items offsets, so that the items could be read later.
+    """
+    if size is None:
+        size = reader.read_int()
+    offsets = []
+    for _ in range(size):
+        offsets.append(reader.position)
+        skip(reader)
+    return LazyArray(reader.buffer, offsets, read)
+
+
+class LazyArray(Sequence[T]):
+    """
+    Array which items are read from the buffer on first access.
+    """
+
+    def __init__(self, buffer: memoryview, offsets: List[int], read: Callable[[MemoryViewReader], T]):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.read = read
+        self.items: List[Optional[T]] = [None] * len(offsets)
+
+    def __repr__(self) -> str:
+        return f'LazyArray(size={len(self.offsets)!r}, loaded={self.loaded_count!r})'
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Loaded items are not pickled, they are read again from the buffer after unpickling.
+        return {'buffer': self.buffer, 'offsets': self.offsets, 'read': self.read}
+
+    def __setstate__(self, state: Dict[str, Any]):
+        self.__init__(**state)
+
+    @overload
+    def __getitem__(self, index: int) -> T: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[T]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[T, List[T]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        item = self.items[index]
+        if item is None:
+            item = self.items[index] = self.peek(index, self.read)
+        return item
+
+    def __iter__(self) -> Iterator[T]:
+        return (self[index] for index in range(len(self)))
+
+    @property
+    def loaded_count(self) -> int:
+        return sum(item is not None for item in self.items)
+
+    def peek(self, index: int, read: Callable[[MemoryViewReader], R]) -> R:
+        """
+        Read something from the item offset without loading the item.
+        """
+        reader = MemoryViewReader(self.buffer)
+        reader.position = self.offsets[index]
+        return read(reader)
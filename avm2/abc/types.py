@@ -3,7 +3,7 @@ from __future__ import annotations
 import math
 from dataclasses import dataclass
 from functools import partial
-from typing import Optional, List, Union, NewType
+from typing import Optional, List, Sequence, Union, NewType
 
 from avm2.abc.enums import (
     ClassFlags,
@@ -14,7 +14,7 @@ from avm2.abc.enums import (
     TraitAttributes,
     TraitKind,
 )
-from avm2.abc.parser import read_array, read_array_with_default, read_string
+from avm2.abc.parser import read_array, read_array_with_default, read_lazy_array, read_string, skip_array
 from avm2.io import MemoryViewReader
 
 ABCStringIndex = NewType('ABCStringIndex', int)
@@ -33,24 +33,36 @@ class ABCFile:
     minor_version: int
     major_version: int
     constant_pool: ASConstantPool
-    methods: List[ASMethod]
-    metadata: List[ASMetadata]
-    instances: List[ASInstance]
-    classes: List[ASClass]
-    scripts: List[ASScript]
-    method_bodies: List[ASMethodBody]
-
-    def __init__(self, reader: MemoryViewReader):
+    methods: Sequence[ASMethod]
+    metadata: Sequence[ASMetadata]
+    instances: Sequence[ASInstance]
+    classes: Sequence[ASClass]
+    scripts: Sequence[ASScript]
+    method_bodies: Sequence[ASMethodBody]
+
+    def __init__(self, reader: MemoryViewReader, lazy: bool = False):
+        """
+        In the `lazy` mode only the constant pool is read, everything else is read on first access.
+        """
         self.minor_version = reader.read_u16()
         self.major_version = reader.read_u16()
         self.constant_pool = ASConstantPool(reader)
-        self.methods = read_array(reader, ASMethod)
-        self.metadata = read_array(reader, ASMetadata)
-        class_count = reader.read_int()
-        self.instances = read_array(reader, ASInstance, class_count)
-        self.classes = read_array(reader, ASClass, class_count)
-        self.scripts = read_array(reader, ASScript)
-        self.method_bodies = read_array(reader, ASMethodBody)
+        if lazy:
+            self.methods = read_lazy_array(reader, ASMethod, ASMethod.skip)
+            self.metadata = read_lazy_array(reader, ASMetadata, ASMetadata.skip)
+            class_count = reader.read_int()
+            self.instances = read_lazy_array(reader, ASInstance, ASInstance.skip, class_count)
+            self.classes = read_lazy_array(reader, ASClass, ASClass.skip, class_count)
+            self.scripts = read_lazy_array(reader, ASScript, ASScript.skip)
+            self.method_bodies = read_lazy_array(reader, ASMethodBody, ASMethodBody.skip)
+        else:
+            self.methods = read_array(reader, ASMethod)
+            self.metadata = read_array(reader, ASMetadata)
+            class_count = reader.read_int()
+            self.instances = read_array(reader, ASInstance, class_count)
+            self.classes = read_array(reader, ASClass, class_count)
+            self.scripts = read_array(reader, ASScript)
+            self.method_bodies = read_array(reader, ASMethodBody)
 
 
 @dataclass
@@ -150,6 +162,20 @@ class ASMethod:
         if MethodFlags.HAS_PARAM_NAMES in self.flags:
             self.param_name_indices = read_array(reader, MemoryViewReader.read_int, self.param_count)
 
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        param_count = reader.read_int()
+        reader.skip_int()  # return type
+        skip_array(reader, MemoryViewReader.skip_int, param_count)
+        reader.skip_int()  # name
+        flags = reader.read_u8()
+        if flags & MethodFlags.HAS_OPTIONAL.value:
+            for _ in range(reader.read_int()):
+                reader.skip_int()
+                reader.skip(1)
+        if flags & MethodFlags.HAS_PARAM_NAMES.value:
+            skip_array(reader, MemoryViewReader.skip_int, param_count)
+
 
 @dataclass
 class ASOptionDetail:
@@ -170,6 +196,11 @@ class ASMetadata:
         self.name_index = reader.read_int()
         self.items = read_array(reader, ASItem)
 
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        reader.skip_int()  # name
+        skip_array(reader, ASItem.skip)
+
 
 @dataclass
 class ASItem:
@@ -180,6 +211,11 @@ class ASItem:
         self.key_index = reader.read_int()
         self.value_index = reader.read_int()
 
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        reader.skip_int()
+        reader.skip_int()
+
 
 @dataclass
 class ASInstance:
@@ -201,6 +237,16 @@ class ASInstance:
         self.init_index = reader.read_int()
         self.traits = read_array(reader, ASTrait)
 
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        reader.skip_int()  # name
+        reader.skip_int()  # super name
+        if reader.read_u8() & ClassFlags.PROTECTED_NS.value:
+            reader.skip_int()
+        skip_array(reader, MemoryViewReader.skip_int)  # interfaces
+        reader.skip_int()  # init
+        skip_array(reader, ASTrait.skip)
+
 
 @dataclass
 class ASTrait:
@@ -228,6 +274,20 @@ class ASTrait:
         if TraitAttributes.METADATA in self.attributes:
             self.metadata = read_array(reader, MemoryViewReader.read_int)
 
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        reader.skip_int()  # name
+        kind = reader.read_u8()
+        reader.skip_int()  # slot, disposition or function ID
+        if kind & 0x0F in (TraitKind.SLOT, TraitKind.CONST):
+            reader.skip_int()  # type name
+            if reader.read_int():
+                reader.skip(1)  # value kind
+        else:
+            reader.skip_int()  # class, function or method index
+        if (kind >> 4) & TraitAttributes.METADATA.value:
+            skip_array(reader, MemoryViewReader.skip_int)
+
 
 @dataclass
 class ASTraitSlot:
@@ -283,6 +343,11 @@ class ASClass:
         self.init_index = reader.read_int()
         self.traits = read_array(reader, ASTrait)
 
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        reader.skip_int()  # init
+        skip_array(reader, ASTrait.skip)
+
 
 @dataclass
 class ASScript:
@@ -293,6 +358,11 @@ class ASScript:
         self.init_index = reader.read_int()
         self.traits = read_array(reader, ASTrait)
 
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        reader.skip_int()  # init
+        skip_array(reader, ASTrait.skip)
+
 
 @dataclass
 class ASMethodBody:
@@ -315,6 +385,14 @@ class ASMethodBody:
         self.exceptions = read_array(reader, ASException)
         self.traits = read_array(reader, ASTrait)
 
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        for _ in range(5):
+            reader.skip_int()  # method, max stack, local count, init and max scope depth
+        reader.skip(reader.read_int())  # code
+        skip_array(reader, ASException.skip)
+        skip_array(reader, ASTrait.skip)
+
 
 @dataclass
 class ASException:
@@ -330,3 +408,8 @@ class ASException:
         self.target = reader.read_int()
         self.exc_type_index = reader.read_int()
         self.var_name_index = reader.read_int()
+
+    @staticmethod
+    def skip(reader: MemoryViewReader):
+        for _ in range(5):
+            reader.skip_int()
@@ -0,0 +1,469 @@
+"""
+Calls a method on whole columns of arguments at once. Requires NumPy, see the `numpy` extra.
+
+A method body which consists of arithmetic, comparisons and forward branches is compiled to a function over NumPy
+arrays. Registers and stack values are arrays of the rows which are still on the same execution path.
+A conditional jump splits the rows by the condition mask, and both paths continue with the selected rows only,
+so that a path never evaluates rows which have not taken it. Each return scatters its value into the result.
+
+Arithmetic runs under `numpy.errstate(all='raise')`. Anything NumPy would disagree with Python about,
+like a division by zero or a conversion of NaN to an integer, makes the whole batch fall back to `call_method`
+per row, as does a method body which is not supported. Integer arithmetic is 64-bit and wraps around silently,
+unlike Python integers, so the integer results are checked against the bound, see `integer_operation`,
+and NaN and infinities are checked before the conversion to integers.
+"""
+
+from __future__ import annotations
+
+import math
+import operator
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple, Type
+
+import numpy
+
+import avm2.vm
+from avm2.abc.enums import MethodFlags
+from avm2.abc.instructions import (
+    Add,
+    AddInteger,
+    ConvertToBoolean,
+    ConvertToDouble,
+    ConvertToInteger,
+    DecodedCode,
+    Decrement,
+    DecrementInteger,
+    Divide,
+    Dup,
+    GetLocal,
+    GetScopeObject,
+    GreaterEquals,
+    GreaterThan,
+    IfEq,
+    IfFalse,
+    IfGE,
+    IfGT,
+    IfLE,
+    IfLT,
+    IfNE,
+    IfNGE,
+    IfNGT,
+    IfNLE,
+    IfNLT,
+    IfTrue,
+    Increment,
+    IncrementInteger,
+    Instruction,
+    Jump,
+    Kill,
+    LessEquals,
+    LessThan,
+    Multiply,
+    MultiplyInteger,
+    Negate,
+    NegateInteger,
+    Not,
+    Pop,
+    PopScope,
+    PushByte,
+    PushDouble,
+    PushFalse,
+    PushInteger,
+    PushNaN,
+    PushScope,
+    PushShort,
+    PushTrue,
+    ReturnValue,
+    SetLocal,
+    Subtract,
+    SubtractInteger,
+    Swap,
+)
+from avm2.abc.types import ABCMethodBodyIndex, ABCMethodIndex, ASMethodBody
+from avm2.compiler import get_local_instructions, no_operations, set_local_instructions
+from avm2.runtime import undefined
+
+BatchFunction = Callable[[numpy.ndarray, List[Any]], List[Tuple[numpy.ndarray, Any]]]
+
+variable_pattern = re.compile(r'\b[rt]\d+\b')
+
+# Limit of conditional jumps on all the paths, since every path is compiled separately.
+MAX_BRANCH_COUNT = 64
+
+unary_operations: Dict[Type[Instruction], str] = {
+    ConvertToBoolean: 'to_boolean({0})',
+    ConvertToDouble: 'to_double({0})',
+    ConvertToInteger: 'to_integer({0})',
+    Decrement: 'subtract({0}, 1)',
+    DecrementInteger: 'subtract(to_integer({0}), 1)',
+    Increment: 'add({0}, 1)',
+    IncrementInteger: 'add(to_integer({0}), 1)',
+    Negate: 'negate({0})',
+    NegateInteger: 'negate(to_integer({0}))',
+    Not: 'logical_not({0})',
+}
+
+binary_operations: Dict[Type[Instruction], str] = {
+    Add: 'add({0}, {1})',
+    AddInteger: 'add(to_integer({0}), to_integer({1}))',
+    Divide: '({0} / {1})',
+    GreaterEquals: '({0} >= {1})',
+    GreaterThan: '({0} > {1})',
+    LessEquals: '({0} <= {1})',
+    LessThan: '({0} < {1})',
+    Multiply: 'multiply({0}, {1})',
+    MultiplyInteger: 'multiply(to_integer({0}), to_integer({1}))',
+    Subtract: 'subtract({0}, {1})',
+    SubtractInteger: 'subtract(to_integer({0}), to_integer({1}))',
+}
+
+# The number of placeholders in a condition is the number of operands which the jump pops.
+conditional_jumps: Dict[Type[Instruction], str] = {
+    IfEq: '({0} == {1})',
+    IfFalse: 'logical_not({0})',
+    IfGE: '({0} >= {1})',
+    IfGT: '({0} > {1})',
+    IfLE: '({0} <= {1})',
+    IfLT: '({0} < {1})',
+    IfNE: '({0} != {1})',
+    IfNGE: 'logical_not({0} >= {1})',
+    IfNGT: 'logical_not({0} > {1})',
+    IfNLE: 'logical_not({0} <= {1})',
+    IfNLT: 'logical_not({0} < {1})',
+    IfTrue: '{0}',
+}
+
+
+# Integer results must be below 2^63 in magnitude. The bound has a margin for the rounding of the float estimate,
+# a result near the bound just falls back to `call_method`.
+INTEGER_BOUND = 2.0 ** 62
+
+
+def is_integral(value: Any) -> bool:
+    return numpy.asarray(value).dtype.kind in 'biu'
+
+
+def as_int64(value: Any) -> numpy.ndarray:
+    value = numpy.asarray(value)
+    if value.dtype.kind == 'u' and value.size and value.max() >= INTEGER_BOUND:
+        raise OverflowError('integer out of the 64-bit range')
+    return value.astype(numpy.int64)
+
+
+def integer_operation(operation: Callable[..., Any], *values: Any) -> numpy.ndarray:
+    """
+    Apply the operation to the integral operands as 64-bit integers. Since NumPy wraps around silently,
+    the result is estimated in floats first, and `OverflowError` is raised if it might not fit.
+    """
+    values = tuple(as_int64(value) for value in values)
+    estimate = operation(*(value.astype(numpy.float64) for value in values))
+    if numpy.any(numpy.abs(estimate) >= INTEGER_BOUND):
+        raise OverflowError('integer out of the 64-bit range')
+    return operation(*values)
+
+
+def arithmetic(operation: Callable[..., Any]) -> Callable[..., Any]:
+    """
+    Make the operation count booleans as integers, like Python does, and check the integer results.
+    """
+    def apply(*values: Any) -> Any:
+        if all(is_integral(value) for value in values):
+            return integer_operation(operation, *values)
+        return operation(*values)
+    return apply
+
+
+add = arithmetic(operator.add)
+subtract = arithmetic(operator.sub)
+multiply = arithmetic(operator.mul)
+negate = arithmetic(operator.neg)
+
+
+def to_boolean(value: Any) -> numpy.ndarray:
+    return numpy.asarray(value, dtype=bool)
+
+
+def to_double(value: Any) -> numpy.ndarray:
+    return numpy.asarray(value, dtype=numpy.float64)
+
+
+def to_integer(value: Any) -> numpy.ndarray:
+    value = numpy.asarray(value)
+    if value.dtype.kind in 'biu':
+        return as_int64(value)
+    if value.dtype.kind != 'f':
+        raise TypeError(value.dtype)
+    # `int` raises on NaN and infinities, while older NumPy converts them silently.
+    if not numpy.all(numpy.isfinite(value)):
+        raise ValueError('cannot convert NaN or infinity to integer')
+    value = numpy.trunc(value)  # like `int` does
+    if numpy.any(numpy.abs(value) >= INTEGER_BOUND):
+        raise OverflowError('integer out of the 64-bit range')
+    return value.astype(numpy.int64)
+
+
+def as_mask(condition: Any, rows: numpy.ndarray) -> numpy.ndarray:
+    return numpy.broadcast_to(numpy.asarray(condition, dtype=bool), rows.shape)
+
+
+def take(value: Any, mask: numpy.ndarray) -> Any:
+    return value[mask] if isinstance(value, numpy.ndarray) and value.ndim else value
+
+
+helpers: Dict[str, Any] = {
+    'add': add,
+    'as_mask': as_mask,
+    'logical_not': numpy.logical_not,
+    'multiply': multiply,
+    'negate': negate,
+    'subtract': subtract,
+    'take': take,
+    'to_boolean': to_boolean,
+    'to_double': to_double,
+    'to_integer': to_integer,
+    'undefined': undefined,
+}
+
+
+@dataclass
+class BatchMethod:
+    source: str
+    function: BatchFunction
+
+
+def compile_batch_method(
+    program: avm2.vm.Program,
+    index: ABCMethodBodyIndex,
+    method_body: ASMethodBody,
+    code: DecodedCode,
+) -> BatchMethod:
+    """
+    Compile the decoded method body to a function over NumPy arrays.
+    Raises `NotImplementedError` if the method body is not supported.
+    """
+    return BatchCompiler(program, index, method_body, code).compile()
+
+
+class BatchCompiler:
+    def __init__(
+        self,
+        program: avm2.vm.Program,
+        index: ABCMethodBodyIndex,
+        method_body: ASMethodBody,
+        code: DecodedCode,
+    ):
+        self.program = program
+        self.index = index
+        self.method_body = method_body
+        self.code = code
+        self.constants: Dict[str, Any] = dict(helpers)
+        self.lines: List[str] = []
+        self.variable_count = 0
+        self.branch_count = 0
+
+    def compile(self) -> BatchMethod:
+        method = self.program.abc_file.methods[self.method_body.method_index]
+        if method.flags & (MethodFlags.NEED_ARGUMENTS | MethodFlags.NEED_REST):
+            raise NotImplementedError(method.flags)
+        registers = [f'r{i}' for i in range(self.method_body.local_count)]
+        self.trace(0, registers, [], [], 'rows')
+        lines = [f'def batch_{self.index}(rows, registers):']
+        if registers:
+            lines.append(f'    {", ".join(registers)}, = registers')
+        lines.append('    returns = []')
+        lines.extend(f'    {line}' for line in eliminate_dead_code(self.lines))
+        lines.append('    return returns')
+        source = '\n'.join(lines) + '\n'
+        namespace = dict(self.constants)
+        exec(compile(source, f'<batch method body {self.index}>', 'exec'), namespace)
+        return BatchMethod(source=source, function=namespace[f'batch_{self.index}'])
+
+    def trace(self, index: int, registers: List[str], stack: List[str], scope_stack: List[str], rows: str):
+        """
+        Compile the execution path which starts at the instruction, for the rows.
+        """
+        instructions = self.code.instructions
+        while True:
+            if index >= len(instructions):
+                raise NotImplementedError('jump outside of the code')
+            instruction = instructions[index]
+            type_ = type(instruction)
+            if type_ in get_local_instructions:
+                stack.append(registers[get_local_instructions[type_]])
+            elif type_ is GetLocal:
+                stack.append(registers[instruction.index])
+            elif type_ in set_local_instructions:
+                registers[set_local_instructions[type_]] = stack.pop()
+            elif type_ is SetLocal:
+                registers[instruction.index] = stack.pop()
+            elif type_ is Kill:
+                registers[instruction.index] = 'undefined'
+            elif type_ in unary_operations:
+                stack.append(self.assign(unary_operations[type_].format(stack.pop())))
+            elif type_ in binary_operations:
+                value_2 = stack.pop()
+                value_1 = stack.pop()
+                stack.append(self.assign(binary_operations[type_].format(value_1, value_2)))
+            elif type_ is PushByte:
+                stack.append(repr(instruction.byte_value))
+            elif type_ is PushShort:
+                stack.append(repr(instruction.value))
+            elif type_ is PushInteger:
+                stack.append(repr(self.program.integers[instruction.index]))
+            elif type_ is PushDouble:
+                stack.append(self.add_double(self.program.doubles[instruction.index]))
+            elif type_ is PushNaN:
+                stack.append(self.add_double(math.nan))
+            elif type_ is PushTrue:
+                stack.append('True')
+            elif type_ is PushFalse:
+                stack.append('False')
+            elif type_ is Pop:
+                stack.pop()
+            elif type_ is Dup:
+                stack.append(stack[-1])
+            elif type_ is Swap:
+                stack[-2], stack[-1] = stack[-1], stack[-2]
+            elif type_ is PushScope:
+                scope_stack.append(stack.pop())
+            elif type_ is PopScope:
+                scope_stack.pop()
+            elif type_ is GetScopeObject:
+                stack.append(scope_stack[instruction.index])
+            elif type_ in no_operations:
+                pass
+            elif type_ is ReturnValue:
+                self.lines.append(f'returns.append(({rows}, {stack.pop()}))')
+                return
+            elif type_ is Jump:
+                index = self.get_forward_jump_index(index)
+                continue
+            elif type_ in conditional_jumps:
+                self.branch_count += 1
+                if self.branch_count > MAX_BRANCH_COUNT:
+                    raise NotImplementedError('too many branches')
+                operands = [stack.pop() for _ in range(conditional_jumps[type_].count('{'))][::-1]
+                condition = conditional_jumps[type_].format(*operands)
+                if all(self.is_constant(operand) for operand in operands):
+                    index = self.get_forward_jump_index(index) if eval(condition, dict(self.constants)) else index + 1
+                    continue
+                mask = self.assign(f'as_mask({condition}, {rows})')
+                for target_index, target_mask in (
+                    (self.get_forward_jump_index(index), mask),
+                    (index + 1, self.assign(f'~{mask}')),
+                ):
+                    self.trace(
+                        target_index,
+                        [self.take(value, target_mask) for value in registers],
+                        [self.take(value, target_mask) for value in stack],
+                        [self.take(value, target_mask) for value in scope_stack],
+                        self.assign(f'{rows}[{target_mask}]'),
+                    )
+                return
+            else:
+                raise NotImplementedError(instruction)
+            index += 1
+
+    def get_forward_jump_index(self, index: int) -> int:
+        try:
+            target_index = self.code.get_jump_index(index, self.code.instructions[index].offset)
+        except KeyError:
+            raise NotImplementedError('jump into the middle of an instruction')
+        if target_index <= index:
+            # Loops would need to iterate until all the rows exit.
+            raise NotImplementedError('backward jump')
+        return target_index
+
+    def take(self, value: str, mask: str) -> str:
+        """
+        Select the rows of the value, unless it is a constant.
+        """
+        return value if self.is_constant(value) else self.assign(f'take({value}, {mask})')
+
+    def is_constant(self, value: str) -> bool:
+        return not value.isidentifier() or value in self.constants or value in ('True', 'False')
+
+    def assign(self, expression: str) -> str:
+        """
+        Evaluate the expression into a new variable.
+        """
+        name = f't{self.variable_count}'
+        self.variable_count += 1
+        self.lines.append(f'{name} = {expression}')
+        return name
+
+    def add_double(self, value: float) -> str:
+        if math.isfinite(value):
+            return repr(value)
+        name = f'c{len(self.constants)}'
+        self.constants[name] = value
+        return name
+
+
+def eliminate_dead_code(lines: List[str]) -> List[str]:
+    """
+    Remove assignments of the variables which are never used. All the assigned expressions are pure.
+    """
+    used: Set[str] = set()
+    live_lines: List[str] = []
+    for line in reversed(lines):
+        name, _, expression = line.partition(' = ')
+        if expression and name.isidentifier():
+            if name not in used:
+                continue
+        else:
+            expression = line
+        used.update(variable_pattern.findall(expression))
+        live_lines.append(line)
+    return live_lines[::-1]
+
+
+def call_method_batch(
+    machine: avm2.vm.VirtualMachine,
+    index: ABCMethodIndex,
+    this: Any,
+    arrays: Sequence[Any],
+) -> numpy.ndarray:
+    """
+    Call the method for each row of the argument columns and get the column of the return values.
+    """
+    arrays = [numpy.asarray(array) for array in arrays]
+    size = len(arrays[0]) if arrays else 1
+    assert all(array.shape == (size,) for array in arrays), [array.shape for array in arrays]
+
+    method_body_index = machine.method_to_body[index]
+    batch_method = machine.program.compile_batch_method(method_body_index)
+    if batch_method is not None:
+        method_body = machine.abc_file.method_bodies[method_body_index]
+        registers = machine.create_method_environment(method_body, this, *arrays).registers
+        try:
+            with numpy.errstate(all='raise'):
+                returns = batch_method.function(numpy.arange(size), registers)
+                result = numpy.empty(size, dtype=numpy.result_type(*(value for _, value in returns)))
+                for rows, value in returns:
+                    result[rows] = value
+        except (ArithmeticError, TypeError, ValueError):
+            pass
+        else:
+            machine.vectorized_batch_calls += 1
+            return result
+
+    machine.looped_batch_calls += 1
+    columns = [array.tolist() for array in arrays]
+    return numpy.array([machine.call_method(index, this, *row) for row in zip(*columns)])
+
+
+def try_compile_batch_method(
+    program: avm2.vm.Program,
+    index: ABCMethodBodyIndex,
+    method_body: ASMethodBody,
+    code: DecodedCode,
+) -> Optional[BatchMethod]:
+    """
+    Compile the method body or get `None` if it is not supported.
+    """
+    try:
+        return compile_batch_method(program, index, method_body, code)
+    except NotImplementedError:
+        return None
@@ -0,0 +1,137 @@
+"""
+Persistent on-disk cache of parsed ABC files.
+
+An entry is keyed by SHA-256 of the DoABC payload and contains the lazily loaded `ABCFile`, that is its constant pool
+and the offsets of all the other entries, along with the `Linking` tables. The payload itself is not stored:
+the cached `ABCFile` reads the entries from the payload which is passed to the cache.
+
+The entry format is:
+
+- `MAGIC`,
+- `u16` format version,
+- `u8` length of the library version and the library version itself,
+- 32 bytes of the payload SHA-256,
+- pickled `(ABCFile, Linking)` where the payload buffer is a persistent reference.
+
+An entry written by a different format or library version is ignored and gets overwritten. So is an entry which
+fails to load for any reason, or whose objects lack the attributes of the current classes.
+Since the entries are pickles, the cache directory must be trusted.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+import pickle
+from pathlib import Path
+from struct import Struct
+from tempfile import NamedTemporaryFile
+from dataclasses import fields
+from typing import Any, Iterable, Optional, Tuple, Union
+
+import avm2
+from avm2.abc.types import ABCFile
+from avm2.io import MemoryViewReader
+from avm2.vm import Linking, VirtualMachine
+
+MAGIC = b'AVM2'
+FORMAT_VERSION = 3
+PICKLE_PROTOCOL = 4
+BUFFER_ID = 'buffer'
+
+U16 = Struct('<H')
+
+
+class ABCFileCache:
+    def __init__(self, directory: Union[str, Path]):
+        self.directory = Path(directory)
+
+    def get_machine(self, buffer: Union[memoryview, bytes], **kwargs: Any) -> VirtualMachine:
+        """
+        Create a virtual machine for the ABC file, parse and link it only if it is not cached yet.
+        Keyword arguments are passed to `VirtualMachine`.
+        """
+        buffer = buffer if isinstance(buffer, memoryview) else memoryview(buffer)
+        digest = hashlib.sha256(buffer).digest()
+        path = self.directory / f'{digest.hex()}.abc'
+        entry = self.load(path, buffer, digest)
+        if entry is not None:
+            abc_file, linking = entry
+            return VirtualMachine(abc_file, linking=linking, abc_digest=digest, **kwargs)
+        machine = VirtualMachine(ABCFile(MemoryViewReader(buffer), lazy=True), abc_digest=digest, **kwargs)
+        self.store(path, buffer, digest, machine.abc_file, machine.linking)
+        return machine
+
+    @staticmethod
+    def load(path: Path, buffer: memoryview, digest: bytes) -> Optional[Tuple[ABCFile, Linking]]:
+        """
+        Load the cache entry or get `None` if it is missing or stale.
+        """
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            if data[:len(MAGIC)] != MAGIC:
+                return None
+            reader = MemoryViewReader(data)
+            reader.skip(len(MAGIC))
+            if reader.read_u16() != FORMAT_VERSION:
+                return None
+            if reader.read(reader.read_u8()).tobytes().decode() != avm2.__version__:
+                return None
+            if reader.read(len(digest)) != digest:
+                return None
+            abc_file, linking = BufferUnpickler(io.BytesIO(reader.read_all()), buffer).load()
+        except Exception:
+            # Truncated, corrupted, or pickled by other code.
+            return None
+        if not isinstance(abc_file, ABCFile) or not has_attributes(abc_file, ABCFile.__annotations__):
+            return None
+        if not isinstance(linking, Linking) or not has_attributes(linking, (field.name for field in fields(Linking))):
+            return None
+        return abc_file, linking
+
+    def store(self, path: Path, buffer: memoryview, digest: bytes, abc_file: ABCFile, linking: Linking):
+        """
+        Write the cache entry atomically.
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with NamedTemporaryFile(dir=self.directory, prefix=path.name, suffix='.tmp', delete=False) as file:
+            version = avm2.__version__.encode()
+            file.write(MAGIC + U16.pack(FORMAT_VERSION) + bytes([len(version)]) + version + digest)
+            BufferPickler(file, buffer).dump((abc_file, linking))
+        os.replace(file.name, path)
+
+
+def has_attributes(object_: Any, names: Iterable[str]) -> bool:
+    """
+    Check that the unpickled object has all the attributes of the current class layout.
+    """
+    attributes = vars(object_)
+    return all(name in attributes for name in names)
+
+
+class BufferPickler(pickle.Pickler):
+    """
+    Pickles the buffer as a persistent reference instead of its contents.
+    """
+
+    def __init__(self, file: Any, buffer: memoryview):
+        super().__init__(file, protocol=PICKLE_PROTOCOL)
+        self.buffer = buffer
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        return BUFFER_ID if obj is self.buffer else None
+
+
+class BufferUnpickler(pickle.Unpickler):
+    def __init__(self, file: Any, buffer: memoryview):
+        super().__init__(file)
+        self.buffer = buffer
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid != BUFFER_ID:
+            raise pickle.UnpicklingError(f'unknown persistent ID: {pid!r}')
+        return self.buffer
@@ -0,0 +1,263 @@
+"""
+Control-flow graph of method bodies.
+
+The decoded code is split into basic blocks. Jump, branch and switch targets are resolved to block ids, and blocks
+covered by the exception ranges get edges to the handler blocks. Dominators are computed over both kinds of edges,
+and loop headers are the targets of back edges, that is edges to a dominator.
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from avm2.abc.instructions import (
+    DecodedCode,
+    IfEq,
+    IfFalse,
+    IfGE,
+    IfGT,
+    IfLE,
+    IfLT,
+    IfNE,
+    IfNGE,
+    IfNGT,
+    IfNLE,
+    IfNLT,
+    IfStrictEq,
+    IfStrictNE,
+    IfTrue,
+    Jump,
+    LookupSwitch,
+    ReturnValue,
+    ReturnVoid,
+    Throw,
+)
+from avm2.abc.types import ASMethodBody
+
+conditional_jumps = (
+    IfEq, IfFalse, IfGE, IfGT, IfLE, IfLT, IfNE, IfNGE, IfNGT, IfNLE, IfNLT, IfStrictEq, IfStrictNE, IfTrue,
+)
+terminators = (Jump, LookupSwitch, ReturnValue, ReturnVoid, Throw)  # instructions which never fall through
+
+
+@dataclass
+class BasicBlock:
+    id: int
+    start: int  # index of the first instruction
+    end: int  # index after the last instruction
+    successors: List[int] = field(default_factory=list)
+    predecessors: List[int] = field(default_factory=list)
+    handlers: List[int] = field(default_factory=list)  # exception handler blocks which cover the block
+
+
+@dataclass
+class ControlFlowGraph:
+    code: DecodedCode
+    blocks: List[BasicBlock]
+    block_ids: List[int]  # instruction index to its block id
+    jump_targets: List[Tuple[int, ...]]  # instruction index to the target instruction indices of its jumps
+    immediate_dominators: List[Optional[int]]  # `None` for the entry and unreachable blocks
+    loops: Dict[int, Set[int]]  # loop header to the blocks of its natural loop
+
+    @property
+    def loop_headers(self) -> Set[int]:
+        return set(self.loops)
+
+    def is_reachable(self, block_id: int) -> bool:
+        return block_id == 0 or self.immediate_dominators[block_id] is not None
+
+    def dominates(self, dominator: int, block_id: int) -> bool:
+        """
+        Check whether every path from the entry to the block goes through the dominator.
+        """
+        if not self.is_reachable(block_id):
+            return False
+        while block_id is not None:
+            if block_id == dominator:
+                return True
+            block_id = self.immediate_dominators[block_id]
+        return False
+
+    def disassemble(self) -> str:
+        """
+        Get readable listing of the code split into the blocks.
+        """
+        lines: List[str] = []
+        for block in self.blocks:
+            notes = []
+            if block.id in self.loops:
+                notes.append('loop header')
+            if not self.is_reachable(block.id):
+                notes.append('unreachable')
+            if block.predecessors:
+                notes.append(f'from {", ".join(map(str, block.predecessors))}')
+            if block.handlers:
+                notes.append(f'handlers {", ".join(map(str, block.handlers))}')
+            lines.append(f'block {block.id}: {", ".join(notes)}' if notes else f'block {block.id}:')
+            for index in range(block.start, block.end):
+                line = f'{self.code.get_source_offset(index):>6}  {self.code.instructions[index]}'
+                if self.jump_targets[index]:
+                    line += f'  -> {", ".join(f"block {self.block_ids[target]}" for target in self.jump_targets[index])}'
+                lines.append(line)
+        return '\n'.join(lines)
+
+
+def build_control_flow_graph(method_body: ASMethodBody, code: DecodedCode) -> ControlFlowGraph:
+    """
+    Split the decoded method body into basic blocks and analyse them.
+    Jumps outside the code are possible in dead code, they get no edges.
+    """
+    instructions = code.instructions
+    instruction_count = len(instructions)
+
+    # Find the block leaders.
+    leaders: Set[int] = {0}
+    jump_targets: List[Tuple[int, ...]] = [()] * instruction_count
+    for index, instruction in enumerate(instructions):
+        if isinstance(instruction, LookupSwitch):
+            # Offsets of the switch are relative to the instruction start.
+            offsets = [code.offsets[index] + offset for offset in (instruction.default_offset, *instruction.case_offsets)]
+        elif isinstance(instruction, (Jump, *conditional_jumps)):
+            offsets = [code.offsets[index + 1] + instruction.offset]
+        elif isinstance(instruction, terminators):
+            leaders.add(index + 1)
+            continue
+        else:
+            continue
+        jump_targets[index] = tuple(dict.fromkeys(get_indices(code, offsets)))
+        leaders.update(jump_targets[index])
+        leaders.add(index + 1)
+    ranges: List[Tuple[int, int, Optional[int]]] = []
+    for exception in method_body.exceptions:
+        # Exception ranges do not have to match the instruction boundaries.
+        start = bisect_left(code.offsets, exception.from_, hi=instruction_count)
+        end = bisect_left(code.offsets, exception.to, hi=instruction_count)
+        target = next(iter(get_indices(code, [exception.target])), None)
+        ranges.append((start, end, target))
+        leaders.update((start, end))
+        if target is not None:
+            leaders.add(target)
+    starts = sorted(leader for leader in leaders if leader < instruction_count)
+
+    # Make the blocks and edges.
+    blocks = [
+        BasicBlock(id=block_id, start=start, end=end)
+        for block_id, (start, end) in enumerate(zip(starts, [*starts[1:], instruction_count]))
+    ]
+    block_ids: List[int] = []
+    for block in blocks:
+        block_ids.extend([block.id] * (block.end - block.start))
+    for block in blocks:
+        successors = [block_ids[target] for target in jump_targets[block.end - 1]]
+        if not isinstance(instructions[block.end - 1], terminators) and block.end < instruction_count:
+            successors.append(block.id + 1)
+        block.successors = list(dict.fromkeys(successors))
+    for start, end, target in ranges:
+        if target is None:
+            continue
+        for block in blocks:
+            if start <= block.start < end and block_ids[target] not in block.handlers:
+                block.handlers.append(block_ids[target])
+    for block in blocks:
+        for successor in block.successors:
+            blocks[successor].predecessors.append(block.id)
+
+    immediate_dominators = find_immediate_dominators(blocks)
+    graph = ControlFlowGraph(
+        code=code,
+        blocks=blocks,
+        block_ids=block_ids,
+        jump_targets=jump_targets,
+        immediate_dominators=immediate_dominators,
+        loops={},
+    )
+    for block in blocks:
+        for successor in block.successors:
+            if graph.dominates(successor, block.id):
+                graph.loops.setdefault(successor, {successor}).update(find_natural_loop(blocks, successor, block.id))
+    return graph
+
+
+def get_indices(code: DecodedCode, offsets: Iterable[int]) -> Iterable[int]:
+    """
+    Get indices of the instructions which start at the offsets, skip the offsets which are not instructions.
+    """
+    instruction_count = len(code.instructions)
+    for offset in offsets:
+        index = code.offset_to_index.get(offset)
+        if index is not None and index < instruction_count:
+            yield index
+
+
+def find_immediate_dominators(blocks: List[BasicBlock]) -> List[Optional[int]]:
+    """
+    Compute the immediate dominators with the algorithm of Cooper, Harvey and Kennedy.
+    Exception handlers are considered to be successors of the blocks they cover.
+    """
+    if not blocks:
+        return []
+    successors = [[*block.successors, *block.handlers] for block in blocks]
+
+    # Number the reachable blocks in reverse post-order.
+    order: List[int] = []
+    visited = {0}
+    stack = [(0, iter(successors[0]))]
+    while stack:
+        block_id, iterator = stack[-1]
+        for successor in iterator:
+            if successor not in visited:
+                visited.add(successor)
+                stack.append((successor, iter(successors[successor])))
+                break
+        else:
+            stack.pop()
+            order.append(block_id)
+    order.reverse()
+    numbers = {block_id: number for number, block_id in enumerate(order)}
+    predecessors: Dict[int, List[int]] = {block_id: [] for block_id in order}
+    for block_id in order:
+        for successor in successors[block_id]:
+            predecessors[successor].append(block_id)
+
+    dominators: List[Optional[int]] = [None] * len(blocks)
+    dominators[0] = 0
+    changed = True
+    while changed:
+        changed = False
+        for block_id in order[1:]:
+            new_dominator: Optional[int] = None
+            for predecessor in predecessors[block_id]:
+                if dominators[predecessor] is None:
+                    continue
+                if new_dominator is None:
+                    new_dominator = predecessor
+                    continue
+                # Intersect the dominator chains.
+                finger_1, finger_2 = predecessor, new_dominator
+                while finger_1 != finger_2:
+                    while numbers[finger_1] > numbers[finger_2]:
+                        finger_1 = dominators[finger_1]
+                    while numbers[finger_2] > numbers[finger_1]:
+                        finger_2 = dominators[finger_2]
+                new_dominator = finger_1
+            if dominators[block_id] != new_dominator:
+                dominators[block_id] = new_dominator
+                changed = True
+    dominators[0] = None
+    return dominators
+
+
+def find_natural_loop(blocks: List[BasicBlock], header: int, latch: int) -> Set[int]:
+    """
+    Get the blocks of the loop formed by the back edge from `latch` to `header`.
+    """
+    loop = {header, latch}
+    pending = [latch]
+    while pending:
+        for predecessor in blocks[pending.pop()].predecessors:
+            if predecessor not in loop:
+                loop.add(predecessor)
+                pending.append(predecessor)
+    return loop
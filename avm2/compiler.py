@@ -0,0 +1,351 @@
+"""
+Compiles method bodies to Python functions.
+
+Registers become local variables `r0`, `r1`, ... and the operand stack is resolved at compile time into
+Python expressions. Values which stay on the stack between basic blocks are kept in `s0`, `s1`, ... variables.
+Basic blocks are dispatched by a `while` loop over the current block id.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Type
+
+import avm2.vm
+from avm2.abc.instructions import (
+    Add,
+    AddInteger,
+    ConvertToBoolean,
+    ConvertToDouble,
+    ConvertToInteger,
+    DecodedCode,
+    Debug,
+    DebugFile,
+    DebugLine,
+    Decrement,
+    DecrementInteger,
+    Divide,
+    Dup,
+    GetLocal,
+    GetLocal0,
+    GetLocal1,
+    GetLocal2,
+    GetLocal3,
+    GetScopeObject,
+    GreaterEquals,
+    GreaterThan,
+    IfEq,
+    IfFalse,
+    IfGE,
+    IfGT,
+    IfLE,
+    IfLT,
+    IfNE,
+    IfNGE,
+    IfNGT,
+    IfNLE,
+    IfNLT,
+    IfTrue,
+    Increment,
+    IncrementInteger,
+    Instruction,
+    Jump,
+    Kill,
+    Label,
+    LessEquals,
+    LessThan,
+    Multiply,
+    MultiplyInteger,
+    Negate,
+    NegateInteger,
+    Nop,
+    Not,
+    Pop,
+    PopScope,
+    PushByte,
+    PushDouble,
+    PushFalse,
+    PushInteger,
+    PushNaN,
+    PushNull,
+    PushScope,
+    PushShort,
+    PushTrue,
+    PushUndefined,
+    ReturnValue,
+    ReturnVoid,
+    SetLocal,
+    SetLocal0,
+    SetLocal1,
+    SetLocal2,
+    SetLocal3,
+    Subtract,
+    SubtractInteger,
+    Swap,
+)
+from avm2.abc.types import ABCMethodBodyIndex, ASMethodBody
+from avm2.cfg import build_control_flow_graph
+from avm2.runtime import undefined
+
+CompiledFunction = Callable[['avm2.vm.VirtualMachine', 'avm2.vm.MethodEnvironment'], Any]
+
+unary_operations: Dict[Type[Instruction], str] = {
+    ConvertToBoolean: 'bool({0})',
+    ConvertToDouble: 'float({0})',
+    ConvertToInteger: 'int({0})',
+    Decrement: '({0} - 1)',
+    DecrementInteger: '(int({0}) - 1)',
+    Increment: '({0} + 1)',
+    IncrementInteger: '(int({0}) + 1)',
+    Negate: '(-{0})',
+    NegateInteger: '(-int({0}))',
+    Not: '(not {0})',
+}
+
+binary_operations: Dict[Type[Instruction], str] = {
+    Add: '({0} + {1})',
+    AddInteger: '(int({0}) + int({1}))',
+    Divide: '({0} / {1})',
+    GreaterEquals: '({0} >= {1})',
+    GreaterThan: '({0} > {1})',
+    LessEquals: '({0} <= {1})',
+    LessThan: '({0} < {1})',
+    Multiply: '({0} * {1})',
+    MultiplyInteger: '(int({0}) * int({1}))',
+    Subtract: '({0} - {1})',
+    SubtractInteger: '(int({0}) - int({1}))',
+}
+
+# The number of placeholders in a condition is the number of operands which the jump pops.
+conditional_jumps: Dict[Type[Instruction], str] = {
+    IfEq: '({0} == {1})',
+    IfFalse: '(not {0})',
+    IfGE: '({0} >= {1})',
+    IfGT: '({0} > {1})',
+    IfLE: '({0} <= {1})',
+    IfLT: '({0} < {1})',
+    IfNE: '({0} != {1})',
+    IfNGE: '(not {0} >= {1})',
+    IfNGT: '(not {0} > {1})',
+    IfNLE: '(not {0} <= {1})',
+    IfNLT: '(not {0} < {1})',
+    IfTrue: '{0}',
+}
+
+get_local_instructions: Dict[Type[Instruction], int] = {GetLocal0: 0, GetLocal1: 1, GetLocal2: 2, GetLocal3: 3}
+set_local_instructions: Dict[Type[Instruction], int] = {SetLocal0: 0, SetLocal1: 1, SetLocal2: 2, SetLocal3: 3}
+no_operations = (Debug, DebugFile, DebugLine, Label, Nop)
+
+
+@dataclass
+class CompiledMethod:
+    source: str
+    function: CompiledFunction
+
+
+def compile_method_body(
+    program: avm2.vm.Program,
+    index: ABCMethodBodyIndex,
+    method_body: ASMethodBody,
+    code: DecodedCode,
+) -> CompiledMethod:
+    """
+    Compile the decoded method body to a Python function.
+    Raises `NotImplementedError` if the method body contains an unsupported instruction.
+    """
+    return Compiler(program, index, method_body, code).compile()
+
+
+class Compiler:
+    def __init__(
+        self,
+        program: avm2.vm.Program,
+        index: ABCMethodBodyIndex,
+        method_body: ASMethodBody,
+        code: DecodedCode,
+    ):
+        self.program = program
+        self.index = index
+        self.method_body = method_body
+        self.code = code
+        self.graph = build_control_flow_graph(method_body, code)
+        self.constants: Dict[str, Any] = {'undefined': undefined}
+        self.temporary_count = 0
+
+    def compile(self) -> CompiledMethod:
+        blocks = {block.start: block.end for block in self.graph.blocks}
+        entry_depths: Dict[int, int] = {0: 0}
+        compiled_blocks: Dict[int, List[str]] = {}
+        pending = [0]
+        while pending:
+            start = pending.pop()
+            if start not in compiled_blocks:
+                compiled_blocks[start] = self.compile_block(start, blocks[start], entry_depths, pending)
+
+        lines = [f'def method_{self.index}(machine, environment):']
+        if self.method_body.local_count:
+            lines.append(f'    {self.unpack_registers()} = environment.registers')
+        lines.extend([
+            '    scope_stack = environment.scope_stack',
+            '    block = 0',
+            '    while True:',
+        ])
+        for block_number, start in enumerate(sorted(compiled_blocks)):
+            lines.append(f'        {"if" if block_number == 0 else "elif"} block == {start}:')
+            lines.extend(f'            {line}' for line in compiled_blocks[start])
+        source = '\n'.join(lines) + '\n'
+        namespace = dict(self.constants)
+        exec(compile(source, f'<method body {self.index}>', 'exec'), namespace)
+        return CompiledMethod(source=source, function=namespace[f'method_{self.index}'])
+
+    def unpack_registers(self) -> str:
+        return ', '.join(f'r{i}' for i in range(self.method_body.local_count)) + ','
+
+    def get_jump_index(self, index: int) -> int:
+        targets = self.graph.jump_targets[index]
+        # Jumps outside the code are possible in dead code, make them fail on compilation of reachable code.
+        return targets[0] if targets else len(self.code.instructions)
+
+    def compile_block(self, start: int, end: int, entry_depths: Dict[int, int], pending: List[int]) -> List[str]:
+        """
+        Compile the basic block and add its successors to `pending`.
+        """
+        lines: List[str] = []
+        stack = [f's{i}' for i in range(entry_depths[start])]
+
+        def spill(*target_indices: int) -> List[str]:
+            # Pass the values left on the stack to the successors.
+            for target_index in target_indices:
+                if target_index >= len(self.code.instructions):
+                    raise NotImplementedError('jump outside of the code')
+                if entry_depths.setdefault(target_index, len(stack)) != len(stack):
+                    raise NotImplementedError('inconsistent stack depth')
+                pending.append(target_index)
+            if not stack:
+                return []
+            return [f'{", ".join(f"s{i}" for i in range(len(stack)))}, = {", ".join(stack)},']
+
+        def flush(register: str):
+            # Evaluate pending expressions which depend on the register before it gets overwritten.
+            pattern = re.compile(rf'\b{register}\b')
+            for i, expression in enumerate(stack):
+                if pattern.search(expression):
+                    stack[i] = self.assign(lines, expression)
+
+        for index in range(start, end):
+            instruction = self.code.instructions[index]
+            type_ = type(instruction)
+            if type_ in get_local_instructions:
+                stack.append(f'r{get_local_instructions[type_]}')
+            elif type_ is GetLocal:
+                stack.append(f'r{instruction.index}')
+            elif type_ in set_local_instructions or type_ is SetLocal:
+                register = f'r{set_local_instructions.get(type_, getattr(instruction, "index", None))}'
+                value = stack.pop()
+                flush(register)
+                lines.append(f'{register} = {value}')
+            elif type_ is Kill:
+                register = f'r{instruction.index}'
+                flush(register)
+                lines.append(f'{register} = undefined')
+            elif type_ in unary_operations:
+                stack.append(unary_operations[type_].format(stack.pop()))
+            elif type_ in binary_operations:
+                value_2 = stack.pop()
+                value_1 = stack.pop()
+                stack.append(binary_operations[type_].format(value_1, value_2))
+            elif type_ is PushByte:
+                stack.append(repr(instruction.byte_value))
+            elif type_ is PushShort:
+                stack.append(repr(instruction.value))
+            elif type_ is PushInteger:
+                stack.append(repr(self.program.integers[instruction.index]))
+            elif type_ is PushDouble:
+                stack.append(self.add_double(self.program.doubles[instruction.index]))
+            elif type_ is PushNaN:
+                stack.append(self.add_double(math.nan))
+            elif type_ is PushTrue:
+                stack.append('True')
+            elif type_ is PushFalse:
+                stack.append('False')
+            elif type_ is PushNull:
+                stack.append('None')
+            elif type_ is PushUndefined:
+                stack.append('undefined')
+            elif type_ is Pop:
+                value = stack.pop()
+                if not value.isidentifier():
+                    lines.append(value)
+            elif type_ is Dup:
+                value = stack.pop()
+                if not value.isidentifier():
+                    value = self.assign(lines, value)
+                stack.extend([value, value])
+            elif type_ is Swap:
+                stack[-2], stack[-1] = stack[-1], stack[-2]
+            elif type_ is PushScope:
+                lines.append(f'scope_stack.append({stack.pop()})')
+            elif type_ is PopScope:
+                lines.append('scope_stack.pop()')
+            elif type_ is GetScopeObject:
+                stack.append(self.assign(lines, f'scope_stack[{instruction.index}]'))
+            elif type_ in no_operations:
+                pass
+            elif type_ is ReturnValue:
+                lines.append(f'return {stack.pop()}')
+                return lines
+            elif type_ is ReturnVoid:
+                lines.append('return undefined')
+                return lines
+            elif type_ is Jump:
+                lines.extend(spill(self.get_jump_index(index)))
+                lines.extend([f'block = {self.get_jump_index(index)}', 'continue'])
+                return lines
+            elif type_ in conditional_jumps:
+                operands = [stack.pop() for _ in range(conditional_jumps[type_].count('{'))][::-1]
+                condition = conditional_jumps[type_].format(*operands)
+                if stack:
+                    # The condition may depend on the `s` variables which are about to be overwritten by the spill.
+                    condition = self.assign(lines, condition)
+                lines.extend(spill(self.get_jump_index(index), index + 1))
+                lines.append(f'block = {self.get_jump_index(index)} if {condition} else {index + 1}')
+                lines.append('continue')
+                return lines
+            else:
+                raise NotImplementedError(instruction)
+        lines.extend(spill(end))
+        lines.extend([f'block = {end}', 'continue'])
+        return lines
+
+    def assign(self, lines: List[str], expression: str) -> str:
+        """
+        Evaluate the expression into a new temporary variable.
+        """
+        name = f't{self.temporary_count}'
+        self.temporary_count += 1
+        lines.append(f'{name} = {expression}')
+        return name
+
+    def add_double(self, value: float) -> str:
+        if math.isfinite(value):
+            return repr(value)
+        name = f'c{len(self.constants)}'
+        self.constants[name] = value
+        return name
+
+
+def try_compile_method_body(
+    program: avm2.vm.Program,
+    index: ABCMethodBodyIndex,
+    method_body: ASMethodBody,
+    code: DecodedCode,
+) -> Optional[CompiledMethod]:
+    """
+    Compile the method body or get `None` if it is not supported by the compiler.
+    """
+    try:
+        return compile_method_body(program, index, method_body, code)
+    except NotImplementedError:
+        return None
@@ -0,0 +1,171 @@
+"""
+Hit counters of the interpreted instructions, for finding the hot paths.
+
+While counting, the virtual machine runs the instrumented dispatch loop, which increments the counter of each
+dispatched instruction. The counters are arrays of the decoded code, indexed by the instruction. When collected,
+the instruction sites are keyed by the method body index and the byte offset in the original code, and the
+opcodes by the original instruction name. So the counts do not depend on the code cache, and the counts collected by
+several processes are merged together. Counts of the method bodies are sums over the sites.
+
+A site counts the dispatches of the interpreted instruction, which may be a superinstruction, see `avm2.fusion`,
+or have the stripped instructions merged in, see `avm2.peephole`. Opcodes count each of the original instructions
+which the dispatched one stands for, so the opcode counts are as if the original code were run.
+
+Only the interpreted code is counted: compiled and memoized calls run no instructions.
+"""
+
+from __future__ import annotations
+
+from array import array
+from dataclasses import dataclass, field
+from types import MethodType
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import avm2.abc.instructions
+import avm2.vm
+from avm2.abc.types import ABCMethodBodyIndex
+
+Site = Tuple[ABCMethodBodyIndex, int]  # method body index and byte offset of the instruction in the original code
+
+
+@dataclass
+class HitCounts:
+    sites: Dict[Site, int] = field(default_factory=dict)
+    opcodes: Dict[str, int] = field(default_factory=dict)  # original instruction name to the number of executions
+
+    def update(self, other: HitCounts):
+        """
+        Add the counts of the other, for example collected in another process.
+        """
+        for site, count in other.sites.items():
+            self.sites[site] = self.sites.get(site, 0) + count
+        for name, count in other.opcodes.items():
+            self.opcodes[name] = self.opcodes.get(name, 0) + count
+
+    @property
+    def total(self) -> int:
+        """
+        Number of the dispatched instructions at the sites.
+        """
+        return sum(self.sites.values())
+
+    def get_method_body_counts(self) -> Dict[ABCMethodBodyIndex, int]:
+        counts: Dict[ABCMethodBodyIndex, int] = {}
+        for (method_body_index, _), count in self.sites.items():
+            counts[method_body_index] = counts.get(method_body_index, 0) + count
+        return counts
+
+    def get_top_sites(self, limit: int) -> List[Tuple[Site, int]]:
+        return sorted(self.sites.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def disassemble_top_sites(self, program: avm2.vm.Program, limit: int = 20) -> str:
+        """
+        Get readable listing of the most executed instructions, the method and the source line of each.
+        Instructions are disassembled as the program interprets them, with the superinstructions if enabled.
+        """
+        total = self.total
+        lines: List[str] = []
+        codes: Dict[ABCMethodBodyIndex, Tuple[avm2.abc.instructions.DecodedCode, Dict[int, int]]] = {}
+        for (method_body_index, offset), count in self.get_top_sites(limit):
+            try:
+                code, source_indices = codes[method_body_index]
+            except KeyError:
+                code = program.get_interpreted_code(method_body_index)
+                source_indices = {code.get_source_offset(index): index for index in range(len(code.instructions))}
+                codes[method_body_index] = code, source_indices
+            method_name = program.get_method_name(program.abc_file.method_bodies[method_body_index].method_index)
+            index = source_indices.get(offset)
+            if index is None:
+                # Counted with other settings of the code, the site is not an instruction start here.
+                instruction, line_number = '?', None
+            else:
+                instruction, line_number = code.instructions[index], code.get_line_number(index)
+            location = f'{method_name}:{line_number}' if line_number is not None else method_name
+            share = count / total if total else 0.0
+            lines.append(f'{count:>12} {share:>7.2%}  {location} +{offset}  {instruction}')
+        return '\n'.join(lines)
+
+
+def merge_hit_counts(counts: Iterable[HitCounts]) -> HitCounts:
+    """
+    Merge the counts, for example collected in the worker processes.
+    """
+    merged = HitCounts()
+    for item in counts:
+        merged.update(item)
+    return merged
+
+
+class SiteCounters:
+    """
+    Counters of the running code, an array per decoded code.
+    """
+
+    def __init__(self, machine: avm2.vm.VirtualMachine):
+        self.method_to_body = machine.method_to_body
+        # Decoded code is not hashable, the code is kept along with its counters so that its identity stays unique.
+        self.arrays: Dict[int, Tuple[avm2.abc.instructions.DecodedCode, Optional[ABCMethodBodyIndex], array]] = {}
+
+    def get_array(self, frame: avm2.vm.Frame) -> array:
+        code = frame.code
+        try:
+            return self.arrays[id(code)][2]
+        except KeyError:
+            pass
+        counts = array('Q', bytes(8 * len(code.instructions)))
+        method_body_index = None if frame.method_index is None else self.method_to_body[frame.method_index]
+        self.arrays[id(code)] = code, method_body_index, counts
+        return counts
+
+    def collect(self, hit_counts: HitCounts):
+        """
+        Add the counters to the hit counts and reset them.
+        The code executed directly, see `VirtualMachine.execute_code`, has no site and is counted by opcode only.
+        """
+        sites = hit_counts.sites
+        opcodes = hit_counts.opcodes
+        for code, method_body_index, counts in self.arrays.values():
+            for index, count in enumerate(counts):
+                if not count:
+                    continue
+                # Superinstructions and the instructions merged with the stripped ones count as the original ones.
+                for instruction in code.get_source_instructions(index):
+                    name = type(instruction).__name__
+                    opcodes[name] = opcodes.get(name, 0) + count
+                if method_body_index is not None:
+                    site = method_body_index, code.get_source_offset(index)
+                    sites[site] = sites.get(site, 0) + count
+        self.arrays.clear()
+
+
+class HitCounter:
+    """
+    Counts the instructions of the virtual machine. Use it as a context manager, which gives the counts
+    filled in when the counting stops.
+    """
+
+    def __init__(self, machine: avm2.vm.VirtualMachine):
+        self.machine = machine
+        self.site_counters = SiteCounters(machine)
+        self.hit_counts = HitCounts()
+
+    def __enter__(self) -> HitCounts:
+        self.start()
+        return self.hit_counts
+
+    def __exit__(self, *args: Any):
+        self.stop()
+
+    def start(self):
+        if self.machine.profiler is not None:
+            raise ValueError('the virtual machine is already being profiled')
+        self.machine.profiler = self
+        # Instance attributes take precedence over the methods.
+        self.machine.execute_frame = MethodType(
+            avm2.vm.make_execute_frame(self.site_counters.get_array), self.machine)
+
+    def stop(self) -> HitCounts:
+        del self.machine.execute_frame
+        self.machine.profiler = None
+        self.site_counters.collect(self.hit_counts)
+        return self.hit_counts
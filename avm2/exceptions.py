@@ -5,11 +5,36 @@ class ASException(Exception):
     pass
 
 
-class ASReturnException(ASException):
-    def __init__(self, return_value: Any):
-        self.return_value = return_value
+class ASThrowException(ASException):
+    """
+    Raised by the `throw` instruction.
+    """
 
+    def __init__(self, value: Any):
+        self.value = value
 
-class ASJumpException(ASException):
-    def __init__(self, offset: int):
-        self.offset = offset
+
+class ASVerifyError(ASException):
+    """
+    Raised when a method body fails the verification, see `avm2.verifier`.
+    """
+
+
+class ASReferenceError(ASException):
+    """
+    Raised when a property is not found on the scope stack, nor in any script.
+    """
+
+    def __init__(self, name: Any):
+        super().__init__(f'{name!r} is not defined')
+        self.name = name
+
+
+class ASStackOverflowError(ASException):
+    """
+    Raised when the call chain gets deeper than `avm2.vm.MAX_CALL_DEPTH`.
+    """
+
+    def __init__(self, depth: int):
+        super().__init__(f'call depth exceeds {depth}')
+        self.depth = depth
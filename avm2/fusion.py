@@ -0,0 +1,312 @@
+"""
+Fuses frequent instruction sequences of the decoded code into superinstructions.
+
+A superinstruction does the work of the whole sequence in one dispatch and without passing the intermediate
+values through the operand stack. The sequences were chosen by `tools/mine_ngrams.py` among the ones made of
+implemented instructions. A sequence is never fused across a basic block boundary, so jumps always land
+on a superinstruction start.
+"""
+
+from __future__ import annotations
+
+import operator
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+import avm2.vm
+from avm2.abc.instructions import (
+    Add,
+    AddInteger,
+    DecodedCode,
+    Divide,
+    Dup,
+    GetLocal0,
+    GetLocal1,
+    GetLocal2,
+    GetLocal3,
+    GreaterEquals,
+    IfEq,
+    IfFalse,
+    IfGE,
+    IfGT,
+    IfLE,
+    IfLT,
+    IfNE,
+    IfNGE,
+    IfNGT,
+    IfNLE,
+    IfNLT,
+    IfTrue,
+    Instruction,
+    PushByte,
+    PushScope,
+    SetLocal0,
+    SetLocal1,
+    SetLocal2,
+    SetLocal3,
+    SubtractInteger,
+)
+from avm2.abc.types import ASMethodBody
+from avm2.cfg import build_control_flow_graph
+from avm2.runtime import undefined
+
+Operation = Callable[[Any, Any], Any]
+
+get_local_registers: Dict[Type[Instruction], int] = {GetLocal0: 0, GetLocal1: 1, GetLocal2: 2, GetLocal3: 3}
+set_local_registers: Dict[Type[Instruction], int] = {SetLocal0: 0, SetLocal1: 1, SetLocal2: 2, SetLocal3: 3}
+
+# Binary operations with the same semantics as `execute` of the instructions.
+operations: Dict[Type[Instruction], Operation] = {
+    Add: operator.add,
+    AddInteger: lambda value_1, value_2: int(value_1) + int(value_2),
+    Divide: operator.truediv,
+    GreaterEquals: operator.ge,
+    SubtractInteger: lambda value_1, value_2: int(value_1) - int(value_2),
+}
+
+# Branch conditions with the same semantics as `execute` of the instructions.
+conditions: Dict[Type[Instruction], Operation] = {
+    IfEq: operator.eq,
+    IfGE: operator.ge,
+    IfGT: operator.gt,
+    IfLE: operator.le,
+    IfLT: operator.lt,
+    IfNE: operator.ne,
+    IfNGE: lambda value_1, value_2: not value_1 >= value_2,
+    IfNGT: lambda value_1, value_2: not value_1 > value_2,
+    IfNLE: lambda value_1, value_2: not value_1 <= value_2,
+    IfNLT: lambda value_1, value_2: not value_1 < value_2,
+}
+
+
+# Superinstructions.
+# ----------------------------------------------------------------------------------------------------------------------
+
+@dataclass
+class GetLocalPushScope(Instruction):
+    """
+    `getlocal <register>; pushscope`, mostly `getlocal0; pushscope` at a method start.
+    """
+
+    register: int
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        value = environment.registers[self.register]
+        assert value is not None and value is not undefined
+        environment.scope_stack.append(value)
+
+
+@dataclass
+class GetLocalPair(Instruction):
+    """
+    `getlocal <first>; getlocal <second>`.
+    """
+
+    first: int
+    second: int
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        registers = environment.registers
+        environment.operand_stack.extend((registers[self.first], registers[self.second]))
+
+
+@dataclass
+class LocalsOperation(Instruction):
+    """
+    `getlocal <first>; getlocal <second>; <operation>`.
+    """
+
+    first: int
+    second: int
+    operation: Operation
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        registers = environment.registers
+        environment.operand_stack.append(self.operation(registers[self.first], registers[self.second]))
+
+
+@dataclass
+class LocalByteOperation(Instruction):
+    """
+    `getlocal <register>; pushbyte <value>; <operation>`.
+    """
+
+    register: int
+    value: int
+    operation: Operation
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        environment.operand_stack.append(self.operation(environment.registers[self.register], self.value))
+
+
+@dataclass
+class LocalsBranch(Instruction):
+    """
+    `getlocal <first>; getlocal <second>; if<condition> <offset>`.
+    """
+
+    first: int
+    second: int
+    condition: Operation
+    offset: int
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        registers = environment.registers
+        if self.condition(registers[self.first], registers[self.second]):
+            return self.offset
+
+
+@dataclass
+class LocalByteBranch(Instruction):
+    """
+    `getlocal <register>; pushbyte <value>; if<condition> <offset>`.
+    """
+
+    register: int
+    value: int
+    condition: Operation
+    offset: int
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        if self.condition(environment.registers[self.register], self.value):
+            return self.offset
+
+
+@dataclass
+class ByteBranch(Instruction):
+    """
+    `pushbyte <value>; if<condition> <offset>`.
+    """
+
+    value: int
+    condition: Operation
+    offset: int
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        if self.condition(environment.operand_stack.pop(), self.value):
+            return self.offset
+
+
+@dataclass
+class DupBranch(Instruction):
+    """
+    `dup; iftrue <offset>` or `dup; iffalse <offset>`, which is how `&&` and `||` are compiled.
+    """
+
+    jump_if: bool
+    offset: int
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        if bool(environment.operand_stack[-1]) is self.jump_if:
+            return self.offset
+
+
+@dataclass
+class SetLocalGetLocal(Instruction):
+    """
+    `setlocal <register>; getlocal <register>`, that is storing the value and keeping it on the stack.
+    """
+
+    register: int
+
+    def execute(self, machine: avm2.vm.VirtualMachine, environment: avm2.vm.MethodEnvironment):
+        environment.registers[self.register] = environment.operand_stack[-1]
+
+
+# Fusion rules.
+# ----------------------------------------------------------------------------------------------------------------------
+
+def fuse_three(first: Instruction, second: Instruction, third: Instruction) -> Optional[Instruction]:
+    type_1, type_2, type_3 = type(first), type(second), type(third)
+    if type_1 not in get_local_registers:
+        return None
+    register = get_local_registers[type_1]
+    if type_2 in get_local_registers:
+        if type_3 in operations:
+            return LocalsOperation(register, get_local_registers[type_2], operations[type_3])
+        if type_3 in conditions:
+            return LocalsBranch(register, get_local_registers[type_2], conditions[type_3], third.offset)
+    elif type_2 is PushByte:
+        if type_3 in operations:
+            return LocalByteOperation(register, second.byte_value, operations[type_3])
+        if type_3 in conditions:
+            return LocalByteBranch(register, second.byte_value, conditions[type_3], third.offset)
+    return None
+
+
+def fuse_two(first: Instruction, second: Instruction) -> Optional[Instruction]:
+    type_1, type_2 = type(first), type(second)
+    if type_1 in get_local_registers:
+        if type_2 is PushScope:
+            return GetLocalPushScope(get_local_registers[type_1])
+        if type_2 in get_local_registers:
+            return GetLocalPair(get_local_registers[type_1], get_local_registers[type_2])
+    elif type_1 is PushByte and type_2 in conditions:
+        return ByteBranch(first.byte_value, conditions[type_2], second.offset)
+    elif type_1 is Dup and type_2 in (IfTrue, IfFalse):
+        return DupBranch(type_2 is IfTrue, second.offset)
+    elif type_1 in set_local_registers and set_local_registers[type_1] == get_local_registers.get(type_2):
+        return SetLocalGetLocal(set_local_registers[type_1])
+    return None
+
+
+# Longest sequences go first.
+fusions: Sequence[Tuple[int, Callable[..., Optional[Instruction]]]] = ((3, fuse_three), (2, fuse_two))
+
+
+def fuse_code(method_body: ASMethodBody, code: DecodedCode) -> DecodedCode:
+    """
+    Get the decoded code with the superinstructions. The verification, if any, is carried over.
+    """
+    old_instructions = code.instructions
+    block_ids = build_control_flow_graph(method_body, code).block_ids
+    instructions: List[Instruction] = []
+    old_indices: List[int] = []  # new instruction index to the old index of its first instruction
+    index = 0
+    while index < len(old_instructions):
+        for size, fuse in fusions:
+            last_index = index + size - 1
+            if last_index < len(old_instructions) and block_ids[index] == block_ids[last_index]:
+                fused = fuse(*old_instructions[index:index + size])
+                if fused is not None:
+                    break
+        else:
+            size, fused = 1, old_instructions[index]
+        instructions.append(fused)
+        old_indices.append(index)
+        index += size
+
+    new_indices: List[int] = []  # old instruction index, and the end, to the new index of its superinstruction
+    for new_index, old_index in enumerate(old_indices):
+        new_indices.extend([new_index] * (old_index - len(new_indices) + 1))
+    new_indices.extend([len(instructions)] * (len(old_instructions) - len(new_indices) + 1))
+    offsets = [code.offsets[old_index] for old_index in old_indices]
+    offsets.append(code.offsets[-1])
+    fused_code = DecodedCode(
+        instructions=instructions,
+        offsets=offsets,
+        offset_to_index={offset: new_indices[index] for offset, index in code.offset_to_index.items()},
+        handlers=[instruction.execute for instruction in instructions],
+        source_offsets=[code.get_source_offset(old_index) for old_index in old_indices],
+        line_numbers=None if code.line_numbers is None else [code.line_numbers[index] for index in old_indices],
+        source_instructions=[
+            tuple(
+                instruction
+                for old_index in range(start_index, end_index)
+                for instruction in code.get_source_instructions(old_index)
+            )
+            for start_index, end_index in zip(old_indices, [*old_indices[1:], len(old_instructions)])
+        ],
+    )
+    verification = code.verification
+    if verification is not None:
+        # A superinstruction jumps where its last instruction does.
+        last_indices = [*(old_index - 1 for old_index in old_indices[1:]), len(old_instructions) - 1]
+        jump_indices = [verification.jump_indices[last_index] for last_index in last_indices]
+        fused_code.verification = replace(
+            verification,
+            stack_types=[verification.stack_types[old_index] for old_index in old_indices],
+            scope_depths=[verification.scope_depths[old_index] for old_index in old_indices],
+            jump_indices=[None if target is None else new_indices[target] for target in jump_indices],
+        )
+    return fused_code
@@ -1,4 +1,6 @@
+import mmap
 from itertools import count
+from os import PathLike
 from struct import Struct
 from typing import Union
 
@@ -7,6 +9,15 @@ U16 = Struct('<H')
 U32 = Struct('<I')
 
 
+def map_file(path: Union[str, PathLike]) -> memoryview:
+    """
+    Map the file into memory read-only and get a view of its contents.
+    The mapping stays open as long as there are views of it. Forked processes share its pages.
+    """
+    with open(path, 'rb') as file:
+        return memoryview(mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ))
+
+
 class MemoryViewReader:
     """
     Reads a memory view as a structured stream.
@@ -98,7 +109,8 @@ class MemoryViewReader:
         """
         Read variable-length encoded 32-bit unsigned or signed integer value: ASVM2 u30, u32 and s32.
         """
-        value = self.read_u8()
+        value = self.buffer[self.position]
+        self.position += 1
         if not value & 0x00000080:
             return value if unsigned else self.extend_sign(value, 0x00000040)
         value = (value & 0x0000007F) | (self.read_u8() << 7)
@@ -114,6 +126,16 @@ class MemoryViewReader:
         assert not value & 0x800000000, hex(value)
         return value if unsigned else self.extend_sign(value, 0x400000000)  # FIXME: unsure if that's the correct mask
 
+    def skip_int(self):
+        """
+        Skip variable-length encoded integer value.
+        """
+        buffer = self.buffer
+        position = self.position
+        while buffer[position] & 0x80:
+            position += 1
+        self.position = position + 1
+
     @staticmethod
     def extend_sign(value: int, mask: int) -> int:
         """
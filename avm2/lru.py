@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from typing import Callable, Generic, Hashable, Optional, TypeVar
+
+K = TypeVar('K', bound=Hashable)
+V = TypeVar('V')
+
+
+class LRUCache(Generic[K, V]):
+    """
+    Mapping which evicts least recently used items when it grows beyond `max_size`.
+    `max_size=None` means that the cache is unbounded.
+    """
+
+    def __init__(self, max_size: Optional[int] = None):
+        assert max_size is None or max_size > 0, max_size
+        self.max_size = max_size
+        self.items: OrderedDict[K, V] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self) -> str:
+        return f'LRUCache(max_size={self.max_size!r}, size={len(self.items)!r})'
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self.items
+
+    def __getitem__(self, key: K) -> V:
+        value = self.items[key]
+        if self.max_size is not None:
+            self.items.move_to_end(key)
+        return value
+
+    def __setitem__(self, key: K, value: V):
+        self.items[key] = value
+        if self.max_size is not None:
+            self.items.move_to_end(key)
+            while len(self.items) > self.max_size:
+                self.items.popitem(last=False)
+
+    def get_or_create(self, key: K, create: Callable[[K], V]) -> V:
+        """
+        Get the cached value or create it and put into the cache.
+        """
+        try:
+            value = self[key]
+        except KeyError:
+            self.misses += 1
+            value = self[key] = create(key)
+        else:
+            self.hits += 1
+        return value
+
+    def clear(self):
+        self.items.clear()
+        self.hits = self.misses = 0
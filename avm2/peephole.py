@@ -0,0 +1,131 @@
+"""
+Strips the instructions which do nothing at runtime from the decoded code.
+
+These are the debug instructions, labels, no-ops, and coercions of values which already have the target type
+according to the verifier. A removed instruction is merged into the byte range of the next kept instruction.
+So all the original offsets still resolve to instructions, and the branch offsets and exception ranges
+stay valid as they are. The original offsets and `debugline` numbers are kept for stack traces and profilers.
+"""
+
+from __future__ import annotations
+
+from dataclasses import replace
+from typing import Dict, List, Optional, Tuple, Type
+
+from avm2.abc.instructions import (
+    CoerceAny,
+    CoerceString,
+    ConvertToBoolean,
+    ConvertToInteger,
+    ConvertToString,
+    ConvertToUnsignedInteger,
+    Debug,
+    DebugFile,
+    DebugLine,
+    DecodedCode,
+    Instruction,
+    Label,
+    LookupSwitch,
+    Nop,
+)
+from avm2.verifier import BOOLEAN, INT, NULL, STRING, UINT
+
+no_operations = (CoerceAny, Debug, DebugFile, DebugLine, Label, Nop)
+
+# Coercions which do nothing to values of the types.
+# `convert_d` is not here, since the interpreter keeps integral numbers as Python integers.
+redundant_coercions: Dict[Type[Instruction], Tuple[str, ...]] = {
+    CoerceString: (STRING, NULL),
+    ConvertToBoolean: (BOOLEAN,),
+    ConvertToInteger: (INT,),
+    ConvertToString: (STRING,),
+    ConvertToUnsignedInteger: (UINT,),
+}
+
+
+def is_redundant(code: DecodedCode, index: int) -> bool:
+    instruction = code.instructions[index]
+    if isinstance(instruction, no_operations):
+        return True
+    types = redundant_coercions.get(type(instruction))
+    if types is None or code.verification is None:
+        return False
+    stack_types = code.verification.stack_types[index]
+    return stack_types is not None and stack_types[-1] in types
+
+
+def strip_code(code: DecodedCode) -> DecodedCode:
+    """
+    Get the decoded code without the redundant instructions. The verification, if any, is carried over.
+    """
+    old_instructions = code.instructions
+    kept_indices: List[int] = []  # new instruction index to its index in the old code
+    start_indices: List[int] = []  # new instruction index to the first old instruction merged into it
+    removed_index: Optional[int] = None  # the first of the removed instructions which precede the current one
+    for index, instruction in enumerate(old_instructions):
+        if is_redundant(code, index):
+            if removed_index is None:
+                removed_index = index
+            continue
+        if removed_index is not None and isinstance(instruction, LookupSwitch):
+            # Offsets of the switch are relative to the instruction start, which must not move.
+            kept_indices.extend(range(removed_index, index))
+            start_indices.extend(range(removed_index, index))
+            removed_index = None
+        kept_indices.append(index)
+        start_indices.append(index if removed_index is None else removed_index)
+        removed_index = None
+    if removed_index is not None:
+        # Nothing to merge the trailing instructions into.
+        kept_indices.extend(range(removed_index, len(old_instructions)))
+        start_indices.extend(range(removed_index, len(old_instructions)))
+    if len(kept_indices) == len(old_instructions):
+        return code
+
+    new_indices: List[int] = []  # old instruction index, and the end, to the new index of its range
+    for new_index, kept_index in enumerate(kept_indices):
+        new_indices.extend([new_index] * (kept_index - len(new_indices) + 1))
+    new_indices.append(len(kept_indices))
+    offsets = [code.offsets[start_index] for start_index in start_indices]
+    offsets.append(code.offsets[-1])
+
+    line_numbers: Optional[List[Optional[int]]] = None
+    if code.line_numbers is not None:
+        line_numbers = [code.line_numbers[kept_index] for kept_index in kept_indices]
+    elif any(isinstance(instruction, DebugLine) for instruction in old_instructions):
+        line_number: Optional[int] = None
+        old_line_numbers: List[Optional[int]] = []
+        for instruction in old_instructions:
+            if isinstance(instruction, DebugLine):
+                line_number = instruction.linenum
+            old_line_numbers.append(line_number)
+        line_numbers = [old_line_numbers[kept_index] for kept_index in kept_indices]
+
+    stripped_code = DecodedCode(
+        instructions=[old_instructions[kept_index] for kept_index in kept_indices],
+        offsets=offsets,
+        offset_to_index={offset: new_indices[index] for offset, index in code.offset_to_index.items()},
+        handlers=[code.handlers[kept_index] for kept_index in kept_indices],
+        source_offsets=[code.get_source_offset(kept_index) for kept_index in kept_indices],
+        line_numbers=line_numbers,
+        source_instructions=[
+            tuple(
+                instruction
+                for old_index in range(start_index, kept_index + 1)
+                for instruction in code.get_source_instructions(old_index)
+            )
+            for start_index, kept_index in zip(start_indices, kept_indices)
+        ],
+    )
+    verification = code.verification
+    if verification is not None:
+        stripped_code.verification = replace(
+            verification,
+            stack_types=[verification.stack_types[kept_index] for kept_index in kept_indices],
+            scope_depths=[verification.scope_depths[kept_index] for kept_index in kept_indices],
+            jump_indices=[
+                None if target is None else new_indices[target]
+                for target in (verification.jump_indices[kept_index] for kept_index in kept_indices)
+            ],
+        )
+    return stripped_code
@@ -0,0 +1,129 @@
+"""
+Spreads method calls over forked worker processes.
+
+The virtual machine is created, and possibly warmed up, in the parent process. Workers are forked from the parent,
+so they inherit the machine copy-on-write instead of parsing and linking the ABC file again.
+Requires the `fork` start method, that is a POSIX system.
+"""
+
+from __future__ import annotations
+
+import math
+import multiprocessing
+from itertools import chain, count, islice
+from multiprocessing.pool import AsyncResult
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from avm2.abc.types import ABCMethodIndex
+from avm2.vm import VirtualMachine
+
+Job = Tuple[Union[ABCMethodIndex, str], Any, Sequence[Any]]  # method, `this` and arguments
+
+# Machines of the pools, workers find them here after fork.
+machines: Dict[int, VirtualMachine] = {}
+pool_ids = count()
+
+
+class VirtualMachinePool:
+    def __init__(
+        self,
+        machine: VirtualMachine,
+        processes: Optional[int] = None,
+        chunk_size: int = 1000,
+        max_calls_per_worker: Optional[int] = None,
+    ):
+        """
+        `processes` is the number of workers, `None` means the number of CPUs.
+        `chunk_size` is the number of jobs which are sent to a worker at once.
+        `max_calls_per_worker` is the number of calls after which a worker is replaced with a fresh fork
+        of the parent process, `None` means that workers live as long as the pool. It is rounded up to whole chunks.
+        """
+        assert chunk_size > 0, chunk_size
+        self.machine = machine
+        self.chunk_size = chunk_size
+        self.id = next(pool_ids)
+        machines[self.id] = machine
+        max_tasks_per_child = None if max_calls_per_worker is None else math.ceil(max_calls_per_worker / chunk_size)
+        self.pool = multiprocessing.get_context('fork').Pool(processes, maxtasksperchild=max_tasks_per_child)
+
+    def __repr__(self) -> str:
+        return f'VirtualMachinePool(id={self.id!r}, chunk_size={self.chunk_size!r})'
+
+    def __enter__(self) -> VirtualMachinePool:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+
+    def map(self, jobs: Iterable[Job]) -> List[Any]:
+        """
+        Call the methods in the workers and get the return values in the order of the jobs.
+        """
+        return self.map_async(jobs).get()
+
+    def map_async(self, jobs: Iterable[Job]) -> MapResult:
+        """
+        Start calling the methods in the workers and get the result which is ready when all the calls are done.
+        """
+        tasks = [(self.id, chunk) for chunk in split_chunks(jobs, self.chunk_size)]
+        return MapResult(self.pool.starmap_async(call_methods, tasks, chunksize=1))
+
+    def close(self):
+        """
+        Wait for the pending jobs and stop the workers.
+        """
+        self.pool.close()
+        self.pool.join()
+        machines.pop(self.id, None)
+
+    def terminate(self):
+        """
+        Stop the workers immediately.
+        """
+        self.pool.terminate()
+        self.pool.join()
+        machines.pop(self.id, None)
+
+
+class MapResult:
+    """
+    Result of `VirtualMachinePool.map_async`.
+    """
+
+    def __init__(self, result: AsyncResult):
+        self.result = result
+
+    def ready(self) -> bool:
+        return self.result.ready()
+
+    def successful(self) -> bool:
+        return self.result.successful()
+
+    def wait(self, timeout: Optional[float] = None):
+        self.result.wait(timeout)
+
+    def get(self, timeout: Optional[float] = None) -> List[Any]:
+        """
+        Get the return values, re-raise the exception of a failed call.
+        """
+        return list(chain.from_iterable(self.result.get(timeout)))
+
+
+def split_chunks(jobs: Iterable[Job], chunk_size: int) -> Iterable[List[Job]]:
+    iterator = iter(jobs)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def call_methods(pool_id: int, jobs: List[Job]) -> List[Any]:
+    """
+    Call the methods in a worker.
+    """
+    machine = machines[pool_id]
+    return [machine.call_method(method, this, *args) for method, this, args in jobs]
@@ -0,0 +1,345 @@
+"""
+Profilers of the AS3 code.
+
+The deterministic profiler replaces the dispatch loop and the method entry of the virtual machine with the
+instrumented ones for the time of profiling. It counts the calls and the executed instructions, and measures
+the inclusive and exclusive time of each method, including the compiled and memoized calls.
+
+The sampling profiler does not touch the virtual machine at all. It arms the `SIGPROF` timer, and the signal
+handler walks the Python stack: the AS3 call stack is read from the locals of the dispatch loops and from the
+compiled method bodies found on the way. So it is Unix only and has to run in the main thread.
+
+Both produce a `Profile`, which is readable by `pstats` and is convertible to the folded stacks for flame graphs.
+Nothing is changed when no profiler is running, so the profiling costs nothing when it is off.
+"""
+
+from __future__ import annotations
+
+import marshal
+import signal
+from collections import defaultdict
+from dataclasses import dataclass, field
+from time import perf_counter
+from types import FrameType
+from typing import Any, DefaultDict, Dict, List, Optional, Sequence, Tuple
+
+import avm2.vm
+from avm2.abc.types import ABCMethodBodyIndex, ABCMethodIndex
+from avm2.counters import HitCounts, SiteCounters
+
+# Compiled method bodies are named like this, see `avm2.compiler`.
+COMPILED_METHOD_PREFIX = 'method_'
+
+Function = Tuple[str, int, str]  # `pstats` function key: file name, line number and function name
+
+
+@dataclass
+class MethodStatistics:
+    calls: int = 0
+    primitive_calls: int = 0  # calls which are not recursive
+    own_time: float = 0.0  # without the callees
+    total_time: float = 0.0  # of the primitive calls, with the callees
+
+
+@dataclass
+class CallNode:
+    """
+    Node of the call tree, that is the method along with the specific chain of its callers.
+    """
+
+    own_time: float = 0.0
+    children: Dict[ABCMethodIndex, CallNode] = field(default_factory=dict)
+
+    def get_child(self, index: ABCMethodIndex) -> CallNode:
+        try:
+            return self.children[index]
+        except KeyError:
+            child = self.children[index] = CallNode()
+            return child
+
+
+@dataclass
+class Profile:
+    """
+    Profiling results. Time is measured in seconds, sampled time is the sample count times the interval.
+    """
+
+    methods: Dict[ABCMethodIndex, MethodStatistics] = field(default_factory=dict)
+    callers: Dict[Tuple[ABCMethodIndex, ABCMethodIndex], MethodStatistics] = field(default_factory=dict)
+    call_tree: CallNode = field(default_factory=CallNode)
+    hit_counts: HitCounts = field(default_factory=HitCounts)  # of the deterministic profiling, see `avm2.counters`
+    sample_count: int = 0
+    names: Dict[ABCMethodIndex, str] = field(default_factory=dict)  # filled in when the profiling stops
+
+    def get_name(self, index: ABCMethodIndex) -> str:
+        return self.names.get(index, f'method #{index}')
+
+    def get_function(self, index: ABCMethodIndex) -> Function:
+        # `pstats` displays functions of the `~` file by name only, like the built-in ones.
+        return '~', 0, self.get_name(index)
+
+    def create_stats(self):
+        """
+        Make `stats` in the format of `cProfile`, so that `pstats.Stats(profile)` works.
+        """
+        callers: DefaultDict[ABCMethodIndex, Dict[Function, Tuple[int, int, float, float]]] = defaultdict(dict)
+        for (caller_index, index), statistics in self.callers.items():
+            callers[index][self.get_function(caller_index)] = (
+                statistics.primitive_calls, statistics.calls, statistics.own_time, statistics.total_time)
+        self.stats = {
+            self.get_function(index): (
+                statistics.primitive_calls,
+                statistics.calls,
+                statistics.own_time,
+                statistics.total_time,
+                callers[index],
+            )
+            for index, statistics in self.methods.items()
+        }
+
+    def dump_stats(self, path: str):
+        """
+        Write the statistics in the `cProfile` format, readable by `pstats.Stats(path)` and the viewers.
+        """
+        self.create_stats()
+        with open(path, 'wb') as file:
+            marshal.dump(self.stats, file)
+
+    def get_folded_stacks(self) -> str:
+        """
+        Get the call stacks in the folded format of `flamegraph.pl`: the semicolon-separated method names
+        and the exclusive time in microseconds on each line.
+        """
+        lines: List[str] = []
+        pending: List[Tuple[str, CallNode]] = [
+            (self.get_name(index), child) for index, child in reversed(list(self.call_tree.children.items()))
+        ]
+        while pending:
+            stack, node = pending.pop()
+            time = round(node.own_time * 1000000)
+            if time:
+                lines.append(f'{stack} {time}')
+            pending.extend(
+                (f'{stack};{self.get_name(index)}', child) for index, child in reversed(list(node.children.items()))
+            )
+        return '\n'.join(lines)
+
+
+class Profiler:
+    """
+    Base of the profilers. Use a profiler as a context manager, which gives the profile being filled in.
+    """
+
+    def __init__(self, machine: avm2.vm.VirtualMachine):
+        self.machine = machine
+        self.profile = Profile()
+
+    def __enter__(self) -> Profile:
+        self.start()
+        return self.profile
+
+    def __exit__(self, *args: Any):
+        self.stop()
+
+    def start(self):
+        if self.machine.profiler is not None:
+            raise ValueError('the virtual machine is already being profiled')
+        self.machine.profiler = self
+
+    def stop(self) -> Profile:
+        self.machine.profiler = None
+        program = self.machine.program
+        indices = {*self.profile.methods, *(index for edge in self.profile.callers for index in edge)}
+        self.profile.names.update((index, program.get_method_name(index)) for index in indices)
+        return self.profile
+
+    def record_call(
+        self,
+        caller_index: Optional[ABCMethodIndex],
+        index: ABCMethodIndex,
+    ) -> Tuple[MethodStatistics, ...]:
+        """
+        Get the statistics of the method and of the call edge, if any, to update.
+        """
+        try:
+            statistics = self.profile.methods[index]
+        except KeyError:
+            statistics = self.profile.methods[index] = MethodStatistics()
+        if caller_index is None:
+            return statistics,
+        try:
+            edge_statistics = self.profile.callers[caller_index, index]
+        except KeyError:
+            edge_statistics = self.profile.callers[caller_index, index] = MethodStatistics()
+        return statistics, edge_statistics
+
+
+# Deterministic profiling.
+# ----------------------------------------------------------------------------------------------------------------------
+
+@dataclass
+class Entry:
+    """
+    Running method call.
+    """
+
+    index: ABCMethodIndex
+    node: CallNode
+    start_time: float
+    child_time: float = 0.0
+
+
+class DeterministicProfiler(Profiler):
+    def __init__(self, machine: avm2.vm.VirtualMachine):
+        super().__init__(machine)
+        self.entries: List[Entry] = []
+        self.depths: DefaultDict[ABCMethodIndex, int] = defaultdict(int)  # number of running calls of each method
+        self.site_counters = SiteCounters(machine)
+        self.execute_instrumented_frame = avm2.vm.make_execute_frame(self.site_counters.get_array, self.exit)
+
+    def start(self):
+        super().start()
+        # Instance attributes take precedence over the methods.
+        self.machine.enter_method = self.enter_method
+        self.machine.execute_frame = self.execute_frame
+
+    def stop(self) -> Profile:
+        del self.machine.enter_method
+        del self.machine.execute_frame
+        self.unwind(0)
+        self.site_counters.collect(self.profile.hit_counts)
+        return super().stop()
+
+    def enter(self, index: ABCMethodIndex):
+        parent = self.entries[-1].node if self.entries else self.profile.call_tree
+        self.depths[index] += 1
+        self.entries.append(Entry(index, parent.get_child(index), perf_counter()))
+
+    def exit(self):
+        entry = self.entries.pop()
+        total_time = perf_counter() - entry.start_time
+        own_time = total_time - entry.child_time
+        entry.node.own_time += own_time
+        self.depths[entry.index] -= 1
+        is_primitive = not self.depths[entry.index]
+        caller_index = None
+        if self.entries:
+            caller = self.entries[-1]
+            caller.child_time += total_time
+            caller_index = caller.index
+        for statistics in self.record_call(caller_index, entry.index):
+            statistics.calls += 1
+            statistics.own_time += own_time
+            if is_primitive:
+                statistics.primitive_calls += 1
+                statistics.total_time += total_time
+
+    def unwind(self, depth: int):
+        """
+        Exit the calls above the depth, which are interrupted by an exception.
+        """
+        while len(self.entries) > depth:
+            self.exit()
+
+    def enter_method(
+        self,
+        index: ABCMethodIndex,
+        this: Any,
+        args: Sequence[Any],
+        memoize: bool = True,
+    ) -> Tuple[Any, Optional[avm2.vm.Frame]]:
+        """
+        Same as `VirtualMachine.enter_method`. An interpreted call is exited by `execute_frame` when it returns.
+        """
+        depth = len(self.entries)
+        self.enter(index)
+        try:
+            value, frame = avm2.vm.VirtualMachine.enter_method(self.machine, index, this, args, memoize)
+        except BaseException:
+            self.unwind(depth)
+            raise
+        if frame is None:
+            self.exit()
+        return value, frame
+
+    def execute_frame(self, frame: avm2.vm.Frame) -> Any:
+        """
+        Same as `VirtualMachine.execute_frame`, but counts the instructions and exits the returning calls.
+        """
+        depth = len(self.entries) - (frame.method_index is not None)
+        try:
+            return self.execute_instrumented_frame(self.machine, frame)
+        except BaseException:
+            self.unwind(depth)
+            raise
+
+
+# Sampling profiling.
+# ----------------------------------------------------------------------------------------------------------------------
+
+class SamplingProfiler(Profiler):
+    def __init__(self, machine: avm2.vm.VirtualMachine, interval: float):
+        """
+        `interval` is the CPU time in seconds between the samples.
+        """
+        super().__init__(machine)
+        self.interval = interval
+        self.body_to_method: Dict[ABCMethodBodyIndex, ABCMethodIndex] = {
+            body_index: index for index, body_index in machine.method_to_body.items()
+        }
+        self.previous_handler: Any = None
+
+    def start(self):
+        if not hasattr(signal, 'setitimer'):
+            raise NotImplementedError('sampling requires `signal.setitimer`, which is Unix only')
+        super().start()
+        self.previous_handler = signal.signal(signal.SIGPROF, self.handle_signal)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self) -> Profile:
+        signal.setitimer(signal.ITIMER_PROF, 0.0)
+        signal.signal(signal.SIGPROF, self.previous_handler)
+        return super().stop()
+
+    def handle_signal(self, signal_number: int, python_frame: Optional[FrameType]):
+        stack = self.get_stack(python_frame)
+        if not stack:
+            # Not in the AS3 code.
+            return
+        self.profile.sample_count += 1
+        interval = self.interval
+        node = self.profile.call_tree
+        caller_index = None
+        for depth, index in enumerate(stack):
+            node = node.get_child(index)
+            is_primitive = index not in stack[:depth]
+            for statistics in self.record_call(caller_index, index):
+                if is_primitive:
+                    statistics.total_time += interval
+            caller_index = index
+        node.own_time += interval
+        for statistics in self.record_call(stack[-2] if len(stack) > 1 else None, stack[-1]):
+            statistics.own_time += interval
+
+    def get_stack(self, python_frame: Optional[FrameType]) -> List[ABCMethodIndex]:
+        """
+        Get the AS3 call stack, the innermost call last.
+        """
+        execute_frame_code = avm2.vm.VirtualMachine.execute_frame.__code__
+        python_frames: List[FrameType] = []
+        while python_frame is not None:
+            python_frames.append(python_frame)
+            python_frame = python_frame.f_back
+        stack: List[ABCMethodIndex] = []
+        for python_frame in reversed(python_frames):
+            code = python_frame.f_code
+            if code is execute_frame_code:
+                locals_ = python_frame.f_locals
+                # The loop may be interrupted before it has its frame stack.
+                for frame in (*locals_.get('frames', ()), locals_['frame']):
+                    if frame.method_index is not None:
+                        stack.append(frame.method_index)
+            elif code.co_filename.startswith('<method body ') and code.co_name.startswith(COMPILED_METHOD_PREFIX):
+                body_index = ABCMethodBodyIndex(int(code.co_name[len(COMPILED_METHOD_PREFIX):]))
+                stack.append(self.body_to_method[body_index])
+        return stack
@@ -0,0 +1,174 @@
+"""
+Static purity analysis of methods.
+
+A method is pure if its result depends on its arguments only and calling it changes nothing. The analysis is
+conservative: a method body may only contain instructions which work on registers, the operand stack and constants,
+and calls of other pure methods. Reading properties is not allowed either, since they may change between calls.
+"""
+
+from __future__ import annotations
+
+from typing import FrozenSet, Optional, Set, Type
+
+import avm2.vm
+from avm2.abc.instructions import (
+    Add,
+    AddInteger,
+    AsType,
+    BitAnd,
+    BitNot,
+    BitOr,
+    BitXor,
+    CallStatic,
+    Coerce,
+    CoerceAny,
+    CoerceString,
+    ConvertToBoolean,
+    ConvertToDouble,
+    ConvertToInteger,
+    ConvertToString,
+    ConvertToUnsignedInteger,
+    Debug,
+    DebugFile,
+    DebugLine,
+    DecLocal,
+    DecLocalInteger,
+    Decrement,
+    DecrementInteger,
+    Divide,
+    Dup,
+    EqualsOperation,
+    GetLocal,
+    GetLocal0,
+    GetLocal1,
+    GetLocal2,
+    GetLocal3,
+    GetScopeObject,
+    GreaterEquals,
+    GreaterThan,
+    IfEq,
+    IfFalse,
+    IfGE,
+    IfGT,
+    IfLE,
+    IfLT,
+    IfNE,
+    IfNGE,
+    IfNGT,
+    IfNLE,
+    IfNLT,
+    IfStrictEq,
+    IfStrictNE,
+    IfTrue,
+    IncLocal,
+    IncLocalInteger,
+    Increment,
+    IncrementInteger,
+    Instruction,
+    IsType,
+    Jump,
+    Kill,
+    Label,
+    LeftShift,
+    LessEquals,
+    LessThan,
+    LookupSwitch,
+    Modulo,
+    Multiply,
+    MultiplyInteger,
+    Negate,
+    NegateInteger,
+    Nop,
+    Not,
+    Pop,
+    PopScope,
+    PushByte,
+    PushDouble,
+    PushFalse,
+    PushInteger,
+    PushNaN,
+    PushNull,
+    PushScope,
+    PushShort,
+    PushString,
+    PushTrue,
+    PushUndefined,
+    PushUnsignedInteger,
+    ReturnValue,
+    ReturnVoid,
+    RightShift,
+    SetLocal,
+    SetLocal0,
+    SetLocal1,
+    SetLocal2,
+    SetLocal3,
+    SignExtend1,
+    SignExtend8,
+    SignExtend16,
+    StrictEquals,
+    Subtract,
+    SubtractInteger,
+    Swap,
+    Throw,
+    TypeOf,
+    UnsignedRightShift,
+    decode_code,
+)
+from avm2.abc.types import ABCMethodIndex
+
+pure_instructions: FrozenSet[Type[Instruction]] = frozenset({
+    Add, AddInteger, AsType, BitAnd, BitNot, BitOr, BitXor,
+    Coerce, CoerceAny, CoerceString,
+    ConvertToBoolean, ConvertToDouble, ConvertToInteger, ConvertToString, ConvertToUnsignedInteger,
+    Debug, DebugFile, DebugLine,
+    DecLocal, DecLocalInteger, Decrement, DecrementInteger, Divide, Dup, EqualsOperation,
+    GetLocal, GetLocal0, GetLocal1, GetLocal2, GetLocal3, GetScopeObject, GreaterEquals, GreaterThan,
+    IfEq, IfFalse, IfGE, IfGT, IfLE, IfLT, IfNE, IfNGE, IfNGT, IfNLE, IfNLT, IfStrictEq, IfStrictNE, IfTrue,
+    IncLocal, IncLocalInteger, Increment, IncrementInteger, IsType,
+    Jump, Kill, Label, LeftShift, LessEquals, LessThan, LookupSwitch,
+    Modulo, Multiply, MultiplyInteger, Negate, NegateInteger, Nop, Not,
+    Pop, PopScope,
+    PushByte, PushDouble, PushFalse, PushInteger, PushNaN, PushNull, PushScope, PushShort, PushString, PushTrue,
+    PushUndefined, PushUnsignedInteger,
+    ReturnValue, ReturnVoid, RightShift,
+    SetLocal, SetLocal0, SetLocal1, SetLocal2, SetLocal3, SignExtend1, SignExtend8, SignExtend16,
+    StrictEquals, Subtract, SubtractInteger, Swap, Throw, TypeOf, UnsignedRightShift,
+})
+
+
+def is_pure(program: avm2.vm.Program, index: ABCMethodIndex, visiting: Optional[Set[ABCMethodIndex]] = None) -> bool:
+    """
+    Check whether the method is pure. Results are cached in `program.purity`.
+    """
+    try:
+        return program.purity[index]
+    except KeyError:
+        pass
+    try:
+        method_body_index = program.method_to_body[index]
+    except KeyError:
+        # Native method.
+        program.purity[index] = False
+        return False
+
+    visiting = set() if visiting is None else visiting
+    visiting.add(index)
+    # Decoded directly, so that the analysis does not disturb the code cache.
+    code = decode_code(program.abc_file.method_bodies[method_body_index].code)
+    pure = True
+    for instruction in code.instructions:
+        if isinstance(instruction, CallStatic):
+            # Recursive calls are assumed to be pure until proven otherwise.
+            if instruction.index not in visiting and not is_pure(program, instruction.index, visiting):
+                pure = False
+                break
+        elif type(instruction) not in pure_instructions:
+            pure = False
+            break
+    visiting.discard(index)
+
+    if pure and visiting:
+        # The result may depend on the optimistic assumption about a method which is still being analysed.
+        return True
+    program.purity[index] = pure
+    return pure
@@ -1,20 +1,193 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Dict, Optional, Tuple
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
 
 from avm2.abc.types import ABCClassIndex
 
+QName = Tuple[str, str]  # namespace and name
+
+
+# Objects which grow beyond this number of properties switch to their own `DictionaryShape`.
+MAX_SHARED_SHAPE_SIZE = 64
+
+
+class Shape:
+    """
+    Hidden class of objects: maps qualified names of properties to indices in `ASObject.values`.
+
+    Shapes form a transition tree. Adding a property to an object moves it to the child shape,
+    so objects which get the same properties in the same order share the shape. A transition adds either a single
+    property or a whole layout at once, such as the declared slots of instances.
+
+    A node stores only the properties added by its transition. The whole mapping, `slots`, is built on first access,
+    so that the intermediate shapes, which no object has anymore, cost next to nothing. Objects which grow past
+    `MAX_SHARED_SHAPE_SIZE` switch to the dictionary mode, which bounds the size of the tree paths.
+    """
+
+    # `slots` is left unset until it is needed, see `__getattr__`.
+    __slots__ = ('parent', 'keys', 'size', 'slots', 'transitions')
+
+    def __init__(self, parent: Optional[Shape] = None, keys: Tuple[QName, ...] = ()):
+        self.parent = parent
+        self.keys = keys  # added by the transition from the parent
+        self.size = len(keys) if parent is None else parent.size + len(keys)
+        self.transitions: Dict[Tuple[QName, ...], Shape] = {}
+
+    def __getattr__(self, name: str) -> Any:
+        # Only called when the attribute is not set.
+        if name != 'slots':
+            raise AttributeError(name)
+        keys = (key for keys in self.get_path() for key in keys)
+        slots = self.slots = {key: index for index, key in enumerate(keys)}
+        return slots
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}({list(self.slots)!r})'
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        # Pickled as the path from the root, so that the unpickled shape is a node of the same transition tree.
+        return follow_transitions, (self.get_path(),)
+
+    def get_path(self) -> Tuple[Tuple[QName, ...], ...]:
+        """
+        Get the keys of the transitions from the root.
+        """
+        path: List[Tuple[QName, ...]] = []
+        shape = self
+        while shape.parent is not None:
+            path.append(shape.keys)
+            shape = shape.parent
+        path.reverse()
+        return tuple(path)
+
+    def add(self, key: QName) -> Shape:
+        """
+        Get the shape with the property added.
+        """
+        if self.size >= MAX_SHARED_SHAPE_SIZE:
+            return DictionaryShape(dict(self.slots)).add(key)
+        return self.extend((key,))
+
+    def extend(self, keys: Tuple[QName, ...]) -> Shape:
+        """
+        Get the shape with the new properties added at once.
+        """
+        try:
+            return self.transitions[keys]
+        except KeyError:
+            shape = self.transitions[keys] = Shape(self, keys)
+            return shape
+
+
+class DictionaryShape(Shape):
+    """
+    Shape of a single object with many properties, such as a script or class object. It is not shared and is not
+    a part of the transition tree, the properties are added to its dictionary in place. The dictionary then moves
+    to a new shape, so that the shape identity still changes along with the properties, as the inline caches expect.
+    """
+
+    __slots__ = ()
+
+    def __init__(self, slots: Dict[QName, int]):
+        self.slots = slots
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def __reduce__(self) -> Tuple[Any, ...]:
+        return DictionaryShape, (dict(self.slots),)
+
+    def add(self, key: QName) -> Shape:
+        slots = self.slots
+        slots[key] = len(slots)
+        return DictionaryShape(slots)
+
+    def extend(self, keys: Tuple[QName, ...]) -> Shape:
+        slots = self.slots
+        for key in keys:
+            slots[key] = len(slots)
+        return DictionaryShape(slots)
+
+
+# Root of the transition tree.
+empty_shape = Shape()
+
+
+def get_shape(keys: Iterable[QName]) -> Shape:
+    """
+    Get the shape which has the properties added one by one in the order.
+    """
+    shape = empty_shape
+    for key in keys:
+        shape = shape.add(key)
+    return shape
+
+
+def follow_transitions(path: Iterable[Tuple[QName, ...]]) -> Shape:
+    """
+    Get the shape at the end of the transition path from the root, see `Shape.get_path`.
+    """
+    shape = empty_shape
+    for keys in path:
+        shape = shape.extend(keys)
+    return shape
+
 
 @dataclass
 class ASObject:
     class_index: Optional[ABCClassIndex] = None
-    properties: Dict[Tuple[str, str], ASObject] = field(default_factory=dict)
+    shape: Shape = field(default=empty_shape, repr=False)
+    values: List[Any] = field(default_factory=list, repr=False)
+
+    def __init__(
+        self,
+        class_index: Optional[ABCClassIndex] = None,
+        properties: Optional[Mapping[QName, Any]] = None,
+        shape: Shape = empty_shape,
+        dictionary: bool = False,
+    ):
+        """
+        `dictionary` gives the object its own shape from the beginning, see `DictionaryShape`.
+        This is meant for objects which are the only ones of their kind and have many properties.
+        """
+        self.class_index = class_index
+        self.shape = DictionaryShape(dict(shape.slots)) if dictionary else shape
+        self.values = [undefined] * len(shape)
+        if properties:
+            for key, value in properties.items():
+                self.set_property(key, value)
+
+    @property
+    def properties(self) -> Dict[QName, Any]:
+        """
+        Get a copy of the properties.
+        """
+        values = self.values
+        return {key: values[index] for key, index in self.shape.slots.items()}
+
+    def get_property(self, key: QName) -> Any:
+        """
+        Get the property value or raise `KeyError`.
+        """
+        return self.values[self.shape.slots[key]]
+
+    def set_property(self, key: QName, value: Any):
+        try:
+            self.values[self.shape.slots[key]] = value
+        except KeyError:
+            self.shape = self.shape.add(key)
+            self.values.append(value)
 
 
 @dataclass
 class ASUndefined(ASObject):
-    pass
+    def __reduce__(self) -> str:
+        # There is the only `undefined`, also after unpickling.
+        return 'undefined'
 
 
 undefined = ASUndefined()
@@ -0,0 +1,168 @@
+"""
+Snapshots of the virtual machine heap.
+
+A snapshot contains the global, script and class objects along with the `Linking` tables and the initialisation
+timings, so that a virtual machine with the initialised scripts is restored without linking and running the
+initialisers again. The ABC file is immutable and is referenced by SHA-256 of its DoABC payload: the payload is
+passed to `restore` and is parsed lazily again, unless the already parsed ABC file is passed along.
+Decoded and compiled code and other caches belong to `avm2.vm.Program` and are not a part of a snapshot.
+
+The snapshot format is:
+
+- `MAGIC`,
+- `u16` format version,
+- `u8` length of the library version and the library version itself,
+- 32 bytes of the payload SHA-256,
+- pickled `Heap`, where the ABC file is a persistent reference.
+
+Shapes are pickled as their transition paths and are restored into the shape transition tree of the process,
+dictionary shapes are pickled as dictionaries.
+Since snapshots are pickles, they must be trusted.
+"""
+
+from __future__ import annotations
+
+import gc
+import hashlib
+import io
+import pickle
+from dataclasses import dataclass
+from struct import Struct
+from typing import Any, Dict, Optional, Union
+
+import avm2
+import avm2.vm
+from avm2.abc.types import ABCClassIndex, ABCFile, ABCScriptIndex
+from avm2.exceptions import ASException
+from avm2.io import MemoryViewReader
+from avm2.runtime import ASObject
+
+MAGIC = b'AVMS'
+FORMAT_VERSION = 1
+PICKLE_PROTOCOL = 4  # the highest one of Python 3.7
+ABC_FILE_ID = 'abc_file'
+
+U16 = Struct('<H')
+
+
+class SnapshotError(ASException):
+    """
+    Raised when a snapshot is corrupted, is written by another version, or does not match the ABC file.
+    """
+
+
+@dataclass
+class Heap:
+    linking: avm2.vm.Linking
+    global_object: ASObject
+    script_objects: Dict[ABCScriptIndex, ASObject]
+    class_objects: Dict[ABCClassIndex, ASObject]
+    script_timings: Dict[ABCScriptIndex, avm2.vm.InitTiming]
+    class_timings: Dict[ABCClassIndex, avm2.vm.InitTiming]
+
+
+def get_digest(buffer: Union[memoryview, bytes]) -> bytes:
+    """
+    Get the digest which identifies the ABC file in snapshots, that is SHA-256 of the DoABC payload.
+    """
+    return hashlib.sha256(buffer).digest()
+
+
+def dump_snapshot(machine: avm2.vm.VirtualMachine) -> bytes:
+    """
+    Take the snapshot of the virtual machine.
+    """
+    if machine.abc_digest is None:
+        raise ValueError('the ABC file digest is unknown, pass `abc_digest` to the virtual machine')
+    heap = Heap(
+        linking=machine.linking,
+        global_object=machine.global_object,
+        script_objects=machine.script_objects,
+        class_objects=machine.class_objects,
+        script_timings=machine.script_timings,
+        class_timings=machine.class_timings,
+    )
+    file = io.BytesIO()
+    version = avm2.__version__.encode()
+    file.write(MAGIC + U16.pack(FORMAT_VERSION) + bytes([len(version)]) + version + machine.abc_digest)
+    HeapPickler(file, machine.abc_file).dump(heap)
+    return file.getvalue()
+
+
+def load_snapshot(
+    blob: bytes,
+    buffer: Union[memoryview, bytes],
+    abc_file: Optional[ABCFile] = None,
+    program: Optional[avm2.vm.Program] = None,
+    **kwargs: Any,
+) -> avm2.vm.VirtualMachine:
+    """
+    Restore the virtual machine from the snapshot, the buffer is the DoABC payload the snapshot was taken of.
+    `abc_file` is the ABC file already parsed from the buffer, so that the virtual machines restored
+    in the same process share it. Otherwise, the buffer is parsed lazily.
+    `program` is the program already made of the buffer, then the restored machine shares its code and caches.
+    Keyword arguments are passed to `VirtualMachine`.
+    """
+    buffer = buffer if isinstance(buffer, memoryview) else memoryview(buffer)
+    reader = MemoryViewReader(blob)
+    if reader.read(len(MAGIC)) != MAGIC:
+        raise SnapshotError('not a snapshot')
+    if reader.read_u16() != FORMAT_VERSION:
+        raise SnapshotError('snapshot format version mismatch')
+    if reader.read(reader.read_u8()).tobytes().decode() != avm2.__version__:
+        raise SnapshotError('library version mismatch')
+    digest = get_digest(buffer)
+    if reader.read(len(digest)) != digest:
+        raise SnapshotError('the snapshot is taken of another ABC file')
+    if program is not None and program.abc_digest != digest:
+        raise SnapshotError('the program is made of another ABC file')
+
+    if program is not None:
+        abc_file = program.abc_file
+    elif abc_file is None:
+        abc_file = ABCFile(MemoryViewReader(buffer), lazy=True)
+    # The heap is a lot of small objects, the garbage collector would be triggered many times for nothing.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        heap: Heap = HeapUnpickler(io.BytesIO(reader.read_all()), abc_file).load()
+    except (EOFError, pickle.UnpicklingError) as e:
+        raise SnapshotError('corrupted snapshot') from e
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    if program is None:
+        program = avm2.vm.Program(abc_file, linking=heap.linking, abc_digest=digest, **kwargs)
+        kwargs = {}
+    machine = avm2.vm.VirtualMachine(program, **kwargs)
+    machine.global_object = heap.global_object
+    machine.script_objects = heap.script_objects
+    machine.class_objects = heap.class_objects
+    machine.script_timings = heap.script_timings
+    machine.class_timings = heap.class_timings
+    return machine
+
+
+class HeapPickler(pickle.Pickler):
+    """
+    Pickles the ABC file as a persistent reference instead of its contents.
+    """
+
+    def __init__(self, file: Any, abc_file: ABCFile):
+        super().__init__(file, protocol=PICKLE_PROTOCOL)
+        self.abc_file = abc_file
+
+    def persistent_id(self, obj: Any) -> Optional[str]:
+        return ABC_FILE_ID if obj is self.abc_file else None
+
+
+class HeapUnpickler(pickle.Unpickler):
+    def __init__(self, file: Any, abc_file: ABCFile):
+        super().__init__(file)
+        self.abc_file = abc_file
+
+    def persistent_load(self, pid: Any) -> Any:
+        if pid != ABC_FILE_ID:
+            raise pickle.UnpicklingError(f'unknown persistent ID: {pid!r}')
+        return self.abc_file
@@ -2,57 +2,164 @@ from __future__ import annotations
 
 import lzma
 import zlib
-from typing import Iterable, Union
+from os import PathLike
+from typing import Any, Collection, Iterable, List, Optional, Tuple, Union
 
-from avm2.io import MemoryViewReader
+from avm2.io import MemoryViewReader, map_file
 from avm2.swf.enums import Signature
-from avm2.swf.types import Tag, TagType
+from avm2.swf.types import SWFIndex, Tag, TagType
 
+# Size of the compressed input which is fed to a decompressor at once.
+CHUNK_SIZE = 65536
 
-def parse_swf(input_: Union[memoryview, bytes]) -> Iterable[Tag]:
+# Long tag header: two-byte tag code and length and four-byte length.
+MAX_TAG_HEADER_SIZE = 6
+
+# RECT record with 31-bit fields, frame rate and frame count.
+MAX_HEADER_SIZE = 17 + 4
+
+
+def parse_swf(input_: Union[memoryview, bytes], types: Optional[Collection[TagType]] = None) -> Iterable[Tag]:
     """
     Parse SWF file and get an iterable of its tags.
+    Compressed files are decompressed incrementally, as tags are being read.
+    `types` limits the tag types to read, bodies of the other tags are skipped.
+    """
+    reader, decompressor = read_header(input_)
+    return read_tags(reader, decompressor, types)
+
+
+def parse_swf_file(path: Union[str, PathLike], types: Optional[Collection[TagType]] = None) -> Iterable[Tag]:
+    """
+    Parse SWF file from the disk. The file is memory-mapped,
+    so tags of an uncompressed file are views of the mapping rather than copies.
+    """
+    return parse_swf(map_file(path), types)
+
+
+def index_swf(input_: Union[memoryview, bytes]) -> SWFIndex:
+    """
+    Parse SWF file and make an index of its tags.
+    """
+    reader, decompressor = read_header(input_)
+    codes: List[int] = []
+    offsets: List[int] = []
+    lengths: List[int] = []
+    for code, offset, length in read_tag_headers(reader, decompressor):
+        codes.append(code)
+        offsets.append(offset)
+        lengths.append(length)
+    return SWFIndex(buffer=reader.buffer, codes=codes, offsets=offsets, lengths=lengths)
+
+
+def read_header(input_: Union[memoryview, bytes]) -> Tuple[MemoryViewReader, Optional[Decompressor]]:
+    """
+    Read SWF file header and get a reader which is positioned at the first tag.
     """
     reader = MemoryViewReader(input_)
     signature = Signature(reader.read_u8())
     assert reader.read_u16() == 0x5357
     reader.skip(1)  # version
-    reader.skip(4)  # file length
-    reader = decompress(reader, signature)
+    file_length = reader.read_u32()
+    decompressor = make_decompressor(reader, signature, file_length - 8)
+    if decompressor is not None:
+        decompressor.fill(MAX_HEADER_SIZE)
+        reader = decompressor.reader
     reader.skip_rect()
     reader.skip(4)  # frame rate and frame count
-    return read_tags(reader)
+    return reader, decompressor
 
 
-def decompress(reader: MemoryViewReader, signature: Signature) -> MemoryViewReader:
+def make_decompressor(reader: MemoryViewReader, signature: Signature, length: int) -> Optional[Decompressor]:
     """
-    Decompress the rest of an SWF file, depending on its signature.
+    Make decompressor of the rest of an SWF file, depending on its signature.
+    `None` means that the file is not compressed.
     """
     if signature == Signature.UNCOMPRESSED:
-        return reader
+        return None
     if signature == Signature.LZMA:
         # https://stackoverflow.com/a/39777419/359730
         reader.skip(4)  # skip compressed length
-        return MemoryViewReader(lzma.decompress(reader.read(5).tobytes() + b'\xFF\xFF\xFF\xFF\xFF\xFF\xFF\xFF' + reader.read_all().tobytes()))
+        decompressor = Decompressor(reader, lzma.LZMADecompressor(lzma.FORMAT_ALONE), length)
+        # LZMA properties and unknown uncompressed length.
+        decompressor.feed(reader.read(5).tobytes() + b'\xFF\xFF\xFF\xFF\xFF\xFF\xFF\xFF')
+        return decompressor
     if signature == Signature.ZLIB:
-        return MemoryViewReader(zlib.decompress(reader.read_all()))
+        return Decompressor(reader, zlib.decompressobj(), length)
     assert False, 'unreachable code'
 
 
-def read_tags(reader: MemoryViewReader) -> Iterable[Tag]:
+class Decompressor:
+    """
+    Decompresses an SWF file on demand.
+
+    The output goes to a buffer which is preallocated from the file length in the SWF header, so that memory views
+    of already decompressed tags stay valid. `reader` is a reader of the decompressed part.
+    """
+
+    def __init__(self, input_: MemoryViewReader, decompressor: Any, length: int):
+        self.input = input_
+        self.decompressor = decompressor
+        self.buffer = bytearray(length)
+        self.size = 0
+        self.reader = MemoryViewReader(memoryview(self.buffer)[:0])
+
+    def __repr__(self) -> str:
+        return f'Decompressor(size={self.size!r}, capacity={len(self.buffer)!r}, eof={self.is_eof()!r})'
+
+    def is_eof(self) -> bool:
+        return self.decompressor.eof or self.input.is_eof()
+
+    def fill(self, size: int):
+        """
+        Decompress the stream until at least `size` bytes are available or the stream ends.
+        """
+        while self.size < size and not self.is_eof():
+            self.feed(self.input.read(CHUNK_SIZE))
+        self.reader.buffer = memoryview(self.buffer)[:self.size]
+
+    def feed(self, data: Union[memoryview, bytes]):
+        output = self.decompressor.decompress(data)
+        end = self.size + len(output)
+        if end > len(self.buffer):
+            # The file length in the header is wrong. The old buffer stays alive as long as someone refers to it.
+            self.buffer = self.buffer[:self.size] + bytearray(max(end - self.size, len(self.buffer)))
+        self.buffer[self.size:end] = output
+        self.size = end
+
+
+def read_tags(
+    reader: MemoryViewReader,
+    decompressor: Optional[Decompressor] = None,
+    types: Optional[Collection[TagType]] = None,
+) -> Iterable[Tag]:
     """
     Read tags from the stream and get an iterable of tags.
+    Tags of unknown types are skipped.
+    """
+    codes = {type_.value for type_ in (TagType if types is None else types)}
+    for code, offset, length in read_tag_headers(reader, decompressor):
+        if code in codes:
+            yield Tag(type_=TagType(code), raw=reader.buffer[offset:offset + length])
+
+
+def read_tag_headers(reader: MemoryViewReader, decompressor: Optional[Decompressor] = None) -> Iterable[Tuple[int, int, int]]:
+    """
+    Read tag headers from the stream and get an iterable of tag codes, body offsets and lengths.
+    The reader skips a tag body by the time its header is yielded.
     """
-    while not reader.is_eof():
+    while True:
+        if decompressor is not None and reader.position + MAX_TAG_HEADER_SIZE > decompressor.size:
+            decompressor.fill(reader.position + MAX_TAG_HEADER_SIZE)
+        if reader.is_eof():
+            break
         code_length = reader.read_u16()
         length = code_length & 0b111111
         if length == 0x3F:
             # Long tag header.
             length = reader.read_u32()
-        try:
-            type_ = TagType(code_length >> 6)
-        except ValueError:
-            # Unknown tag type. Skip the tag.
-            reader.skip(length)
-        else:
-            yield Tag(type_=type_, raw=reader.read(length))
+        if decompressor is not None and reader.position + length > decompressor.size:
+            decompressor.fill(reader.position + length)
+        offset = reader.position
+        reader.skip(length)
+        yield code_length >> 6, offset, length
@@ -1,6 +1,8 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Union
 
 from avm2.swf.enums import DoABCTagFlags, TagType
 from avm2.io import MemoryViewReader
@@ -12,6 +14,44 @@ class Tag:
     raw: memoryview
 
 
+@dataclass
+class SWFIndex:
+    """
+    Tags of an SWF file. `offsets` and `lengths` point to the tag bodies in `buffer`.
+    Tags of unknown types are indexed too, `codes` are their raw type codes.
+    """
+
+    buffer: memoryview
+    codes: List[int]
+    offsets: List[int]
+    lengths: List[int]
+    indices: Dict[int, List[int]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.indices = {}
+        for index, code in enumerate(self.codes):
+            self.indices.setdefault(code, []).append(index)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __getitem__(self, index: int) -> Tag:
+        offset = self.offsets[index]
+        return Tag(type_=TagType(self.codes[index]), raw=self.buffer[offset:offset + self.lengths[index]])
+
+    def count(self, type_: Union[TagType, int]) -> int:
+        return len(self.indices.get(type_, ()))
+
+    def counts(self) -> Counter[int]:
+        return Counter({code: len(indices) for code, indices in self.indices.items()})
+
+    def find(self, type_: Union[TagType, int]) -> Iterator[Tag]:
+        """
+        Get the tags of the type in the file order.
+        """
+        return (self[index] for index in self.indices.get(type_, ()))
+
+
 @dataclass
 class DoABCTag:
     flags: DoABCTagFlags
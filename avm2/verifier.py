@@ -0,0 +1,545 @@
+"""
+Verifies method bodies before they are executed.
+
+The verifier walks all the reachable instructions once and tracks the operand stack and the local scope stack.
+It checks that:
+
+- the stacks never underflow and never grow beyond `max_stack` and `max_scope_depth`,
+- the stack and scope depths are the same on all the paths which join at an instruction,
+- jumps and exception handlers target instruction boundaries inside the code,
+- constant pool, method, class and register indices are in range.
+
+Simple operand types are inferred along the way. Verified code runs without the checks,
+see `VirtualMachine.execute_frame`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import avm2.vm
+from avm2.abc.instructions import (
+    Add,
+    AddInteger,
+    ApplyType,
+    AsType,
+    AsTypeLate,
+    BitAnd,
+    BitNot,
+    BitOr,
+    BitXor,
+    Call,
+    CallMethod,
+    CallPropLex,
+    CallPropVoid,
+    CallProperty,
+    CallStatic,
+    CallSuper,
+    CallSuperVoid,
+    CheckFilter,
+    Coerce,
+    CoerceAny,
+    CoerceString,
+    Construct,
+    ConstructProp,
+    ConstructSuper,
+    ConvertToBoolean,
+    ConvertToDouble,
+    ConvertToInteger,
+    ConvertToObject,
+    ConvertToString,
+    ConvertToUnsignedInteger,
+    DXNS,
+    DXNSLate,
+    Debug,
+    DebugFile,
+    DebugLine,
+    DecLocal,
+    DecLocalInteger,
+    DecodedCode,
+    Decrement,
+    DecrementInteger,
+    DeleteProperty,
+    Divide,
+    Dup,
+    EqualsOperation,
+    EscXAttr,
+    EscXElem,
+    FindPropStrict,
+    FindProperty,
+    GetDescendants,
+    GetGlobalScope,
+    GetGlobalSlot,
+    GetLex,
+    GetLocal,
+    GetLocal0,
+    GetLocal1,
+    GetLocal2,
+    GetLocal3,
+    GetProperty,
+    GetScopeObject,
+    GetSlot,
+    GetSuper,
+    GreaterEquals,
+    GreaterThan,
+    HasNext,
+    HasNext2,
+    IfEq,
+    IfFalse,
+    IfGE,
+    IfGT,
+    IfLE,
+    IfLT,
+    IfNE,
+    IfNGE,
+    IfNGT,
+    IfNLE,
+    IfNLT,
+    IfStrictEq,
+    IfStrictNE,
+    IfTrue,
+    In,
+    IncLocal,
+    IncLocalInteger,
+    Increment,
+    IncrementInteger,
+    InitProperty,
+    InstanceOf,
+    Instruction,
+    IsType,
+    IsTypeLate,
+    Jump,
+    Kill,
+    Label,
+    LeftShift,
+    LessEquals,
+    LessThan,
+    LoadFloat32,
+    LoadFloat64,
+    LoadInteger16,
+    LoadInteger32,
+    LoadInteger8,
+    LookupSwitch,
+    Modulo,
+    Multiply,
+    MultiplyInteger,
+    Negate,
+    NegateInteger,
+    NewActivation,
+    NewArray,
+    NewCatch,
+    NewClass,
+    NewFunction,
+    NewObject,
+    NextName,
+    NextValue,
+    Nop,
+    Not,
+    Pop,
+    PopScope,
+    PushByte,
+    PushDouble,
+    PushFalse,
+    PushInteger,
+    PushNaN,
+    PushNamespace,
+    PushNull,
+    PushScope,
+    PushShort,
+    PushString,
+    PushTrue,
+    PushUndefined,
+    PushUnsignedInteger,
+    PushWith,
+    ReturnValue,
+    ReturnVoid,
+    RightShift,
+    SetGlobalSlot,
+    SetLocal,
+    SetLocal0,
+    SetLocal1,
+    SetLocal2,
+    SetLocal3,
+    SetProperty,
+    SetSlot,
+    SetSuper,
+    SignExtend1,
+    SignExtend16,
+    SignExtend8,
+    StoreFloat32,
+    StoreFloat64,
+    StoreInteger16,
+    StoreInteger32,
+    StoreInteger8,
+    StrictEquals,
+    Subtract,
+    SubtractInteger,
+    Swap,
+    Throw,
+    TypeOf,
+    UnsignedRightShift,
+)
+from avm2.abc.types import ABCMethodBodyIndex, ASMethodBody
+from avm2.cfg import conditional_jumps
+from avm2.exceptions import ASVerifyError
+
+# Operand types, named after ActionScript types. `ANY` is a value of an unknown type.
+ANY = '*'
+INT = 'int'
+UINT = 'uint'
+NUMBER = 'Number'
+BOOLEAN = 'Boolean'
+STRING = 'String'
+NULL = 'null'
+VOID = 'void'
+
+numeric_types = frozenset({INT, UINT, NUMBER})
+
+# Numbers of values popped and pushed by the instructions with the fixed stack effect.
+fixed_effects: Dict[Type[Instruction], Tuple[int, int]] = {
+    **dict.fromkeys((
+        DXNS, Debug, DebugFile, DebugLine, DecLocal, DecLocalInteger, IncLocal, IncLocalInteger,
+        Jump, Kill, Label, Nop, PopScope, ReturnVoid,
+    ), (0, 0)),
+    **dict.fromkeys((
+        GetGlobalScope, GetGlobalSlot, GetLocal, GetLocal0, GetLocal1, GetLocal2, GetLocal3, GetScopeObject,
+        HasNext2, NewActivation, NewCatch, NewFunction,
+        PushByte, PushDouble, PushFalse, PushInteger, PushNaN, PushNamespace, PushNull, PushShort, PushString,
+        PushTrue, PushUndefined, PushUnsignedInteger,
+    ), (0, 1)),
+    **dict.fromkeys((
+        DXNSLate, IfFalse, IfTrue, LookupSwitch, Pop, PushScope, PushWith, ReturnValue, SetGlobalSlot,
+        SetLocal, SetLocal0, SetLocal1, SetLocal2, SetLocal3, Throw,
+    ), (1, 0)),
+    **dict.fromkeys((
+        AsType, BitNot, CheckFilter, Coerce, CoerceAny, CoerceString,
+        ConvertToBoolean, ConvertToDouble, ConvertToInteger, ConvertToObject, ConvertToString, ConvertToUnsignedInteger,
+        Decrement, DecrementInteger, EscXAttr, EscXElem, GetSlot, Increment, IncrementInteger, IsType,
+        LoadFloat32, LoadFloat64, LoadInteger8, LoadInteger16, LoadInteger32,
+        Negate, NegateInteger, NewClass, Not, SignExtend1, SignExtend8, SignExtend16, TypeOf,
+    ), (1, 1)),
+    **dict.fromkeys((
+        IfEq, IfGE, IfGT, IfLE, IfLT, IfNE, IfNGE, IfNGT, IfNLE, IfNLT, IfStrictEq, IfStrictNE, SetSlot,
+        StoreFloat32, StoreFloat64, StoreInteger8, StoreInteger16, StoreInteger32,
+    ), (2, 0)),
+    **dict.fromkeys((
+        Add, AddInteger, AsTypeLate, BitAnd, BitOr, BitXor, Divide, EqualsOperation, GreaterEquals, GreaterThan,
+        HasNext, In, InstanceOf, IsTypeLate, LeftShift, LessEquals, LessThan, Modulo, Multiply, MultiplyInteger,
+        NextName, NextValue, RightShift, StrictEquals, Subtract, SubtractInteger, UnsignedRightShift,
+    ), (2, 1)),
+    Dup: (1, 2),
+    Swap: (2, 2),
+}
+
+# Instructions with a multiname operand additionally pop the runtime name and namespace, and the arguments if any.
+property_effects: Dict[Type[Instruction], Tuple[int, int]] = {
+    CallPropLex: (1, 1),
+    CallPropVoid: (1, 0),
+    CallProperty: (1, 1),
+    CallSuper: (1, 1),
+    CallSuperVoid: (1, 0),
+    ConstructProp: (1, 1),
+    DeleteProperty: (1, 1),
+    FindPropStrict: (0, 1),
+    FindProperty: (0, 1),
+    GetDescendants: (1, 1),
+    GetLex: (0, 1),
+    GetProperty: (1, 1),
+    GetSuper: (1, 1),
+    InitProperty: (2, 0),
+    SetProperty: (2, 0),
+    SetSuper: (2, 0),
+}
+
+# Numbers of values popped besides the arguments, popped per argument, and pushed.
+argument_effects: Dict[Type[Instruction], Tuple[int, int, int]] = {
+    ApplyType: (1, 1, 1),
+    Call: (2, 1, 1),
+    CallMethod: (1, 1, 1),
+    CallStatic: (1, 1, 1),
+    Construct: (1, 1, 1),
+    ConstructSuper: (1, 1, 0),
+    NewArray: (0, 1, 1),
+    NewObject: (0, 2, 1),  # name and value per property
+}
+
+scope_effects: Dict[Type[Instruction], int] = {PushScope: 1, PushWith: 1, PopScope: -1}
+
+# Types of the values pushed, `ANY` if not listed.
+result_types: Dict[Type[Instruction], str] = {
+    **dict.fromkeys((
+        AddInteger, BitAnd, BitNot, BitOr, BitXor, ConvertToInteger, DecrementInteger, IncrementInteger, LeftShift,
+        LoadInteger8, LoadInteger16, LoadInteger32, MultiplyInteger, NegateInteger, PushByte, PushInteger, PushShort,
+        RightShift, SignExtend1, SignExtend8, SignExtend16, SubtractInteger,
+    ), INT),
+    **dict.fromkeys((ConvertToUnsignedInteger, PushUnsignedInteger, UnsignedRightShift), UINT),
+    **dict.fromkeys((
+        ConvertToDouble, Decrement, Divide, Increment, LoadFloat32, LoadFloat64, Modulo, Multiply, Negate,
+        PushDouble, PushNaN, Subtract,
+    ), NUMBER),
+    **dict.fromkeys((
+        ConvertToBoolean, DeleteProperty, EqualsOperation, GreaterEquals, GreaterThan, HasNext2, In, InstanceOf,
+        IsType, IsTypeLate, LessEquals, LessThan, Not, PushFalse, PushTrue, StrictEquals,
+    ), BOOLEAN),
+    **dict.fromkeys((CoerceString, ConvertToString, EscXAttr, EscXElem, PushString, TypeOf), STRING),
+    HasNext: INT,
+    PushNull: NULL,
+    PushUndefined: VOID,
+}
+
+# Pools indexed by the `index` operand, and the minimal valid index.
+indexed_operands: Dict[Type[Instruction], Tuple[str, int]] = {
+    **dict.fromkeys(property_effects, ('multinames', 1)),
+    **dict.fromkeys((AsType, Coerce, IsType), ('multinames', 1)),
+    **dict.fromkeys((CallMethod, CallStatic, NewFunction), ('methods', 0)),
+    **dict.fromkeys((DXNS, DebugFile, PushString), ('strings', 1)),
+    NewCatch: ('exceptions', 0),
+    NewClass: ('classes', 0),
+    PushDouble: ('doubles', 1),
+    PushInteger: ('integers', 1),
+    PushNamespace: ('namespaces', 1),
+    PushUnsignedInteger: ('unsigned_integers', 1),
+}
+
+# Instructions which access the register specified by the `index` operand.
+register_operands = (DecLocal, DecLocalInteger, GetLocal, IncLocal, IncLocalInteger, Kill, SetLocal)
+fixed_registers: Dict[Type[Instruction], int] = {
+    GetLocal0: 0, GetLocal1: 1, GetLocal2: 2, GetLocal3: 3,
+    SetLocal0: 0, SetLocal1: 1, SetLocal2: 2, SetLocal3: 3,
+}
+
+terminators = (ReturnValue, ReturnVoid, Throw)
+
+
+@dataclass
+class Verification:
+    """
+    Result of a method body verification. The lists are indexed by instruction, `None` means unreachable code.
+    """
+
+    stack_types: List[Optional[Tuple[str, ...]]]  # operand types on the stack before the instruction
+    scope_depths: List[Optional[int]]  # local scope stack depth before the instruction
+    jump_indices: List[Optional[int]]  # target instruction of the jumps and branches
+    max_stack_depth: int
+    max_scope_depth: int
+
+    @property
+    def stack_depths(self) -> List[Optional[int]]:
+        return [None if types is None else len(types) for types in self.stack_types]
+
+
+def verify_method_body(
+    program: avm2.vm.Program,
+    index: ABCMethodBodyIndex,
+    method_body: ASMethodBody,
+    code: DecodedCode,
+) -> Verification:
+    """
+    Verify the decoded method body. Raises `ASVerifyError` if the method body is invalid.
+    """
+    return Verifier(program, index, method_body, code).verify()
+
+
+class Verifier:
+    def __init__(
+        self,
+        program: avm2.vm.Program,
+        index: ABCMethodBodyIndex,
+        method_body: ASMethodBody,
+        code: DecodedCode,
+    ):
+        self.program = program
+        self.index = index
+        self.method_body = method_body
+        self.code = code
+        constant_pool = program.constant_pool
+        self.pools: Dict[str, Sequence[Any]] = {
+            'integers': constant_pool.integers,
+            'unsigned_integers': constant_pool.unsigned_integers,
+            'doubles': constant_pool.doubles,
+            'strings': constant_pool.strings,
+            'namespaces': constant_pool.namespaces,
+            'multinames': constant_pool.multinames,
+            'methods': program.abc_file.methods,
+            'classes': program.abc_file.classes,
+            'exceptions': method_body.exceptions,
+        }
+        instruction_count = len(code.instructions)
+        self.stack_types: List[Optional[Tuple[str, ...]]] = [None] * instruction_count
+        self.scope_depths: List[Optional[int]] = [None] * instruction_count
+        self.jump_indices: List[Optional[int]] = [None] * instruction_count
+        self.pending: List[int] = []
+
+    def verify(self) -> Verification:
+        if not self.code.instructions:
+            raise self.error(0, 'empty code')
+        self.merge(0, (), 0)
+        for exception_index, exception in enumerate(self.method_body.exceptions):
+            # The range is only compared against offsets, so it does not need to match instruction boundaries.
+            if not 0 <= exception.from_ <= exception.to <= self.code.offsets[-1]:
+                raise self.exception_error(
+                    exception_index, f'range {exception.from_}..{exception.to} is out of the code')
+            target = self.find_index(exception.target)
+            if target is None:
+                raise self.exception_error(exception_index, f'handler target {exception.target} is not an instruction')
+            # The handler starts with the exception on the stack and an empty local scope stack.
+            self.merge(target, (ANY,), 0)
+
+        instructions = self.code.instructions
+        while self.pending:
+            index = self.pending.pop()
+            instruction = instructions[index]
+            stack, scope_depth = self.execute(index, instruction)
+            for successor in self.get_successors(index, instruction):
+                self.merge(successor, stack, scope_depth)
+
+        return Verification(
+            stack_types=self.stack_types,
+            scope_depths=self.scope_depths,
+            jump_indices=self.jump_indices,
+            max_stack_depth=max(len(types) for types in self.stack_types if types is not None),
+            max_scope_depth=max(depth for depth in self.scope_depths if depth is not None),
+        )
+
+    def merge(self, index: int, stack: Tuple[str, ...], scope_depth: int):
+        """
+        Merge the state into the entry state of the instruction and schedule it if the state has changed.
+        """
+        old_stack = self.stack_types[index]
+        if old_stack is None:
+            self.stack_types[index] = stack
+            self.scope_depths[index] = scope_depth
+            self.pending.append(index)
+            return
+        if len(old_stack) != len(stack):
+            raise self.error(index, f'inconsistent stack depth: {len(old_stack)} and {len(stack)}')
+        if self.scope_depths[index] != scope_depth:
+            raise self.error(index, f'inconsistent scope depth: {self.scope_depths[index]} and {scope_depth}')
+        merged = tuple(old_type if old_type == type_ else ANY for old_type, type_ in zip(old_stack, stack))
+        if merged != old_stack:
+            self.stack_types[index] = merged
+            self.pending.append(index)
+
+    def execute(self, index: int, instruction: Instruction) -> Tuple[Tuple[str, ...], int]:
+        """
+        Check the instruction and get the stack types and scope depth after it.
+        """
+        type_ = type(instruction)
+        stack = self.stack_types[index]
+        scope_depth = self.scope_depths[index]
+        self.check_operands(index, instruction)
+
+        pop_count, push_count = self.get_stack_effect(index, instruction)
+        if pop_count > len(stack):
+            raise self.error(index, f'stack underflow: {type_.__name__} pops {pop_count} of {len(stack)}')
+        popped = stack[len(stack) - pop_count:]
+        if type_ is Dup:
+            pushed = popped * 2
+        elif type_ is Swap:
+            pushed = popped[::-1]
+        elif type_ is Add:
+            pushed = (get_add_type(*popped),)
+        else:
+            pushed = (result_types.get(type_, ANY),) * push_count
+        stack = stack[:len(stack) - pop_count] + pushed
+        if len(stack) > self.method_body.max_stack:
+            raise self.error(index, f'stack overflow: {len(stack)} > {self.method_body.max_stack}')
+
+        if type_ is GetScopeObject and instruction.index >= scope_depth:
+            raise self.error(index, f'scope index {instruction.index} out of range {scope_depth}')
+        scope_depth += scope_effects.get(type_, 0)
+        if scope_depth < 0:
+            raise self.error(index, 'scope stack underflow')
+        max_scope_depth = self.method_body.max_scope_depth - self.method_body.init_scope_depth
+        if scope_depth > max_scope_depth:
+            raise self.error(index, f'scope stack overflow: {scope_depth} > {max_scope_depth}')
+        return stack, scope_depth
+
+    def check_operands(self, index: int, instruction: Instruction):
+        type_ = type(instruction)
+        if type_ in indexed_operands:
+            pool, minimum = indexed_operands[type_]
+            if not minimum <= instruction.index < len(self.pools[pool]):
+                raise self.error(index, f'{pool} index {instruction.index} out of range')
+        if type_ in fixed_registers:
+            self.check_register(index, fixed_registers[type_])
+        elif type_ in register_operands:
+            self.check_register(index, instruction.index)
+        elif type_ is HasNext2:
+            self.check_register(index, instruction.object_reg)
+            self.check_register(index, instruction.index_reg)
+
+    def check_register(self, index: int, register: int):
+        if register >= self.method_body.local_count:
+            raise self.error(index, f'register {register} out of range {self.method_body.local_count}')
+
+    def get_stack_effect(self, index: int, instruction: Instruction) -> Tuple[int, int]:
+        """
+        Get numbers of values popped and pushed by the instruction.
+        """
+        type_ = type(instruction)
+        try:
+            return fixed_effects[type_]
+        except KeyError:
+            pass
+        if type_ in property_effects:
+            pop_count, push_count = property_effects[type_]
+            name = self.program.resolved_names[instruction.index]
+            if type_ is GetLex and (name.pop_name or name.pop_namespace):
+                raise self.error(index, 'runtime multiname in GetLex')
+            pop_count += name.pop_name + name.pop_namespace + getattr(instruction, 'arg_count', 0)
+            return pop_count, push_count
+        pop_count, argument_pop_count, push_count = argument_effects[type_]
+        return pop_count + argument_pop_count * instruction.arg_count, push_count
+
+    def get_successors(self, index: int, instruction: Instruction) -> Iterable[int]:
+        if isinstance(instruction, terminators):
+            return ()
+        if isinstance(instruction, LookupSwitch):
+            # Offsets of the switch are relative to the instruction start.
+            offset = self.code.offsets[index]
+            return [
+                self.get_index(index, offset + case_offset)
+                for case_offset in (instruction.default_offset, *instruction.case_offsets)
+            ]
+        if isinstance(instruction, (Jump, *conditional_jumps)):
+            target = self.jump_indices[index] = self.get_index(index, self.code.offsets[index + 1] + instruction.offset)
+            if isinstance(instruction, Jump):
+                return (target,)
+            successors = (target, index + 1)
+        else:
+            successors = (index + 1,)
+        if index + 1 == len(self.code.instructions):
+            raise self.error(index, 'execution falls off the end of the code')
+        return successors
+
+    def get_index(self, index: int, offset: int) -> int:
+        """
+        Get index of the instruction which starts at the jump target offset.
+        """
+        target = self.find_index(offset)
+        if target is None:
+            raise self.error(index, f'jump target {offset} is not an instruction')
+        return target
+
+    def find_index(self, offset: int) -> Optional[int]:
+        """
+        Get index of the instruction which starts at the offset, `None` if there is no such instruction.
+        """
+        target = self.code.offset_to_index.get(offset)
+        return None if target == len(self.code.instructions) else target
+
+    def error(self, index: int, message: str) -> ASVerifyError:
+        return ASVerifyError(f'method body {self.index}, offset {self.code.offsets[index]}: {message}')
+
+    def exception_error(self, exception_index: int, message: str) -> ASVerifyError:
+        return ASVerifyError(f'method body {self.index}, exception {exception_index}: {message}')
+
+
+def get_add_type(type_1: str, type_2: str) -> str:
+    if type_1 in numeric_types and type_2 in numeric_types:
+        return NUMBER
+    if type_1 == STRING or type_2 == STRING:
+        return STRING
+    return ANY
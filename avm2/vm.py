@@ -1,28 +1,80 @@
 from __future__ import annotations
 
-from collections import defaultdict
+import sys
 from dataclasses import dataclass, field
-from typing import Any, DefaultDict, Dict, Iterable, List, Tuple, Union
+from functools import lru_cache
+from itertools import islice
+from time import perf_counter
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, MutableSequence, Optional, Sequence, Tuple, Union
 
 import avm2.abc.instructions
-from avm2.abc.enums import ConstantKind, MethodFlags, TraitKind
+import avm2.compiler
+import avm2.counters
+import avm2.fusion
+import avm2.peephole
+import avm2.profiler
+import avm2.purity
+import avm2.snapshot
+import avm2.verifier
+from avm2.abc.enums import ConstantKind, MethodFlags, MultinameKind, TraitKind
+from avm2.abc.parser import LazyArray
 from avm2.abc.types import (
     ABCClassIndex,
     ABCFile,
     ABCMethodBodyIndex,
     ABCMethodIndex,
+    ABCMultinameIndex,
     ABCScriptIndex,
     ASMethodBody,
+    ASTrait,
 )
-from avm2.exceptions import ASJumpException, ASReturnException
+from avm2.exceptions import ASReferenceError, ASStackOverflowError
 from avm2.io import MemoryViewReader
-from avm2.runtime import ASObject, undefined
+from avm2.lru import LRUCache
+from avm2.runtime import ASObject, QName, Shape, empty_shape, undefined
 from avm2.swf.types import DoABCTag, Tag, TagType
 
+if TYPE_CHECKING:
+    import numpy
 
-class VirtualMachine:
-    def __init__(self, abc_file: ABCFile):
+    import avm2.batch
+
+
+class Program:
+    """
+    Code of an ABC file along with everything derived from it: the linking tables, decoded and compiled code,
+    and memoized results of pure methods. A program is immutable once linked, apart from the caches,
+    and is shared by the virtual machines which run it, see `VirtualMachine`.
+    """
+
+    def __init__(
+        self,
+        abc_file: ABCFile,
+        code_cache_size: Optional[int] = None,
+        compile_methods: bool = True,
+        linking: Optional[Linking] = None,
+        memoize_methods: bool = True,
+        memo_size: Optional[int] = 1024,
+        verify_methods: bool = True,
+        fuse_instructions: bool = True,
+        strip_instructions: bool = True,
+        abc_digest: Optional[bytes] = None,
+    ):
+        """
+        `code_cache_size` is the maximal number of decoded and compiled method bodies to keep, `None` means no limit.
+        `compile_methods` enables compilation of method bodies to Python functions, see `avm2.compiler`.
+        `linking` is the previously built linking of the same ABC file, see `avm2.cache`.
+        `memoize_methods` enables caching of results of pure methods, see `avm2.purity`.
+        `memo_size` is the maximal number of results to keep per method, `None` means no limit.
+        `verify_methods` enables verification of method bodies on decoding, see `avm2.verifier`.
+        Verified code runs on the faster interpreter path.
+        `fuse_instructions` enables superinstructions in the interpreted code, see `avm2.fusion`.
+        `strip_instructions` enables removal of debug, no-op and redundant instructions on decoding,
+        see `avm2.peephole`.
+        `abc_digest` identifies the ABC file in snapshots, see `avm2.snapshot.get_digest`.
+        """
         self.abc_file = abc_file
+        self.abc_digest = abc_digest
 
         # Quick access.
         self.constant_pool = abc_file.constant_pool
@@ -33,18 +85,44 @@ class VirtualMachine:
         self.namespaces = self.constant_pool.namespaces
 
         # Linking.
-        self.method_to_body = self.link_methods_to_bodies()
-        self.class_to_script = self.link_classes_to_scripts()
-        self.name_to_class = dict(self.link_names_to_classes())
-        self.name_to_method = dict(self.link_names_to_methods())
+        if linking is None:
+            resolved_names = self.link_resolved_names()
+            linking = Linking(
+                method_to_body=self.link_methods_to_bodies(),
+                class_to_script=self.link_classes_to_scripts(),
+                name_to_class=dict(self.link_names_to_classes()),
+                name_to_method=dict(self.link_names_to_methods()),
+                name_to_script=self.link_names_to_scripts(resolved_names),
+                resolved_names=resolved_names,
+            )
+        self.linking = linking
+        self.method_to_body = linking.method_to_body
+        self.class_to_script = linking.class_to_script
+        self.resolved_names = linking.resolved_names
+        self.name_to_class = linking.name_to_class
+        self.name_to_method = linking.name_to_method
+        self.name_to_script = linking.name_to_script
 
-        # Runtime.
-        self.class_objects: DefaultDict[ABCClassIndex, ASObject] = defaultdict(ASObject)  # FIXME: unsure, prototypes?
-        self.script_objects: DefaultDict[ABCScriptIndex, ASObject] = defaultdict(ASObject)  # FIXME: unsure, what is it?
-        self.global_object = ASObject(properties={
-            ('', 'Object'): ASObject(),
-            ('flash.utils', 'Dictionary'): ASObject(),
-        })  # FIXME: unsure, prototypes again?
+        # Caches.
+        self.decoded_code: LRUCache[ABCMethodBodyIndex, avm2.abc.instructions.DecodedCode] = LRUCache(code_cache_size)
+        self.verify_methods = verify_methods
+        self.fuse_instructions = fuse_instructions
+        self.strip_instructions = strip_instructions
+        self.compile_methods = compile_methods
+        self.compiled_code: LRUCache[ABCMethodBodyIndex, Optional[avm2.compiler.CompiledMethod]] = LRUCache(code_cache_size)
+        self.batch_code: LRUCache[ABCMethodBodyIndex, Optional[avm2.batch.BatchMethod]] = LRUCache(code_cache_size)
+        self.script_dependencies: Dict[ABCScriptIndex, List[ABCScriptIndex]] = {}
+        self.instance_shapes: Dict[ABCClassIndex, Shape] = {}
+        self.scope_lookup_sites: Dict[Tuple[ABCMethodBodyIndex, int], int] = {}  # see `get_scope_lookup_site`
+        self.method_names: Optional[Dict[ABCMethodIndex, str]] = None  # built on demand, see `get_method_name`
+
+        # Memoization.
+        # Results of pure methods do not depend on the heap, so they are shared too.
+        self.memoize_methods = memoize_methods
+        self.memo_size = memo_size
+        self.purity: Dict[ABCMethodIndex, bool] = {}
+        self.memos: Dict[ABCMethodIndex, Optional[LRUCache[Tuple[Any, ...], Any]]] = {}
+        self.memo_overrides: Dict[ABCMethodIndex, bool] = {}
 
     # Linking.
     # ------------------------------------------------------------------------------------------------------------------
@@ -53,7 +131,8 @@ class VirtualMachine:
         """
         Link methods and methods bodies.
         """
-        return {method_body.method_index: index for index, method_body in enumerate(self.abc_file.method_bodies)}
+        method_indices = read_first_fields(self.abc_file.method_bodies, 'method_index')
+        return {method_index: index for index, method_index in enumerate(method_indices)}
 
     def link_classes_to_scripts(self) -> Dict[ABCClassIndex, ABCScriptIndex]:
         return {
@@ -63,70 +142,659 @@ class VirtualMachine:
             if trait.kind == TraitKind.CLASS
         }
 
+    def link_names_to_scripts(self, resolved_names: List[Optional[ResolvedName]]) -> Dict[QName, ABCScriptIndex]:
+        """
+        Link qualified names of the script traits, that is the global names, and script indices.
+        """
+        return {
+            resolved_names[trait.name_index].qname: script_index
+            for script_index, script in enumerate(self.abc_file.scripts)
+            for trait in script.traits
+            if resolved_names[trait.name_index].qname is not None
+        }
+
     def link_names_to_classes(self) -> Iterable[Tuple[str, ABCClassIndex]]:
         """
         Link class names and class indices.
         """
         # FIXME: this is doubtful.
-        for index, instance in enumerate(self.abc_file.instances):
-            assert instance.name_index
-            yield self.multinames[instance.name_index].qualified_name(self.constant_pool), index
+        for index, name_index in enumerate(read_first_fields(self.abc_file.instances, 'name_index')):
+            assert name_index
+            yield self.multinames[name_index].qualified_name(self.constant_pool), index
 
     def link_names_to_methods(self) -> Iterable[Tuple[str, ABCMethodIndex]]:
         """
         Link method names and method indices.
         """
         # FIXME: this is doubtful.
-        for instance, class_ in zip(self.abc_file.instances, self.abc_file.classes):
-            qualified_class_name = self.multinames[instance.name_index].qualified_name(self.constant_pool)
+        for name_index, class_ in zip(read_first_fields(self.abc_file.instances, 'name_index'), self.abc_file.classes):
+            qualified_class_name = self.multinames[name_index].qualified_name(self.constant_pool)
             for trait in class_.traits:
                 if trait.kind in (TraitKind.GETTER, TraitKind.SETTER, TraitKind.METHOD):
                     qualified_trait_name = self.multinames[trait.name_index].qualified_name(self.constant_pool)
                     yield f'{qualified_class_name}.{qualified_trait_name}', trait.data.method_index
 
+    def link_resolved_names(self) -> List[Optional[ResolvedName]]:
+        """
+        Resolve strings and namespaces of all the multinames.
+        """
+        strings = [None if string is None else sys.intern(string) for string in self.strings]
+        namespaces = [
+            ANY_NAME if namespace is None else strings[namespace.name_index]
+            for namespace in self.namespaces
+        ]
+        namespace_sets = [
+            None if namespace_set is None else tuple(namespaces[index] for index in namespace_set.namespaces)
+            for namespace_set in self.constant_pool.ns_sets
+        ]
+        interned: Dict[ResolvedName, ResolvedName] = {}
+        resolved_names: List[Optional[ResolvedName]] = [None]
+        for multiname in self.multinames[1:]:
+            kind = multiname.kind
+            name = strings[multiname.name_index] if multiname.name_index else ANY_NAME
+            if kind in (MultinameKind.Q_NAME, MultinameKind.Q_NAME_A):
+                namespace = namespaces[multiname.namespace_index]
+                resolved_name = ResolvedName(kind, name, (namespace,), (namespace, name))
+            elif kind in (MultinameKind.RTQ_NAME, MultinameKind.RTQ_NAME_A):
+                resolved_name = ResolvedName(kind, name, pop_namespace=True)
+            elif kind in (MultinameKind.RTQ_NAME_L, MultinameKind.RTQ_NAME_LA):
+                resolved_name = ResolvedName(kind, pop_name=True, pop_namespace=True)
+            elif kind in (MultinameKind.MULTINAME, MultinameKind.MULTINAME_A):
+                resolved_name = ResolvedName(kind, name, namespace_sets[multiname.namespace_set_index])
+            elif kind in (MultinameKind.MULTINAME_L, MultinameKind.MULTINAME_LA):
+                resolved_name = ResolvedName(kind, namespaces=namespace_sets[multiname.namespace_set_index], pop_name=True)
+            elif kind == MultinameKind.TYPE_NAME:
+                resolved_name = ResolvedName(kind, type_indices=(multiname.q_name_index, *multiname.type_indices))
+            else:
+                assert False, 'unreachable code'
+            resolved_names.append(interned.setdefault(resolved_name, resolved_name))
+        return resolved_names
+
+    # Lookup.
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def lookup_class(self, qualified_name: str) -> ABCClassIndex:
+        return self.name_to_class[qualified_name]
+
+    def lookup_method(self, qualified_name: str) -> ABCMethodIndex:
+        return self.name_to_method[qualified_name]
+
+    def get_method_index(self, index_or_name: Union[ABCMethodIndex, str]) -> ABCMethodIndex:
+        if isinstance(index_or_name, int):
+            return ABCMethodIndex(index_or_name)
+        if isinstance(index_or_name, str):
+            return self.lookup_method(index_or_name)
+        raise ValueError(index_or_name)
+
+    def get_method_name(self, index: ABCMethodIndex) -> str:
+        """
+        Get the qualified name of the method. Methods without a name, such as initialisers and closures,
+        are named after their index.
+        """
+        if self.method_names is None:
+            self.method_names = {index: name for name, index in self.name_to_method.items()}
+        try:
+            return self.method_names[index]
+        except KeyError:
+            return f'method #{index}'
+
+    def get_script_name(self, script_index: ABCScriptIndex) -> str:
+        traits = self.abc_file.scripts[script_index].traits
+        if not traits:
+            return f'script #{script_index}'
+        namespace, name = self.resolved_names[traits[0].name_index].qname
+        return f'script {namespace}.{name}' if namespace else f'script {name}'
+
+    def get_script_dependencies(self, script_index: ABCScriptIndex) -> List[ABCScriptIndex]:
+        """
+        Get the other scripts which define the base classes and interfaces of the script classes.
+        They must be initialised first, since the classes are created by the script initialiser.
+        """
+        try:
+            return self.script_dependencies[script_index]
+        except KeyError:
+            pass
+        dependencies: Dict[ABCScriptIndex, None] = {}  # ordered set
+        for trait in self.abc_file.scripts[script_index].traits:
+            if trait.kind == TraitKind.CLASS:
+                for class_index in self.get_class_dependencies(trait.data.class_index):
+                    dependencies[self.class_to_script[class_index]] = None
+        dependencies.pop(script_index, None)
+        result = self.script_dependencies[script_index] = list(dependencies)
+        return result
+
+    def get_class_dependencies(self, class_index: ABCClassIndex) -> List[ABCClassIndex]:
+        """
+        Get the base class and interfaces of the class which are defined in the ABC file.
+        """
+        instance = self.abc_file.instances[class_index]
+        dependencies: List[ABCClassIndex] = []
+        for name_index in (instance.super_name_index, *instance.interface_indices):
+            dependency = self.find_class(name_index)
+            if dependency is not None and dependency != class_index:
+                dependencies.append(dependency)
+        return dependencies
+
+    def find_class(self, name_index: ABCMultinameIndex) -> Optional[ABCClassIndex]:
+        """
+        Find the class which is referred to by the multiname, `None` if it is not defined in the ABC file.
+        """
+        if not name_index:
+            return None
+        resolved_name = self.resolved_names[name_index]
+        for namespace in resolved_name.namespaces:
+            key = (namespace, resolved_name.name)
+            script_index = self.name_to_script.get(key)
+            if script_index is None:
+                continue
+            for trait in self.abc_file.scripts[script_index].traits:
+                if trait.kind == TraitKind.CLASS and self.resolved_names[trait.name_index].qname == key:
+                    return trait.data.class_index
+        return None
+
+    def get_instance_shape(self, class_index: ABCClassIndex) -> Shape:
+        """
+        Get the initial shape of the class instances, which contains the declared slots and constants.
+        """
+        try:
+            return self.instance_shapes[class_index]
+        except KeyError:
+            pass
+        # TODO: inherited slots.
+        keys = dict.fromkeys(
+            self.resolved_names[trait.name_index].qname
+            for trait in self.abc_file.instances[class_index].traits
+            if trait.kind in (TraitKind.SLOT, TraitKind.CONST)
+        )
+        # The whole layout is a single transition.
+        shape = self.instance_shapes[class_index] = empty_shape.extend(tuple(keys))
+        return shape
+
+    def get_constant(self, kind: ConstantKind, index: int) -> Any:
+        """
+        Get constant specified by its kind and index.
+        """
+        if kind == ConstantKind.TRUE:
+            return True
+        if kind == ConstantKind.FALSE:
+            return False
+        if kind == ConstantKind.NULL:
+            return None
+        if kind == ConstantKind.UNDEFINED:
+            return undefined
+        if kind == ConstantKind.INT:
+            return self.integers[index]
+        if kind == ConstantKind.UINT:
+            return self.constant_pool.unsigned_integers[index]
+        if kind == ConstantKind.DOUBLE:
+            return self.doubles[index]
+        if kind == ConstantKind.UTF8:
+            return self.strings[index]
+        if kind == ConstantKind.NAMESPACE:
+            return self.namespaces[index]
+        if kind == ConstantKind.MULTINAME:
+            return self.multinames[index]
+        raise NotImplementedError(kind)
+
+    # Code.
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def decode_method_body(self, index: ABCMethodBodyIndex) -> avm2.abc.instructions.DecodedCode:
+        """
+        Get the decoded code of the method body, decode it if it is not cached yet.
+        """
+        return self.decoded_code.get_or_create(index, self._decode_method_body)
+
+    def _decode_method_body(self, index: ABCMethodBodyIndex) -> avm2.abc.instructions.DecodedCode:
+        method_body = self.abc_file.method_bodies[index]
+        code = avm2.abc.instructions.decode_code(method_body.code)
+        for instruction, offset in zip(code.instructions, code.offsets):
+            if isinstance(instruction, avm2.abc.instructions.ScopeLookup):
+                instruction.site = self.get_scope_lookup_site(index, offset)
+        if self.verify_methods:
+            code.verification = avm2.verifier.verify_method_body(self, index, method_body, code)
+        if self.strip_instructions:
+            code = avm2.peephole.strip_code(code)
+        return code
+
+    def get_scope_lookup_site(self, method_body_index: ABCMethodBodyIndex, offset: int) -> int:
+        """
+        Get the site of the scope lookup instruction, see `ScopeLookup`. The site stays the same
+        when the code is decoded again, so the inline caches of the virtual machines do not grow with the evictions.
+        """
+        key = method_body_index, offset
+        try:
+            return self.scope_lookup_sites[key]
+        except KeyError:
+            site = self.scope_lookup_sites[key] = len(self.scope_lookup_sites)
+            return site
+
+    def get_interpreted_code(self, index: ABCMethodBodyIndex) -> avm2.abc.instructions.DecodedCode:
+        """
+        Get the decoded code to interpret, with the superinstructions if enabled.
+        The fused code is kept along with the decoded code, so the both are evicted together.
+        """
+        code = self.decode_method_body(index)
+        if not self.fuse_instructions:
+            return code
+        if code.fused is None:
+            code.fused = avm2.fusion.fuse_code(self.abc_file.method_bodies[index], code)
+        return code.fused
+
+    def compile_method_body(self, index: ABCMethodBodyIndex) -> Optional[avm2.compiler.CompiledMethod]:
+        """
+        Get the compiled method body, compile it if it is not cached yet.
+        `None` means that the method body is not supported by the compiler.
+        """
+        return self.compiled_code.get_or_create(index, self._compile_method_body)
+
+    def _compile_method_body(self, index: ABCMethodBodyIndex) -> Optional[avm2.compiler.CompiledMethod]:
+        return avm2.compiler.try_compile_method_body(
+            self,
+            index,
+            self.abc_file.method_bodies[index],
+            self.decode_method_body(index),
+        )
+
+    def compile_batch_method(self, index: ABCMethodBodyIndex) -> Optional[avm2.batch.BatchMethod]:
+        """
+        Get the method body compiled for batch calls, compile it if it is not cached yet.
+        `None` means that the method body is not supported by the batch compiler.
+        """
+        return self.batch_code.get_or_create(index, self._compile_batch_method)
+
+    def _compile_batch_method(self, index: ABCMethodBodyIndex) -> Optional[avm2.batch.BatchMethod]:
+        import avm2.batch
+        return avm2.batch.try_compile_batch_method(
+            self, index, self.abc_file.method_bodies[index], self.decode_method_body(index))
+
+    # Memoization.
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def get_memo(self, index: ABCMethodIndex) -> Optional[LRUCache[Tuple[Any, ...], Any]]:
+        """
+        Get the result cache of the method, `None` means that the method is not memoized.
+        """
+        try:
+            return self.memos[index]
+        except KeyError:
+            pass
+        enabled = self.memo_overrides.get(index)
+        if enabled is None:
+            enabled = avm2.purity.is_pure(self, index)
+        memo = self.memos[index] = LRUCache(self.memo_size) if enabled else None
+        return memo
+
+    def set_memoization(self, index_or_name: Union[ABCMethodIndex, str], enabled: Optional[bool]):
+        """
+        Force enable or disable memoization of the method regardless of its purity.
+        `None` restores the automatic memoization of pure methods.
+        """
+        index = self.get_method_index(index_or_name)
+        if enabled is None:
+            self.memo_overrides.pop(index, None)
+        else:
+            self.memo_overrides[index] = enabled
+        self.memos.pop(index, None)
+
+    def get_memo_statistics(self) -> Dict[Union[str, ABCMethodIndex], MemoStatistics]:
+        """
+        Get hit and miss counts of the memoized methods, by qualified name where the name is known.
+        """
+        names = {index: name for name, index in self.name_to_method.items()}
+        return {
+            names.get(index, index): MemoStatistics(hits=memo.hits, misses=memo.misses, size=len(memo))
+            for index, memo in self.memos.items()
+            if memo is not None
+        }
+
+
+# Source of the dispatch loop, see `make_execute_frame`. Lines marked with `[count]` are only in the variant
+# which counts the instructions, and lines marked with `[exit]` only in the one which exits the profiled calls.
+execute_frame_source = '''
+def make_execute_frame(get_counts, exit_call):
+    def execute_frame(self, frame):
+        """
+        Execute the frame and get its return value.
+
+        This is the only dispatch loop of the interpreter. Calls between interpreted methods push frames
+        onto the explicit frame stack instead of recursing in Python, so deep call chains are not limited
+        by the Python recursion limit. Jump targets of verified code are known in advance.
+        """
+        frames = []  # callers of the current frame
+        return_ = avm2.abc.instructions.RETURN
+        code = frame.code
+        environment = frame.environment
+        counts = get_counts(frame)  # [count]
+        handlers = code.handlers
+        jump_indices = None if code.verification is None else code.verification.jump_indices
+        index = 0
+        while True:
+            counts[index] += 1  # [count]
+            offset = handlers[index](self, environment)
+            if offset is None:
+                index += 1
+            elif offset > return_:
+                # Jumps go first, since they are much more frequent than calls.
+                index = code.get_jump_index(index, offset) if jump_indices is None else jump_indices[index]
+            elif offset == return_:
+                value = environment.return_value
+                if frame.memo is not None:
+                    store_memo(frame.memo, frame.memo_key, value)
+                if frame.method_index is not None:  # [exit]
+                    exit_call()  # [exit]
+                if not frames:
+                    return value
+                frame = frames.pop()
+                code = frame.code
+                environment = frame.environment
+                counts = get_counts(frame)  # [count]
+                handlers = code.handlers
+                jump_indices = None if code.verification is None else code.verification.jump_indices
+                index = frame.index + 1
+                environment.operand_stack.append(value)
+            else:
+                # That is `CALL`.
+                if len(frames) >= MAX_CALL_DEPTH:
+                    raise ASStackOverflowError(MAX_CALL_DEPTH)
+                frame.index = index
+                frames.append(frame)
+                frame = self.pending_frame
+                self.pending_frame = None
+                code = frame.code
+                environment = frame.environment
+                counts = get_counts(frame)  # [count]
+                handlers = code.handlers
+                jump_indices = None if code.verification is None else code.verification.jump_indices
+                index = 0
+
+    return execute_frame
+'''
+
+
+@lru_cache(maxsize=None)
+def compile_execute_frame(count_instructions: bool, exit_calls: bool) -> Callable[..., Callable[..., Any]]:
+    """
+    Compile the variant of the dispatch loop, with the marked lines kept or removed.
+    """
+    lines: List[str] = []
+    for line in execute_frame_source.splitlines():
+        code, marker, tag = line.partition('  # [')
+        if not marker:
+            lines.append(line)
+        elif count_instructions if tag == 'count]' else exit_calls:
+            lines.append(code)
+    namespace: Dict[str, Any] = {}
+    # The loop sees the globals of this module, just like the methods.
+    exec(compile('\n'.join(lines), '<dispatch loop>', 'exec'), globals(), namespace)
+    return namespace['make_execute_frame']
+
+
+def make_execute_frame(
+    get_counts: Optional[Callable[[Frame], MutableSequence[int]]] = None,
+    exit_call: Optional[Callable[[], None]] = None,
+) -> Callable[[VirtualMachine, Frame], Any]:
+    """
+    Get the dispatch loop, `VirtualMachine.execute_frame`. There is a single definition of the loop,
+    the instrumented variants are generated from it, so the uninstrumented loop pays nothing for them.
+
+    `get_counts` gives the counters of the frame code, the loop increments the counter of each dispatched instruction.
+    `exit_call` is called when an interpreted method call returns.
+    """
+    return compile_execute_frame(get_counts is not None, exit_call is not None)(get_counts, exit_call)
+
+
+class VirtualMachine:
+    """
+    Isolate which runs a program. It owns the heap, that is the global, script and class objects,
+    along with the interpreter state and statistics. Virtual machines of the same program share the code
+    and the caches, so a new one takes microseconds.
+    """
+
+    def __init__(self, program: Union[Program, ABCFile], **kwargs: Any):
+        """
+        `program` is the program to run, or the ABC file to make a new program of.
+        Keyword arguments are passed to `Program` in the latter case.
+        """
+        if not isinstance(program, Program):
+            program = Program(program, **kwargs)
+        elif kwargs:
+            raise TypeError(f'unexpected keyword arguments along with the program: {", ".join(kwargs)}')
+        self.program = program
+
+        # Quick access.
+        self.abc_file = program.abc_file
+        self.abc_digest = program.abc_digest
+        self.constant_pool = program.constant_pool
+        self.strings = program.strings
+        self.multinames = program.multinames
+        self.integers = program.integers
+        self.doubles = program.doubles
+        self.namespaces = program.namespaces
+        self.linking = program.linking
+        self.method_to_body = program.method_to_body
+        self.class_to_script = program.class_to_script
+        self.resolved_names = program.resolved_names
+        self.name_to_class = program.name_to_class
+        self.name_to_method = program.name_to_method
+        self.name_to_script = program.name_to_script
+        self.compile_methods = program.compile_methods
+        self.memoize_methods = program.memoize_methods
+
+        self.reset()
+
+    def reset(self):
+        """
+        Drop the heap, the interpreter state and the statistics, so that the virtual machine is as good as new.
+        The program and its caches are kept.
+        """
+        # Statistics.
+        self.script_timings: Dict[ABCScriptIndex, InitTiming] = {}
+        self.class_timings: Dict[ABCClassIndex, InitTiming] = {}
+        self.nested_init_times: List[float] = []  # time of the nested initialisations for each running one
+        self.compiled_calls = 0
+        self.interpreted_calls = 0
+        self.vectorized_batch_calls = 0
+        self.looped_batch_calls = 0
+        self.inline_cache_hits = 0
+        self.inline_cache_misses = 0
+
+        # Interpreter.
+        self.pending_frame: Optional[Frame] = None  # set by the call instructions for the dispatch loop
+        self.scope_caches: Dict[int, avm2.abc.instructions.ScopeCache] = {}  # lookup site to its inline cache
+        self.profiler: Optional[Union[avm2.profiler.Profiler, avm2.counters.HitCounter]] = None  # the running one
+
+        # Runtime.
+        self.class_objects: Dict[ABCClassIndex, ASObject] = {}  # initialised and being initialised classes
+        self.script_objects: Dict[ABCScriptIndex, ASObject] = {}  # initialised and being initialised scripts
+        self.global_object = ASObject(properties={
+            ('', 'Object'): ASObject(),
+            ('flash.utils', 'Dictionary'): ASObject(),
+        })  # FIXME: unsure, prototypes again?
+
+    # Program shortcuts.
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def lookup_class(self, qualified_name: str) -> ABCClassIndex:
+        return self.program.lookup_class(qualified_name)
+
+    def lookup_method(self, qualified_name: str) -> ABCMethodIndex:
+        return self.program.lookup_method(qualified_name)
+
+    def decode_method_body(self, index: ABCMethodBodyIndex) -> avm2.abc.instructions.DecodedCode:
+        return self.program.decode_method_body(index)
+
+    def set_memoization(self, index_or_name: Union[ABCMethodIndex, str], enabled: Optional[bool]):
+        self.program.set_memoization(index_or_name, enabled)
+
+    def get_memo_statistics(self) -> Dict[Union[str, ABCMethodIndex], MemoStatistics]:
+        return self.program.get_memo_statistics()
+
     # Resolving.
     # ------------------------------------------------------------------------------------------------------------------
 
     def resolve_multiname(self, stack: List[ASObject], name: str, namespaces: Iterable[str]) -> Tuple[ASObject, str, str]:
+        """
+        Find the object which has the property and get the object along with the property qualified name.
+        """
         for object_ in reversed(stack):
             for namespace in namespaces:
-                try:
-                    return self.resolve_qname(object_, namespace, name), name, namespace
-                except KeyError:
-                    pass
+                if (namespace, name) in object_.shape.slots:
+                    return object_, name, namespace
         raise KeyError(name, namespaces)
 
     def resolve_qname(self, object_: ASObject, namespace: str, name: str) -> Any:
         # Typically, the order of the search for resolving multinames is
         # the object’s declared traits, its dynamic properties, and finally the prototype chain.
-        # TODO: declared traits.
-        return object_.properties[namespace, name]
+        # Declared traits and dynamic properties share the object shape.
+        return object_.values[object_.shape.slots[namespace, name]]
         # TODO: prototype chain.
 
-    def lookup_class(self, qualified_name: str) -> ABCClassIndex:
-        return self.name_to_class[qualified_name]
-
-    def lookup_method(self, qualified_name: str) -> ABCMethodIndex:
-        return self.name_to_method[qualified_name]
-
     # Scripts.
     # ------------------------------------------------------------------------------------------------------------------
 
     def init_script(self, script_index: ABCScriptIndex):
         """
-        Initialise the specified script.
+        Initialise the specified script after the scripts it depends on, unless it is already initialised.
+        A script which is being initialised counts as initialised, that breaks the dependency cycles.
+        A script which failed to initialise is initialised again when touched next time,
+        along with the classes it has created so far.
+        """
+        if script_index < 0:
+            script_index = ABCScriptIndex(len(self.abc_file.scripts) + script_index)
+        if script_index in self.script_objects:
+            return
+        script_object = ASObject(dictionary=True)
+        self.init_traits(script_object, self.abc_file.scripts[script_index].traits)
+        self.script_objects[script_index] = script_object
+        class_count = len(self.class_objects)
+        try:
+            self.measure_init(self.script_timings, script_index, self._init_script, script_index, script_object)
+        except BaseException:
+            del self.script_objects[script_index]
+            # Class objects are ordered by creation, and the failed nested initialisations have rolled back theirs.
+            for class_index in list(islice(self.class_objects, class_count, None)):
+                if self.class_to_script[class_index] == script_index:
+                    del self.class_objects[class_index]
+            raise
+
+    def _init_script(self, script_index: ABCScriptIndex, script_object: ASObject):
+        for dependency in self.program.get_script_dependencies(script_index):
+            self.init_script(dependency)
+        self.call_method(self.abc_file.scripts[script_index].init_index, script_object)
+
+    def init_traits(self, object_: ASObject, traits: Iterable[ASTrait]):
+        """
+        Add the declared traits to the script or class object. Slots get their default values,
+        the rest is set by the initialisers.
+        """
+        for trait in traits:
+            key = self.resolved_names[trait.name_index].qname
+            if key is None:
+                # TODO: runtime multinames.
+                continue
+            value = undefined
+            if trait.kind in (TraitKind.SLOT, TraitKind.CONST) and trait.data.vindex:
+                value = self.program.get_constant(trait.data.vkind, trait.data.vindex)
+            object_.set_property(key, value)
+
+    def find_global_property(self, key: QName) -> Tuple[ASObject, int]:
+        """
+        Find the script object which has the global property, initialise the script on demand,
+        and get the object along with the property slot index.
+        """
+        try:
+            script_index = self.name_to_script[key]
+        except KeyError:
+            raise ASReferenceError(key) from None
+        self.init_script(script_index)
+        script_object = self.script_objects[script_index]
+        return script_object, script_object.shape.slots[key]
+
+    def measure_init(self, timings: Dict[Any, InitTiming], key: Any, init: Callable[..., Any], *args: Any):
+        """
+        Run the initialiser and record its timing. Time of the nested initialisations is not a part of its own time.
+        """
+        self.nested_init_times.append(0.0)
+        start_time = perf_counter()
+        try:
+            init(*args)
+        finally:
+            total_time = perf_counter() - start_time
+            own_time = total_time - self.nested_init_times.pop()
+            if self.nested_init_times:
+                self.nested_init_times[-1] += total_time
+            timings[key] = InitTiming(total_time=total_time, own_time=own_time)
+
+    def get_init_timings(self) -> List[Tuple[str, InitTiming]]:
+        """
+        Get the initialisation timings of the scripts and classes, the longest own time first.
+        Scripts are named after their first trait.
         """
-        if script_index not in self.script_objects:
-            # TODO: what is `this`?
-            self.call_method(self.abc_file.scripts[script_index].init_index, self.script_objects[script_index])
+        timings = [
+            (self.program.get_script_name(script_index), timing)
+            for script_index, timing in self.script_timings.items()
+        ]
+        timings.extend(
+            (self.multinames[self.abc_file.instances[class_index].name_index].qualified_name(self.constant_pool), timing)
+            for class_index, timing in self.class_timings.items()
+        )
+        timings.sort(key=lambda item: item[1].own_time, reverse=True)
+        return timings
+
+    # Snapshots.
+    # ------------------------------------------------------------------------------------------------------------------
+
+    def snapshot(self) -> bytes:
+        """
+        Serialise the global, script and class objects along with the linking, see `avm2.snapshot`.
+        """
+        return avm2.snapshot.dump_snapshot(self)
+
+    @staticmethod
+    def restore(
+        blob: bytes,
+        buffer: Union[memoryview, bytes],
+        abc_file: Optional[ABCFile] = None,
+        **kwargs: Any,
+    ) -> VirtualMachine:
+        """
+        Create a virtual machine from the snapshot of the DoABC payload.
+        `abc_file` is the ABC file already parsed from the payload, if any.
+        Keyword arguments are passed to `avm2.snapshot.load_snapshot`.
+        """
+        return avm2.snapshot.load_snapshot(blob, buffer, abc_file, **kwargs)
 
     # Classes.
     # ------------------------------------------------------------------------------------------------------------------
 
     def init_class(self, class_index: ABCClassIndex):
+        """
+        Initialise the specified class, unless it is already initialised. The class is normally created
+        by its script initialiser, which is run after the scripts of the base classes.
+        """
         self.init_script(self.class_to_script[class_index])
-        self.call_method(self.abc_file.classes[class_index].init_index, self.class_objects[class_index])
+        self.new_class(class_index)
+
+    def new_class(self, class_index: ABCClassIndex) -> ASObject:
+        """
+        Get the class object, create it and run the static initialiser if it is not created yet.
+        """
+        try:
+            return self.class_objects[class_index]
+        except KeyError:
+            pass
+        class_ = self.abc_file.classes[class_index]
+        class_object = ASObject(dictionary=True)
+        self.init_traits(class_object, class_.traits)
+        self.class_objects[class_index] = class_object
+        try:
+            self.measure_init(self.class_timings, class_index, self.call_method, class_.init_index, class_object)
+        except BaseException:
+            del self.class_objects[class_index]
+            raise
         # TODO: the scope stack is saved by the created ClassClosure.
+        return class_object
 
     def new_instance(self, index_or_name: Union[ABCClassIndex, str], *args) -> ASObject:
         if isinstance(index_or_name, int):
@@ -136,7 +804,8 @@ class VirtualMachine:
         else:
             raise ValueError(index_or_name)
 
-        instance = ASObject(class_index=class_index)
+        self.init_class(class_index)
+        instance = ASObject(class_index=class_index, shape=self.program.get_instance_shape(class_index))
         # FIXME: call super constructor?
         self.call_method(self.abc_file.instances[class_index].init_index, instance, *args)
         return instance
@@ -154,34 +823,109 @@ class VirtualMachine:
         """
         Call the specified method and get a return value.
         """
-        if isinstance(index_or_name, int):
-            index = ABCMethodIndex(index_or_name)
-        elif isinstance(index_or_name, str):
-            index = self.lookup_method(index_or_name)
-        else:
-            raise ValueError(index_or_name)
+        value, frame = self.enter_method(self.program.get_method_index(index_or_name), this, args)
+        return value if frame is None else self.execute_frame(frame)
+
+    def execute_method(self, index: ABCMethodIndex, this: Any, *args) -> Any:
+        """
+        Call the specified method bypassing the memoization.
+        """
+        value, frame = self.enter_method(index, this, args, memoize=False)
+        return value if frame is None else self.execute_frame(frame)
 
-        # TODO: init script on demand.
-        method_body = self.abc_file.method_bodies[self.method_to_body[index]]
+    def enter_method(
+        self,
+        index: ABCMethodIndex,
+        this: Any,
+        args: Sequence[Any],
+        memoize: bool = True,
+    ) -> Tuple[Any, Optional[Frame]]:
+        """
+        Start the method call. Memoized and compiled calls are completed right away and give the return value.
+        Otherwise, the frame to interpret is returned, and the return value is `None` for now.
+        """
+        memo = key = None
+        if memoize and self.memoize_methods:
+            memo = self.program.get_memo(index)
+            if memo is not None:
+                key = make_memo_key(this, *args)
+                if key is None:
+                    memo = None
+                else:
+                    try:
+                        value = memo[key]
+                    except KeyError:
+                        memo.misses += 1
+                    else:
+                        memo.hits += 1
+                        return value, None
+
+        # Scripts are initialised on demand, when their global names or classes are touched.
+        method_body_index = self.method_to_body[index]
+        method_body = self.abc_file.method_bodies[method_body_index]
         environment = self.create_method_environment(method_body, this, *args)
-        return self.execute_code(method_body.code, environment)
+        if self.compile_methods:
+            compiled_method = self.program.compile_method_body(method_body_index)
+            if compiled_method is not None:
+                self.compiled_calls += 1
+                value = compiled_method.function(self, environment)
+                if memo is not None:
+                    store_memo(memo, key, value)
+                return value, None
+        self.interpreted_calls += 1
+        return None, Frame(
+            self.program.get_interpreted_code(method_body_index),
+            environment,
+            method_index=index,
+            memo=memo,
+            memo_key=key,
+        )
 
-    def execute_code(self, code: memoryview, environment: MethodEnvironment) -> Any:
+    def call_from(self, environment: MethodEnvironment, index: ABCMethodIndex, this: Any, args: Sequence[Any]) -> Optional[int]:
         """
-        Execute the byte-code and get a return value.
+        Call the method from an instruction. The return value is pushed onto the operand stack if the call
+        completes right away. Otherwise, the callee frame is left in `pending_frame` for the dispatch loop,
+        and `CALL` is returned.
         """
-        reader = MemoryViewReader(code)
-        while True:
-            try:
-                # FIXME: cache already read instructions.
-                avm2.abc.instructions.read_instruction(reader).execute(self, environment)
-            except ASReturnException as e:
-                return e.return_value
-            except ASJumpException as e:
-                reader.position += e.offset
-
-    # Unclassified.
-    # ------------------------------------------------------------------------------------------------------------------
+        value, frame = self.enter_method(index, this, args)
+        if frame is None:
+            environment.operand_stack.append(value)
+            return None
+        self.pending_frame = frame
+        return avm2.abc.instructions.CALL
+
+    def call_method_batch(self, index_or_name: Union[ABCMethodIndex, str], this: Any, *arrays) -> numpy.ndarray:
+        """
+        Call the specified method for each row of the argument arrays and get the array of return values.
+        Requires NumPy, see `avm2.batch`.
+        """
+        import avm2.batch
+        return avm2.batch.call_method_batch(self, self.program.get_method_index(index_or_name), this, arrays)
+
+    def profile(self, sampling: bool = False, interval: float = 0.001) -> avm2.profiler.Profiler:
+        """
+        Get the profiler of the virtual machine, use it as a context manager, see `avm2.profiler`.
+        Deterministic profiler counts the calls and instructions, sampling one records the call stack
+        every `interval` seconds of CPU time.
+        """
+        if sampling:
+            return avm2.profiler.SamplingProfiler(self, interval)
+        return avm2.profiler.DeterministicProfiler(self)
+
+    def count_hits(self) -> avm2.counters.HitCounter:
+        """
+        Get the hit counter of the interpreted instructions, use it as a context manager, see `avm2.counters`.
+        """
+        return avm2.counters.HitCounter(self)
+
+    def execute_code(self, code: avm2.abc.instructions.DecodedCode, environment: MethodEnvironment) -> Any:
+        """
+        Execute the decoded code and get a return value.
+        """
+        return self.execute_frame(Frame(code, environment))
+
+    # The dispatch loop, see `make_execute_frame`.
+    execute_frame = make_execute_frame()
 
     def create_method_environment(self, method_body: ASMethodBody, this: Any, *args) -> MethodEnvironment:
         """
@@ -201,7 +945,7 @@ class VirtualMachine:
         if method.options:
             assert len(method.options) <= method.param_count
             for i, option in zip(range(len(args) + 1, method_body.local_count), method.options):
-                registers[i] = self.get_constant(option.kind, option.value)
+                registers[i] = self.program.get_constant(option.kind, option.value)
         # If `NEED_REST` is set in `method_info.flags`, the `method_info.param_count + 1` register is set up to
         # reference an array that holds the superflous arguments.
         if MethodFlags.NEED_REST in method.flags:
@@ -215,25 +959,101 @@ class VirtualMachine:
         # FIXME: unsure about the global object here.
         return MethodEnvironment(registers=registers, scope_stack=[self.global_object])
 
-    def get_constant(self, kind: ConstantKind, index: int) -> Any:
-        """
-        Get constant specified by its kind and index.
-        """
-        if kind == ConstantKind.TRUE:
-            return True
-        if kind == ConstantKind.FALSE:
-            return False
-        if kind == ConstantKind.NULL:
+
+def make_memo_key(*values: Any) -> Optional[Tuple[Any, ...]]:
+    """
+    Make memoization key of primitive values, `None` if any of the values is not primitive.
+    Types are a part of the key, since `1`, `1.0` and `True` are equal in Python, but not in ActionScript.
+    """
+    key = []
+    for value in values:
+        type_ = type(value)
+        if type_ is float:
+            # Distinguishes -0.0 and makes NaN equal to itself.
+            key.append(value.hex())
+        elif type_ in (int, bool, str):
+            key.append((type_, value))
+        elif value is None or value is undefined:
+            key.append(type_)
+        else:
             return None
-        if kind == ConstantKind.UNDEFINED:
-            return undefined
-        if kind == ConstantKind.INT:
-            return self.integers[index]
-        if kind == ConstantKind.NAMESPACE:
-            return self.namespaces[index]
-        if kind == ConstantKind.MULTINAME:
-            return self.multinames[index]
-        raise NotImplementedError(kind)
+    return tuple(key)
+
+
+def store_memo(memo: LRUCache[Tuple[Any, ...], Any], key: Tuple[Any, ...], value: Any):
+    """
+    Store the return value unless it is not primitive.
+    """
+    if make_memo_key(value) is not None:
+        memo[key] = value
+
+
+def read_first_fields(items: Sequence[Any], name: str) -> Iterable[int]:
+    """
+    Get the first field, which must be `u30`, of each item.
+    Items of a lazy array are not loaded, the field is read directly from the buffer.
+    """
+    if isinstance(items, LazyArray):
+        return (items.peek(index, MemoryViewReader.read_int) for index in range(len(items)))
+    return (getattr(item, name) for item in items)
+
+
+@dataclass
+class Linking:
+    """
+    Tables which link the ABC file entries together. They depend on the ABC file only.
+    """
+
+    method_to_body: Dict[ABCMethodIndex, ABCMethodBodyIndex]
+    class_to_script: Dict[ABCClassIndex, ABCScriptIndex]
+    name_to_class: Dict[str, ABCClassIndex]
+    name_to_method: Dict[str, ABCMethodIndex]
+    name_to_script: Dict[QName, ABCScriptIndex]  # global names
+    resolved_names: List[Optional[ResolvedName]]  # multiname index to the resolved name
+
+
+# Maximal number of interpreted calls on the frame stack, beyond that the call chain is considered endless.
+MAX_CALL_DEPTH = 100000
+
+# Name or namespace index 0 means any name or namespace.
+ANY_NAME = '*'
+
+
+@dataclass(frozen=True)
+class ResolvedName:
+    """
+    Multiname with its strings and namespaces looked up.
+    Names and namespaces of runtime multinames are popped from the operand stack, as the flags say.
+    """
+
+    kind: MultinameKind
+    name: Optional[str] = None
+    namespaces: Tuple[str, ...] = ()  # the namespace of a qualified name or the namespace set
+    qname: Optional[QName] = None  # set for compile-time qualified names only
+    pop_name: bool = False
+    pop_namespace: bool = False
+    type_indices: Tuple[ABCMultinameIndex, ...] = ()  # base type and parameters of a type name
+
+
+@dataclass
+class MemoStatistics:
+    hits: int
+    misses: int
+    size: int
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / (self.hits + self.misses) if self.hits or self.misses else 0.0
+
+
+@dataclass
+class InitTiming:
+    """
+    Time in seconds of a script or class initialisation.
+    """
+
+    total_time: float
+    own_time: float  # without the initialisations of the dependencies and the ones triggered on demand
 
 
 @dataclass
@@ -241,18 +1061,36 @@ class MethodEnvironment:
     registers: List[Any]  # FIXME: should be ASObject's too.
     scope_stack: List[ASObject]
     operand_stack: List[Any] = field(default_factory=list)  # FIXME: should be ASObject's too.
+    return_value: Any = None  # set by the return instructions
+
+
+@dataclass
+class Frame:
+    """
+    Interpreted method call on the frame stack.
+    """
+
+    code: avm2.abc.instructions.DecodedCode
+    environment: MethodEnvironment
+    method_index: Optional[ABCMethodIndex] = None  # `None` for the code executed directly, see `execute_code`
+    index: int = 0  # the current instruction of a caller frame, that is the call instruction
+    memo: Optional[LRUCache[Tuple[Any, ...], Any]] = None  # where to store the return value
+    memo_key: Optional[Tuple[Any, ...]] = None
 
 
-def execute_tag(tag: Tag) -> VirtualMachine:
+def execute_tag(tag: Tag, lazy: bool = False) -> VirtualMachine:
     """
     Parse and execute DO_ABC tag.
     """
     assert tag.type_ == TagType.DO_ABC
-    return execute_do_abc_tag(DoABCTag(tag.raw))
+    return execute_do_abc_tag(DoABCTag(tag.raw), lazy)
 
 
-def execute_do_abc_tag(do_abc_tag: DoABCTag) -> VirtualMachine:
+def execute_do_abc_tag(do_abc_tag: DoABCTag, lazy: bool = False) -> VirtualMachine:
     """
     Create a virtual machine and execute the tag.
     """
-    return VirtualMachine(ABCFile(MemoryViewReader(do_abc_tag.abc_file)))
+    return VirtualMachine(
+        ABCFile(MemoryViewReader(do_abc_tag.abc_file), lazy),
+        abc_digest=avm2.snapshot.get_digest(do_abc_tag.abc_file),
+    )
@@ -0,0 +1,51 @@
+"""
+Measure `VirtualMachine.call_method` on the heroes.swf battle methods.
+
+Usage: python -m benchmarks.call_method
+"""
+
+from __future__ import annotations
+
+from pathlib import Path
+from timeit import Timer
+from typing import Any, Iterable, Tuple
+
+from avm2.abc.types import ABCFile
+from avm2.io import MemoryViewReader
+from avm2.runtime import undefined
+from avm2.swf.enums import TagType
+from avm2.swf.parser import parse_swf_file
+from avm2.swf.types import DoABCTag
+from avm2.vm import VirtualMachine
+
+data_path = Path(__file__).parent.parent / 'data'
+
+calls: Iterable[Tuple[str, Tuple[Any, ...]]] = [
+    ('battle.BattleCore.hitrateIntensity', (-100, 0)),
+    ('battle.BattleCore.hitrateIntensity', (0, 100)),
+    ('battle.BattleCore.hitrateIntensity', (4, 8)),
+    ('battle.BattleCore.getElementalPenetration', (2, 300000)),
+    ('battle.BattleCore.getElementalPenetration', (42, -100500)),
+]
+
+
+def load_abc_file() -> ABCFile:
+    for tag in parse_swf_file(data_path / 'heroes.swf', types={TagType.DO_ABC}):
+        return ABCFile(MemoryViewReader(DoABCTag(tag.raw).abc_file))
+    raise ValueError('no DoABC tag found')
+
+
+def main():
+    abc_file = load_abc_file()
+    for compile_methods in (False, True):
+        print('compiled:' if compile_methods else 'interpreted:')
+        machine = VirtualMachine(abc_file, compile_methods=compile_methods)
+        for name, args in calls:
+            timer = Timer(lambda: machine.call_method(name, undefined, *args))
+            number, _ = timer.autorange()
+            best = min(timer.repeat(repeat=5, number=number)) / number
+            print(f'  {name}{args}: {best * 1e6:.2f} µs per call')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Measure decoding throughput of all method bodies of the SWF files in `data/`.
+
+Usage: python -m benchmarks.decode
+"""
+
+from __future__ import annotations
+
+import gc
+from pathlib import Path
+from time import perf_counter
+from typing import Iterable
+
+from avm2.abc.instructions import decode_code
+from avm2.abc.types import ABCFile
+from avm2.io import MemoryViewReader
+from avm2.swf.enums import TagType
+from avm2.swf.parser import parse_swf_file
+from avm2.swf.types import DoABCTag
+
+data_path = Path(__file__).parent.parent / 'data'
+
+
+def read_abc_files(path: Path) -> Iterable[ABCFile]:
+    for tag in parse_swf_file(path, types={TagType.DO_ABC}):
+        yield ABCFile(MemoryViewReader(DoABCTag(tag.raw).abc_file))
+
+
+def main():
+    for path in sorted(data_path.glob('*.swf')):
+        codes = [method_body.code for abc_file in read_abc_files(path) for method_body in abc_file.method_bodies]
+        best = float('inf')
+        instruction_count = 0
+        for _ in range(5):
+            # Like `timeit`, keep the garbage collector away from the measurements.
+            gc.collect()
+            gc.disable()
+            start_time = perf_counter()
+            instruction_count = sum(len(decode_code(code).instructions) for code in codes)
+            best = min(best, perf_counter() - start_time)
+            gc.enable()
+        byte_count = sum(len(code) for code in codes)
+        print(
+            f'{path.name}: {len(codes)} bodies, {instruction_count} instructions, {byte_count} bytes in {best:.3f} s:'
+            f' {instruction_count / best / 1e6:.2f}M instructions/s, {byte_count / best / 1e6:.2f} MB/s'
+        )
+
+
+if __name__ == '__main__':
+    main()
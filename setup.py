@@ -1,8 +1,10 @@
 import setuptools
 
+import avm2
+
 setuptools.setup(
     name='avm2',
-    version='0.1',
+    version=avm2.__version__,
     author='Pavel Perestoronin',
     author_email='eigenein@gmail.com',
     description='Adobe Flash SWF file parser and AVM2 virtual machine implementation in pure Python',
@@ -12,7 +14,9 @@ setuptools.setup(
     packages=setuptools.find_packages(exclude=['tests']),
     python_requires='>=3.7',
     install_requires=[],
-    extras_require={},
+    extras_require={
+        'numpy': ['numpy'],
+    },
     classifiers=[
         'Development Status :: 1 - Planning',
         'Intended Audience :: Developers',
@@ -58,3 +58,7 @@ def abc_file(do_abc_tag: DoABCTag) -> ABCFile:
 def machine(abc_file: ABCFile) -> VirtualMachine:
     return VirtualMachine(abc_file)
 
+
+@fixture(scope='session')
+def lazy_abc_file(do_abc_tag: DoABCTag) -> ABCFile:
+    return ABCFile(MemoryViewReader(do_abc_tag.abc_file), lazy=True)
@@ -1,8 +1,10 @@
 from typing import Iterable, List
 
-from avm2.abc.instructions import Instruction, read_instruction
+from avm2.abc.instructions import GetLex, HasNext2, Instruction, decode_code, read_instruction
+from avm2.abc.parser import LazyArray
 from avm2.abc.types import ABCFile, ASMethodBody
 from avm2.io import MemoryViewReader
+from avm2.swf.types import DoABCTag
 
 
 def test_abc_file(abc_file: ABCFile):
@@ -34,3 +36,47 @@ def read_method_body(method_body: ASMethodBody) -> List[Instruction]:
 def read_instructions(reader: MemoryViewReader) -> Iterable[Instruction]:
     while not reader.is_eof():
         yield read_instruction(reader)
+
+
+def test_decode_code(abc_file: ABCFile):
+    code = decode_code(abc_file.method_bodies[0].code)
+    assert code.instructions == read_method_body(abc_file.method_bodies[0])
+    assert len(code.offsets) == len(code.handlers) + 1 == 104
+    assert code.offsets[-1] == len(abc_file.method_bodies[0].code)
+
+
+def test_decode_all_method_bodies(abc_file: ABCFile):
+    assert sum(len(decode_code(method_body.code).instructions) for method_body in abc_file.method_bodies) == 799681
+
+
+def test_decoder_matches_instruction_init():
+    reader = MemoryViewReader(b'\x60\xFF\x01\x32\x81\x01\x02')  # getlex 255, hasnext2 129 2
+    assert read_instruction(reader) == GetLex(MemoryViewReader(b'\xFF\x01'))
+    assert read_instruction(reader) == HasNext2(MemoryViewReader(b'\x81\x01\x02'))
+    assert reader.is_eof()
+
+
+def test_lazy_abc_file(abc_file: ABCFile, lazy_abc_file: ABCFile):
+    assert lazy_abc_file.constant_pool.strings == abc_file.constant_pool.strings
+    assert lazy_abc_file.constant_pool.multinames == abc_file.constant_pool.multinames
+    assert isinstance(lazy_abc_file.method_bodies, LazyArray)
+    assert len(lazy_abc_file.methods) == len(abc_file.methods)
+    assert len(lazy_abc_file.method_bodies) == len(abc_file.method_bodies)
+    for items, lazy_items in [
+        (abc_file.methods, lazy_abc_file.methods),
+        (abc_file.metadata, lazy_abc_file.metadata),
+        (abc_file.instances, lazy_abc_file.instances),
+        (abc_file.classes, lazy_abc_file.classes),
+        (abc_file.scripts, lazy_abc_file.scripts),
+        (abc_file.method_bodies, lazy_abc_file.method_bodies),
+    ]:
+        assert lazy_items[0] == items[0]
+        assert lazy_items[-1] == items[-1]
+        assert lazy_items[100:103] == items[100:103]
+
+
+def test_lazy_array_loads_on_access(do_abc_tag: DoABCTag):
+    abc_file = ABCFile(MemoryViewReader(do_abc_tag.abc_file), lazy=True)
+    assert abc_file.method_bodies.loaded_count == 0
+    assert abc_file.method_bodies[42] is abc_file.method_bodies[42]
+    assert abc_file.method_bodies.loaded_count == 1
@@ -0,0 +1,53 @@
+import pytest
+
+from avm2.runtime import undefined
+from avm2.vm import VirtualMachine
+from tests.utils import loop_code, make_abc_file
+
+numpy = pytest.importorskip('numpy')
+
+
+@pytest.mark.parametrize('name', [
+    'battle.BattleCore.hitrateIntensity',
+    'battle.BattleCore.getElementalPenetration',
+])
+def test_call_method_batch(machine: VirtualMachine, name: str):
+    random = numpy.random.default_rng(42)
+    arrays = [random.integers(-300000, 300000, 1000), random.integers(-300000, 300000, 1000)]
+    arrays[0][:4] = [-100, 100, 0, 4]
+    arrays[1][:4] = [0, 0, 100, 8]
+    vectorized_batch_calls = machine.vectorized_batch_calls
+
+    result = machine.call_method_batch(name, undefined, *arrays)
+
+    assert machine.vectorized_batch_calls == vectorized_batch_calls + 1
+    assert result.tolist() == [machine.call_method(name, undefined, *row) for row in zip(*(array.tolist() for array in arrays))]
+
+
+def test_call_method_batch_raises(machine: VirtualMachine):
+    looped_batch_calls = machine.looped_batch_calls
+    with pytest.raises(ValueError):
+        # `int(nan)` raises, so should the batch.
+        machine.call_method_batch('battle.BattleCore.getElementalPenetration', undefined, [1.0, numpy.nan], [0, 0])
+    assert machine.looped_batch_calls == looped_batch_calls + 1
+
+
+def test_call_method_batch_loop():
+    machine = VirtualMachine(make_abc_file([loop_code]))
+    assert machine.call_method_batch(0, undefined, numpy.array([0, 10, 100])).tolist() == [0, 45, 4950]
+    assert machine.looped_batch_calls == 1
+    assert machine.program.compile_batch_method(0) is None
+
+
+@pytest.mark.parametrize('code', [
+    b'\xD1\xD2\xC5\x48',  # getlocal1, getlocal2, add_i, returnvalue
+    b'\xD1\xD2\xA2\x48',  # getlocal1, getlocal2, multiply, returnvalue
+])
+def test_call_method_batch_overflow(code: bytes):
+    # 64-bit integers would wrap around, Python integers do not.
+    machine = VirtualMachine(make_abc_file([code]), memoize_methods=False)
+    arrays = [numpy.array([1, 2 ** 62]), numpy.array([2, 2 ** 62])]
+    result = machine.call_method_batch(0, undefined, *arrays)
+    assert result.tolist() == [machine.call_method(0, undefined, *row) for row in zip(*(array.tolist() for array in arrays))]
+    assert result[1] > 0
+    assert machine.looped_batch_calls == 1
@@ -0,0 +1,57 @@
+from dataclasses import replace
+from pathlib import Path
+
+from pytest import MonkeyPatch
+
+import avm2
+from avm2.cache import ABCFileCache
+from avm2.runtime import undefined
+from avm2.swf.types import DoABCTag
+
+
+def test_cache(do_abc_tag: DoABCTag, tmp_path: Path):
+    cache = ABCFileCache(tmp_path)
+    machine_1 = cache.get_machine(do_abc_tag.abc_file)
+    assert len(list(tmp_path.iterdir())) == 1
+    machine_2 = cache.get_machine(do_abc_tag.abc_file)
+    assert machine_2.linking == machine_1.linking
+    assert machine_2.abc_file.method_bodies.loaded_count == 0
+    assert machine_2.call_method('battle.BattleCore.hitrateIntensity', undefined, 4, 8) == 0.5
+
+
+def test_cache_version_mismatch(do_abc_tag: DoABCTag, tmp_path: Path, monkeypatch: MonkeyPatch):
+    cache = ABCFileCache(tmp_path)
+    cache.get_machine(do_abc_tag.abc_file)
+    path, = tmp_path.iterdir()
+    monkeypatch.setattr(avm2, '__version__', '0.0')
+    assert ABCFileCache.load(path, do_abc_tag.abc_file, bytes.fromhex(path.stem)) is None
+    machine = cache.get_machine(do_abc_tag.abc_file)
+    assert machine.call_method('battle.BattleCore.hitrateIntensity', undefined, 4, 8) == 0.5
+    assert ABCFileCache.load(path, do_abc_tag.abc_file, bytes.fromhex(path.stem)) is not None
+
+
+def test_cache_corrupted(do_abc_tag: DoABCTag, tmp_path: Path):
+    cache = ABCFileCache(tmp_path)
+    cache.get_machine(do_abc_tag.abc_file)
+    path, = tmp_path.iterdir()
+    path.write_bytes(path.read_bytes()[:100])
+    assert ABCFileCache.load(path, do_abc_tag.abc_file, bytes.fromhex(path.stem)) is None
+
+
+def test_cache_stale_layout(do_abc_tag: DoABCTag, tmp_path: Path):
+    cache = ABCFileCache(tmp_path)
+    machine = cache.get_machine(do_abc_tag.abc_file)
+    path, = tmp_path.iterdir()
+    digest = bytes.fromhex(path.stem)
+
+    cache.store(path, do_abc_tag.abc_file, digest, machine.abc_file, replace(machine.linking))
+    assert ABCFileCache.load(path, do_abc_tag.abc_file, digest) is not None
+
+    # As if the entry was written before `Linking.name_to_script` was added.
+    linking = replace(machine.linking)
+    del linking.name_to_script
+    cache.store(path, do_abc_tag.abc_file, digest, machine.abc_file, linking)
+    assert ABCFileCache.load(path, do_abc_tag.abc_file, digest) is None
+
+    path.write_bytes(path.read_bytes()[:40] + b'garbage')
+    assert ABCFileCache.load(path, do_abc_tag.abc_file, digest) is None
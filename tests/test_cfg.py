@@ -0,0 +1,40 @@
+from avm2.abc.types import ABCFile
+from avm2.cfg import build_control_flow_graph
+from avm2.vm import VirtualMachine
+from tests.utils import loop_code, make_abc_file, write_s24
+
+
+def test_build_loop():
+    machine = VirtualMachine(make_abc_file([loop_code]))
+    graph = build_control_flow_graph(machine.abc_file.method_bodies[0], machine.decode_method_body(0))
+    assert [(block.start, block.end) for block in graph.blocks] == [(0, 5), (5, 13), (13, 16), (16, 18)]
+    assert [block.successors for block in graph.blocks] == [[2], [2], [1, 3], []]
+    assert graph.immediate_dominators == [None, 2, 0, 2]
+    assert graph.loops == {2: {1, 2}}
+    assert graph.dominates(0, 3)
+    assert not graph.dominates(1, 2)
+    assert '21  IfLT(offset=-15)  -> block 1' in graph.disassemble()
+
+
+def test_build_switch():
+    code = (
+        b'\xD1\x1B' + write_s24(11) + b'\x01' + write_s24(12) + write_s24(11)  # getlocal1, lookupswitch
+        + b'\x47\x47'  # returnvoid, returnvoid
+        + b'\x47'  # unreachable returnvoid
+    )
+    machine = VirtualMachine(make_abc_file([code]))
+    graph = build_control_flow_graph(machine.abc_file.method_bodies[0], machine.decode_method_body(0))
+    assert graph.jump_targets[1] == (2, 3)
+    assert [block.successors for block in graph.blocks] == [[1, 2], [], [], []]
+    assert not graph.is_reachable(3)
+    assert 'block 3: unreachable' in graph.disassemble()
+
+
+def test_build_exceptions(abc_file: ABCFile):
+    machine = VirtualMachine(abc_file)
+    index, method_body = next(
+        (index, method_body) for index, method_body in enumerate(abc_file.method_bodies) if method_body.exceptions)
+    graph = build_control_flow_graph(method_body, machine.decode_method_body(index))
+    handler = graph.block_ids[machine.decode_method_body(index).offset_to_index[method_body.exceptions[0].target]]
+    assert any(handler in block.handlers for block in graph.blocks)
+    assert graph.is_reachable(handler)
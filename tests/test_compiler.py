@@ -0,0 +1,40 @@
+import pytest
+
+from avm2.abc.types import ABCFile
+from avm2.runtime import undefined
+from avm2.vm import VirtualMachine
+from tests.utils import loop_code, make_abc_file
+
+
+@pytest.mark.parametrize('name, args', [
+    ('battle.BattleCore.hitrateIntensity', (-100, 0)),
+    ('battle.BattleCore.hitrateIntensity', (100, 0)),
+    ('battle.BattleCore.hitrateIntensity', (0, 100)),
+    ('battle.BattleCore.hitrateIntensity', (4, 8)),
+    ('battle.BattleCore.getElementalPenetration', (2, 300000)),
+    ('battle.BattleCore.getElementalPenetration', (42, -100500)),
+    ('battle.BattleCore.getElementalPenetration', (1000, 100)),
+])
+def test_compiled_equals_interpreted(abc_file: ABCFile, name: str, args):
+    compiled_machine = VirtualMachine(abc_file)
+    interpreted_machine = VirtualMachine(abc_file, compile_methods=False)
+    assert compiled_machine.call_method(name, undefined, *args) == interpreted_machine.call_method(name, undefined, *args)
+    assert compiled_machine.compiled_calls == 1
+    assert compiled_machine.interpreted_calls == 0
+
+
+def test_compile_loop():
+    machine = VirtualMachine(make_abc_file([loop_code]))
+    assert machine.call_method(0, undefined, 100) == 4950
+    assert machine.call_method(0, undefined, 0) == 0
+    assert machine.compiled_calls == 2
+    assert 'while True:' in machine.program.compile_method_body(0).source
+
+
+def test_compile_fallback():
+    machine = VirtualMachine(make_abc_file([b'\xD1\x20\x41\x00\x48']))  # getlocal1, pushnull, call 0, returnvalue
+    assert machine.program.compile_method_body(0) is None
+    with pytest.raises(NotImplementedError):
+        machine.call_method(0, undefined, 42)
+    assert machine.interpreted_calls == 1
+    assert machine.compiled_calls == 0
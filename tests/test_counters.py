@@ -0,0 +1,65 @@
+import pickle
+
+from pytest import raises
+
+from avm2.counters import merge_hit_counts
+from avm2.runtime import undefined
+from avm2.vm import VirtualMachine
+from tests.test_peephole import debug_code
+from tests.test_vm import sum_code
+from tests.utils import loop_code, make_abc_file
+
+
+def test_count_hits():
+    machine = VirtualMachine(make_abc_file([loop_code]), compile_methods=False, memoize_methods=False)
+    with machine.count_hits() as hit_counts:
+        assert machine.call_method(0, undefined, 10) == 45
+    assert machine.profiler is None
+    assert 'execute_frame' not in vars(machine)
+    # The uninstrumented loop does not count.
+    assert 'counts' not in VirtualMachine.execute_frame.__code__.co_varnames
+
+    # The loop condition is checked 11 times, the body is run 10 times.
+    assert [count for _, count in hit_counts.get_top_sites(3)] == [11, 10, 10]
+    assert hit_counts.get_method_body_counts() == {0: hit_counts.total}
+    # Superinstructions are counted as the original instructions.
+    assert 'LocalsBranch' not in hit_counts.opcodes
+    assert hit_counts.opcodes['IfLT'] == 11
+    assert sum(hit_counts.opcodes.values()) > hit_counts.total
+
+    listing = hit_counts.disassemble_top_sites(machine.program, limit=3).splitlines()
+    assert len(listing) == 3
+    assert listing[0].split()[:5] == ['11', '18.97%', 'method', '#0', '+19']
+    assert 'LocalsBranch(' in listing[0]
+
+
+def test_count_hits_calls():
+    machine = VirtualMachine(make_abc_file([sum_code]), memoize_methods=False)
+    with machine.count_hits() as hit_counts:
+        assert machine.call_method(0, undefined, 10) == 55
+    assert hit_counts.opcodes['ReturnValue'] == 11
+    assert hit_counts.opcodes['CallStatic'] == 10
+
+
+def test_count_hits_stripped():
+    machine = VirtualMachine(make_abc_file([debug_code]), compile_methods=False, memoize_methods=False)
+    with machine.count_hits() as hit_counts:
+        machine.call_method(0, undefined, 42)
+    assert hit_counts.total == 2
+    assert hit_counts.opcodes == {'DebugLine': 2, 'GetLocal1': 1, 'Nop': 1, 'CoerceAny': 1, 'ReturnValue': 1}
+
+
+def test_merge_hit_counts():
+    machine = VirtualMachine(make_abc_file([loop_code]), compile_methods=False, memoize_methods=False)
+    with machine.count_hits() as hit_counts:
+        machine.call_method(0, undefined, 10)
+    merged = merge_hit_counts([hit_counts, pickle.loads(pickle.dumps(hit_counts))])
+    assert merged.sites == {site: count * 2 for site, count in hit_counts.sites.items()}
+    assert merged.total == hit_counts.total * 2
+
+
+def test_count_hits_profiling():
+    machine = VirtualMachine(make_abc_file([loop_code]))
+    with machine.profile():
+        with raises(ValueError):
+            machine.count_hits().start()
@@ -0,0 +1,41 @@
+import pytest
+
+from avm2.abc.types import ABCFile
+from avm2.fusion import DupBranch, LocalByteOperation, LocalsBranch, LocalsOperation
+from avm2.runtime import undefined
+from avm2.vm import VirtualMachine
+from tests.utils import loop_code, make_abc_file
+
+
+def test_fuse_loop():
+    machine = VirtualMachine(make_abc_file([loop_code]), compile_methods=False)
+    assert machine.call_method(0, undefined, 100) == 4950
+    code = machine.program.get_interpreted_code(0)
+    assert [type(instruction) for instruction in code.instructions[5:10:2]] == [
+        LocalsOperation, LocalByteOperation, LocalsBranch]
+    assert len(code.instructions) == 12
+    assert code.verification.jump_indices[4] == 9
+    assert code.verification.jump_indices[9] == 5
+
+
+def test_fuse_jump_target():
+    # getlocal1, jump +1, getlocal2, pushbyte 3, add, returnvalue: the jump lands on `pushbyte`.
+    machine = VirtualMachine(make_abc_file([b'\xD1\x10\x01\x00\x00\xD2\x24\x03\xA0\x48']), compile_methods=False)
+    assert machine.call_method(0, undefined, 39) == 42
+    assert not any(isinstance(instruction, LocalByteOperation) for instruction in machine.program.get_interpreted_code(0).instructions)
+
+
+@pytest.mark.parametrize('value, expected', [(0, 7), (5, 5)])
+def test_fuse_dup_branch(value: int, expected: int):
+    # getlocal1, dup, iftrue +3, pop, pushbyte 7, returnvalue: `value || 7`.
+    machine = VirtualMachine(make_abc_file([b'\xD1\x2A\x11\x03\x00\x00\x29\x24\x07\x48']), compile_methods=False)
+    assert machine.call_method(0, undefined, value) == expected
+    assert isinstance(machine.program.get_interpreted_code(0).instructions[1], DupBranch)
+
+
+@pytest.mark.parametrize('args', [(-100, 0), (100, 0), (0, 100), (4, 8)])
+def test_fused_equals_unfused(abc_file: ABCFile, args):
+    name = 'battle.BattleCore.hitrateIntensity'
+    fused_machine = VirtualMachine(abc_file, compile_methods=False)
+    machine = VirtualMachine(abc_file, compile_methods=False, fuse_instructions=False)
+    assert fused_machine.call_method(name, undefined, *args) == machine.call_method(name, undefined, *args)
@@ -1,6 +1,6 @@
 import pytest
 
-from avm2.io import MemoryViewReader
+from avm2.io import MemoryViewReader, map_file
 
 
 def test_memory_view_reader_read():
@@ -75,3 +75,11 @@ def test_is_eof():
     assert reader.is_eof()
     reader.skip(42)
     assert reader.is_eof()
+
+
+def test_map_file(tmp_path):
+    path = tmp_path / 'file'
+    path.write_bytes(b'abc')
+    buffer = map_file(path)
+    assert buffer.readonly
+    assert MemoryViewReader(buffer).read_all() == b'abc'
@@ -0,0 +1,46 @@
+import pytest
+
+from avm2.abc.instructions import ConvertToInteger, GetLocal1, Jump, ReturnValue
+from avm2.runtime import undefined
+from avm2.vm import VirtualMachine
+from tests.utils import make_abc_file
+
+# debugline 7, getlocal1, nop, coerce_a, debugline 8, returnvalue
+debug_code = b'\xF0\x07\xD1\x02\x82\xF0\x08\x48'
+
+
+def test_strip_code():
+    machine = VirtualMachine(make_abc_file([debug_code]), compile_methods=False)
+    assert machine.call_method(0, undefined, 42) == 42
+    code = machine.decode_method_body(0)
+    assert [type(instruction) for instruction in code.instructions] == [GetLocal1, ReturnValue]
+    assert code.offsets == [0, 3, 8]
+    assert [code.get_source_offset(index) for index in range(2)] == [2, 7]
+    assert [code.get_line_number(index) for index in range(2)] == [7, 8]
+    assert [type(instruction).__name__ for instruction in code.get_source_instructions(1)] == [
+        'Nop', 'CoerceAny', 'DebugLine', 'ReturnValue']
+
+
+def test_strip_code_disabled():
+    machine = VirtualMachine(make_abc_file([debug_code]), strip_instructions=False)
+    code = machine.decode_method_body(0)
+    assert len(code.instructions) == 6
+    assert code.get_line_number(5) == 8
+
+
+@pytest.mark.parametrize('verify_methods', [False, True])
+def test_strip_jump_target(verify_methods: bool):
+    # jump +0, label, getlocal1, returnvalue: the jump lands on the removed label.
+    machine = VirtualMachine(
+        make_abc_file([b'\x10\x00\x00\x00\x09\xD1\x48']), compile_methods=False, verify_methods=verify_methods)
+    assert machine.call_method(0, undefined, 42) == 42
+    code = machine.decode_method_body(0)
+    assert [type(instruction) for instruction in code.instructions] == [Jump, GetLocal1, ReturnValue]
+    assert code.get_jump_index(0, 0) == 1
+
+
+def test_strip_redundant_coercion():
+    # pushbyte 1, convert_i, returnvalue; getlocal1, convert_i, returnvalue
+    machine = VirtualMachine(make_abc_file([b'\x24\x01\x73\x48', b'\xD1\x73\x48']))
+    assert not any(isinstance(instruction, ConvertToInteger) for instruction in machine.decode_method_body(0).instructions)
+    assert any(isinstance(instruction, ConvertToInteger) for instruction in machine.decode_method_body(1).instructions)
@@ -0,0 +1,66 @@
+import os
+import pickle
+from typing import Any, Union
+
+from pytest import raises
+
+from avm2.exceptions import ASThrowException
+from avm2.pool import VirtualMachinePool
+from avm2.runtime import undefined
+from avm2.abc.types import ABCMethodIndex
+from avm2.vm import VirtualMachine
+from tests.utils import make_abc_file
+
+jobs = [
+    ('battle.BattleCore.hitrateIntensity', undefined, (a, b))
+    for a in range(-5, 5)
+    for b in range(-5, 5)
+    if a != b
+] + [
+    ('battle.BattleCore.getElementalPenetration', undefined, (a, b))
+    for a in range(10)
+    for b in (2, 300000, -100500)
+]
+
+
+def test_pickle_undefined():
+    assert pickle.loads(pickle.dumps(undefined)) is undefined
+
+
+def test_map(machine: VirtualMachine):
+    with VirtualMachinePool(machine, processes=2, chunk_size=7) as pool:
+        assert pool.map(jobs) == [machine.call_method(method, this, *args) for method, this, args in jobs]
+        assert pool.map([]) == []
+
+
+def test_map_async(machine: VirtualMachine):
+    with VirtualMachinePool(machine, processes=2) as pool:
+        result = pool.map_async(jobs)
+        result.wait(60)
+        assert result.ready()
+        assert result.successful()
+        assert result.get() == [machine.call_method(method, this, *args) for method, this, args in jobs]
+
+
+class ProcessIDMachine(VirtualMachine):
+    def call_method(self, index_or_name: Union[ABCMethodIndex, str], this: Any, *args) -> Any:
+        return os.getpid()
+
+
+def test_recycle_workers(machine: VirtualMachine):
+    with VirtualMachinePool(machine, processes=1, chunk_size=2, max_calls_per_worker=3) as pool:
+        assert pool.map(jobs) == [machine.call_method(method, this, *args) for method, this, args in jobs]
+
+    # The limit is rounded up to 2 chunks, that is 4 calls per worker.
+    process_id_machine = ProcessIDMachine(make_abc_file([]))
+    with VirtualMachinePool(process_id_machine, processes=1, chunk_size=2, max_calls_per_worker=3) as pool:
+        process_ids = pool.map([(0, undefined, ())] * 12)
+    assert [len(set(process_ids[start:start + 4])) for start in range(0, 12, 4)] == [1, 1, 1]
+    assert len(set(process_ids)) == 3
+
+
+def test_map_raises():
+    machine = VirtualMachine(make_abc_file([b'\xD1\x03']))  # getlocal1, throw
+    with VirtualMachinePool(machine, processes=1) as pool:
+        with raises(ASThrowException):
+            pool.map([(0, undefined, (42,))])
@@ -0,0 +1,52 @@
+import pstats
+from time import process_time
+
+from avm2.runtime import undefined
+from avm2.vm import VirtualMachine
+from tests.test_vm import sum_code
+from tests.utils import loop_code, make_abc_file
+
+
+def test_deterministic_profiler():
+    machine = VirtualMachine(make_abc_file([sum_code]), memoize_methods=False)
+    with machine.profile() as profile:
+        assert machine.call_method(0, undefined, 10) == 55
+    assert machine.profiler is None
+    assert 'execute_frame' not in vars(machine)
+
+    statistics = profile.methods[0]
+    assert statistics.calls == 11
+    assert statistics.primitive_calls == 1
+    assert 0.0 < statistics.own_time <= statistics.total_time
+    assert profile.callers[0, 0].calls == 10
+    assert profile.hit_counts.opcodes['ReturnValue'] == 11
+    assert profile.names == {0: 'method #0'}
+
+    stats = pstats.Stats(profile)
+    assert stats.total_calls == 11
+    assert stats.prim_calls == 1
+    assert ('~', 0, 'method #0') in stats.stats
+
+    folded_stacks = profile.get_folded_stacks().splitlines()
+    assert [line.rsplit(' ', 1)[0].count(';') for line in folded_stacks] == list(range(len(folded_stacks)))
+
+
+def test_deterministic_profiler_compiled(machine: VirtualMachine):
+    with machine.profile() as profile:
+        machine.execute_method(machine.lookup_method('battle.BattleCore.hitrateIntensity'), undefined, 4, 8)
+    assert list(profile.methods) == [24360]
+    assert profile.methods[24360].calls == 1
+    assert list(pstats.Stats(profile).stats) == [('~', 0, 'battle.BattleCore.hitrateIntensity')]
+    assert profile.get_folded_stacks().startswith('battle.BattleCore.hitrateIntensity ')
+
+
+def test_sampling_profiler():
+    machine = VirtualMachine(make_abc_file([loop_code]), compile_methods=False, memoize_methods=False)
+    with machine.profile(sampling=True, interval=0.001) as profile:
+        start_time = process_time()
+        while not profile.sample_count and process_time() - start_time < 5.0:
+            machine.call_method(0, undefined, 1000)
+    assert profile.sample_count
+    assert list(profile.call_tree.children) == [0]
+    assert profile.methods[0].own_time > 0.0
+    assert profile.get_folded_stacks().startswith('method #0 ')
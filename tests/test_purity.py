@@ -0,0 +1,68 @@
+from avm2.purity import is_pure
+from avm2.runtime import undefined
+from avm2.vm import VirtualMachine, make_memo_key
+from tests.utils import make_abc_file
+
+identity_code = b'\xD1\x48'  # getlocal1, returnvalue
+set_property_code = b'\xD0\xD1\x61\x01\x47'  # getlocal0, getlocal1, setproperty 1, returnvoid
+
+
+def call_static_code(index: int) -> bytes:
+    return b'\xD0\xD1\x44' + bytes([index]) + b'\x01\x48'  # getlocal0, getlocal1, callstatic index 1, returnvalue
+
+
+def test_is_pure(machine: VirtualMachine):
+    assert is_pure(machine.program, machine.lookup_method('battle.BattleCore.hitrateIntensity'))
+    assert is_pure(machine.program, machine.lookup_method('battle.BattleCore.getElementalPenetration'))
+
+
+def test_is_pure_calls():
+    machine = VirtualMachine(make_abc_file([
+        identity_code,
+        set_property_code,
+        call_static_code(0),
+        call_static_code(1),
+        call_static_code(4),  # recursion
+    ]))
+    assert [is_pure(machine.program, index) for index in range(5)] == [True, False, True, False, True]
+
+
+def test_memoization():
+    machine = VirtualMachine(make_abc_file([identity_code]))
+    assert machine.call_method(0, undefined, 1) == 1
+    assert type(machine.call_method(0, undefined, 1.0)) is float
+    assert machine.call_method(0, undefined, 1) == 1
+    assert machine.get_memo_statistics()[0].hits == 1
+    assert machine.get_memo_statistics()[0].misses == 2
+    assert machine.get_memo_statistics()[0].size == 2
+    assert machine.compiled_calls == 2
+
+
+def test_memoization_eviction():
+    machine = VirtualMachine(make_abc_file([identity_code]), memo_size=2)
+    for value in (1, 2, 1, 3):
+        assert machine.call_method(0, undefined, value) == value
+    # The hit has made `1` more recent than `2`.
+    memo = machine.program.get_memo(0)
+    assert make_memo_key(undefined, 1) in memo
+    assert make_memo_key(undefined, 2) not in memo
+    assert make_memo_key(undefined, 3) in memo
+
+
+def test_memoization_override(machine: VirtualMachine):
+    name = 'battle.BattleCore.hitrateIntensity'
+    machine.set_memoization(name, False)
+    assert name not in machine.get_memo_statistics()
+    machine.call_method(name, undefined, 4, 8)
+    assert name not in machine.get_memo_statistics()
+    machine.set_memoization(name, None)
+    machine.call_method(name, undefined, 4, 8)
+    machine.call_method(name, undefined, 4, 8)
+    assert machine.get_memo_statistics()[name].hit_rate == 0.5
+
+
+def test_memoization_forced():
+    machine = VirtualMachine(make_abc_file([set_property_code]))
+    assert machine.program.get_memo(0) is None
+    machine.set_memoization(0, True)
+    assert machine.program.get_memo(0) is not None
@@ -0,0 +1,70 @@
+import pickle
+
+from pytest import raises
+
+from avm2.runtime import MAX_SHARED_SHAPE_SIZE, ASObject, DictionaryShape, Shape, empty_shape, undefined
+from avm2.vm import VirtualMachine
+
+
+def test_shape_transitions():
+    object_1 = ASObject(properties={('', 'a'): 1, ('', 'b'): 2})
+    object_2 = ASObject()
+    object_2.set_property(('', 'a'), 3)
+    object_2.set_property(('', 'b'), 4)
+    assert object_1.shape is object_2.shape
+    assert object_1.shape.parent is empty_shape.add(('', 'a'))
+    assert object_1.values == [1, 2]
+    assert object_2.properties == {('', 'a'): 3, ('', 'b'): 4}
+
+
+def test_set_existing_property():
+    object_ = ASObject(properties={('', 'a'): 1})
+    shape = object_.shape
+    object_.set_property(('', 'a'), 2)
+    assert object_.shape is shape
+    assert object_.get_property(('', 'a')) == 2
+    with raises(KeyError):
+        object_.get_property(('', 'b'))
+
+
+def test_instance_shape(machine: VirtualMachine):
+    class_index = machine.lookup_class('game.battle.controller.BattleEnemyReward')
+    shape = machine.program.get_instance_shape(class_index)
+    assert list(shape.slots) == [
+        ('game.battle.controller:BattleEnemyReward', 'hasReward'),
+        ('game.battle.controller:BattleEnemyReward', 'rewardPerHero'),
+    ]
+    assert machine.program.get_instance_shape(class_index) is shape
+    # The layout is added at once.
+    assert shape.parent is empty_shape
+    object_ = ASObject(class_index, shape=shape)
+    assert object_.values == [undefined] * len(shape)
+
+
+def test_pickle_shape():
+    object_ = ASObject(properties={('', 'a'): 1, ('', 'b'): undefined})
+    restored = pickle.loads(pickle.dumps(object_))
+    assert restored.shape is object_.shape
+    assert restored.properties == {('', 'a'): 1, ('', 'b'): undefined}
+    assert restored.get_property(('', 'b')) is undefined
+
+
+def test_dictionary_mode():
+    keys = [('', str(index)) for index in range(MAX_SHARED_SHAPE_SIZE + 2)]
+    object_ = ASObject()
+    for index, key in enumerate(keys):
+        shape = object_.shape
+        object_.set_property(key, index)
+        assert object_.shape is not shape
+    assert isinstance(object_.shape, DictionaryShape)
+    assert object_.properties == {key: index for index, key in enumerate(keys)}
+    assert pickle.loads(pickle.dumps(object_)).properties == object_.properties
+
+
+def test_lazy_slots():
+    shape = empty_shape.extend((('', 'lazy_1'),)).extend((('', 'lazy_2'), ('', 'lazy_3')))
+    assert len(shape) == 3
+    assert shape.slots == {('', 'lazy_1'): 0, ('', 'lazy_2'): 1, ('', 'lazy_3'): 2}
+    # The intermediate shape has not built its slots.
+    with raises(AttributeError):
+        Shape.slots.__get__(shape.parent)
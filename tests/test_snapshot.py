@@ -0,0 +1,67 @@
+from pytest import fixture, raises
+
+from avm2.abc.types import ABCFile
+from avm2.runtime import undefined
+from avm2.snapshot import SnapshotError, get_digest
+from avm2.swf.types import DoABCTag
+from avm2.vm import VirtualMachine
+
+
+@fixture
+def initialized_machine(abc_file: ABCFile, do_abc_tag: DoABCTag) -> VirtualMachine:
+    machine = VirtualMachine(abc_file, abc_digest=get_digest(do_abc_tag.abc_file))
+    machine.init_class(machine.lookup_class('game.battle.controller.BattleEnemyReward'))
+    machine.init_class(machine.lookup_class('com.progrestar.framework.ares.core.Frame'))
+    return machine
+
+
+def test_snapshot(initialized_machine: VirtualMachine, do_abc_tag: DoABCTag):
+    blob = initialized_machine.snapshot()
+    machine = VirtualMachine.restore(blob, do_abc_tag.abc_file, initialized_machine.abc_file)
+    assert machine.abc_file is initialized_machine.abc_file
+    assert machine.linking == initialized_machine.linking
+    assert machine.script_timings == initialized_machine.script_timings
+    assert machine.script_objects.keys() == initialized_machine.script_objects.keys()
+    assert machine.class_objects.keys() == initialized_machine.class_objects.keys()
+    for index, script_object in machine.script_objects.items():
+        # Script objects are in the dictionary mode, each has a shape of its own.
+        assert script_object.shape.slots == initialized_machine.script_objects[index].shape.slots
+    assert machine.global_object.properties.keys() == initialized_machine.global_object.properties.keys()
+    assert machine.call_method('battle.BattleCore.hitrateIntensity', undefined, 4, 8) == 0.5
+
+    # Scripts are not initialised again.
+    script_count = len(machine.script_objects)
+    machine.init_class(machine.lookup_class('com.progrestar.framework.ares.core.Frame'))
+    assert len(machine.script_objects) == script_count
+
+
+def test_snapshot_lazy_abc_file(initialized_machine: VirtualMachine, do_abc_tag: DoABCTag):
+    machine = VirtualMachine.restore(initialized_machine.snapshot(), do_abc_tag.abc_file)
+    assert machine.abc_file.method_bodies.loaded_count == 0
+    assert machine.script_objects.keys() == initialized_machine.script_objects.keys()
+
+
+def test_snapshot_program(initialized_machine: VirtualMachine, do_abc_tag: DoABCTag):
+    program = initialized_machine.program
+    machine = VirtualMachine.restore(initialized_machine.snapshot(), do_abc_tag.abc_file, program=program)
+    assert machine.program is program
+    assert machine.script_objects.keys() == initialized_machine.script_objects.keys()
+    assert all(
+        script_object is not initialized_machine.script_objects[index]
+        for index, script_object in machine.script_objects.items()
+    )
+
+
+def test_snapshot_mismatch(initialized_machine: VirtualMachine, do_abc_tag: DoABCTag):
+    blob = initialized_machine.snapshot()
+    with raises(SnapshotError):
+        VirtualMachine.restore(blob, b'other')
+    with raises(SnapshotError):
+        VirtualMachine.restore(blob[:100], do_abc_tag.abc_file)
+    with raises(SnapshotError):
+        VirtualMachine.restore(b'AVMC' + blob[4:], do_abc_tag.abc_file)
+
+
+def test_snapshot_unknown_digest(abc_file: ABCFile):
+    with raises(ValueError):
+        VirtualMachine(abc_file).snapshot()
@@ -1,6 +1,16 @@
 from __future__ import annotations
 
-from avm2.swf.parser import parse_swf
+import mmap
+import zlib
+from pathlib import Path
+from struct import pack
+
+from pytest import mark
+
+from avm2.io import MemoryViewReader
+from avm2.swf.enums import Signature, TagType
+from avm2.abc.types import ABCFile
+from avm2.swf.parser import index_swf, make_decompressor, parse_swf, parse_swf_file
 from avm2.swf.types import DoABCTag, DoABCTagFlags
 
 
@@ -20,6 +30,54 @@ def test_parse_swf_4(swf_4: memoryview):
     assert len(list(parse_swf(swf_4))) == 9
 
 
+def test_parse_swf_3_first_tag(swf_3: memoryview):
+    assert next(iter(parse_swf(swf_3))).type_ == TagType.FILE_ATTRIBUTES
+
+
+def test_decompressor_fill(swf_3: bytes):
+    reader = MemoryViewReader(swf_3)
+    reader.skip(8)
+    decompressor = make_decompressor(reader, Signature.ZLIB, len(swf_3))
+    decompressor.fill(100)
+    assert 100 <= decompressor.size < len(decompressor.buffer)
+    assert len(decompressor.reader.buffer) == decompressor.size
+    assert not decompressor.is_eof()
+    decompressor.fill(len(swf_3) * 10)
+    assert decompressor.is_eof()
+
+
+@mark.parametrize('file_length', [8, 80, 8000])
+def test_parse_swf_1_compressed_wrong_length(swf_1: bytes, file_length: int):
+    compressed = b'CWS' + swf_1[3:4] + pack('<I', file_length) + zlib.compress(swf_1[8:])
+    assert [tag.raw.tobytes() for tag in parse_swf(compressed)] == [tag.raw.tobytes() for tag in parse_swf(swf_1)]
+
+
+def test_parse_swf_3_types(swf_3: bytes):
+    tags = list(parse_swf(swf_3, types={TagType.DO_ABC, TagType.SYMBOL_CLASS}))
+    assert [tag.type_ for tag in tags] == [TagType.DO_ABC, TagType.SYMBOL_CLASS] * 2
+
+
+def test_index_swf_3(swf_3: bytes):
+    index = index_swf(swf_3)
+    assert len(index) == 1996
+    assert index.count(TagType.DEFINE_SPRITE) == 874
+    assert index.count(TagType.DO_ABC) == 2
+    assert sum(index.counts().values()) == len(index)
+    assert [tag.raw.tobytes() for tag in index.find(TagType.DO_ABC)] == [
+        tag.raw.tobytes() for tag in parse_swf(swf_3, types={TagType.DO_ABC})
+    ]
+
+
+def test_parse_swf_file_2_uncompressed(swf_2: bytes, tmp_path: Path):
+    body = index_swf(swf_2).buffer
+    path = tmp_path / 'heroes.swf'
+    path.write_bytes(b'FWS' + swf_2[3:4] + pack('<I', len(body) + 8) + body)
+    do_abc_tag = DoABCTag(next(iter(parse_swf_file(path, types={TagType.DO_ABC}))).raw)
+    assert isinstance(do_abc_tag.abc_file.obj, mmap.mmap)
+    abc_file = ABCFile(MemoryViewReader(do_abc_tag.abc_file))
+    assert isinstance(abc_file.method_bodies[0].code.obj, mmap.mmap)
+
+
 def test_do_abc_tag_2(do_abc_tag: DoABCTag):
     assert do_abc_tag.flags == DoABCTagFlags.LAZY_INITIALIZE
     assert do_abc_tag.name == 'merged'
@@ -0,0 +1,71 @@
+import pytest
+
+from avm2.abc.instructions import decode_code
+from avm2.abc.types import ABCFile, ASException
+from avm2.exceptions import ASVerifyError
+from avm2.io import MemoryViewReader
+from avm2.runtime import undefined
+from avm2.verifier import ANY, BOOLEAN, INT, NUMBER, verify_method_body
+from avm2.vm import VirtualMachine
+from tests.utils import loop_code, make_abc_file
+
+
+def test_verify_all(abc_file: ABCFile):
+    machine = VirtualMachine(abc_file)
+    for index, method_body in enumerate(abc_file.method_bodies):
+        verification = verify_method_body(machine.program, index, method_body, decode_code(method_body.code))
+        assert verification.max_stack_depth <= method_body.max_stack
+
+
+def test_verify_loop():
+    machine = VirtualMachine(make_abc_file([loop_code]))
+    verification = machine.decode_method_body(0).verification
+    assert verification.stack_depths == [0, 1, 0, 1, 0, 0, 1, 2, 1, 0, 1, 2, 1, 0, 1, 2, 0, 1]
+    assert verification.stack_types[8] == (ANY,)  # sum of the registers of unknown types
+    assert verification.stack_types[11] == (ANY, INT)
+    assert verification.jump_indices[4] == 13
+    assert verification.jump_indices[15] == 5
+    assert verification.max_stack_depth == 2
+
+
+def test_verify_types():
+    machine = VirtualMachine(make_abc_file([b'\x24\x01\x24\x02\xA0\x24\x04\xAD\x48']))  # 1 + 2 < 4
+    stack_types = machine.decode_method_body(0).verification.stack_types
+    assert stack_types == [(), (INT,), (INT, INT), (NUMBER,), (NUMBER, INT), (BOOLEAN,)]
+    assert machine.call_method(0, undefined) is True
+
+
+@pytest.mark.parametrize('code, message', [
+    (b'\x48', 'stack underflow'),  # returnvalue
+    (b'\x24\x00\x24\x00\x24\x00\x48', 'stack overflow'),  # pushbyte 0 thrice with `max_stack` of 2
+    (b'\x10\x05\x00\x00\x47', 'jump target 9 is not an instruction'),  # jump +5, returnvoid
+    (b'\x10\x00\x00\x80\x47', 'jump target'),  # jump into the middle of the next instruction
+    (b'\x62\x09\x48', 'register 9 out of range 8'),  # getlocal 9, returnvalue
+    (b'\x24\x00', 'falls off the end'),  # pushbyte 0
+    (b'\xD1\x12\x02\x00\x00\x24\x00\x24\x00\x48', 'inconsistent stack depth'),  # branch over a push
+    (b'\x1D\x47', 'scope stack underflow'),  # popscope, returnvoid
+    (b'\x65\x00\x48', 'scope index 0 out of range'),  # getscopeobject 0, returnvalue
+    (b'\x2C\x01\x48', 'strings index 1 out of range'),  # pushstring 1, returnvalue
+    (b'', 'empty code'),
+])
+def test_verify_invalid(code: bytes, message: str):
+    machine = VirtualMachine(make_abc_file([code], max_stack=2))
+    with pytest.raises(ASVerifyError, match=message):
+        machine.call_method(0, undefined)
+
+
+@pytest.mark.parametrize('exception, message', [
+    (b'\x00\x02\x01\x00\x00', 'exception 0: handler target 1 is not an instruction'),  # into `pushbyte 0`
+    (b'\x00\x09\x02\x00\x00', r'exception 0: range 0\.\.9 is out of the code'),
+])
+def test_verify_invalid_exception(exception: bytes, message: str):
+    abc_file = make_abc_file([b'\x24\x00\x29\x47'])  # pushbyte 0, pop, returnvoid
+    abc_file.method_bodies[0].exceptions = [ASException(MemoryViewReader(exception))]
+    with pytest.raises(ASVerifyError, match=message):
+        VirtualMachine(abc_file).call_method(0, undefined)
+
+
+def test_verify_disabled():
+    machine = VirtualMachine(make_abc_file([loop_code]), compile_methods=False, verify_methods=False)
+    assert machine.call_method(0, undefined, 100) == 4950
+    assert machine.decode_method_body(0).verification is None
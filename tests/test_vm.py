@@ -1,6 +1,15 @@
-from avm2.runtime import undefined
+from pytest import approx, raises
+
+from avm2.abc.enums import MultinameKind
+from avm2.abc.instructions import GetLex
+from avm2.abc.types import ABCFile, ABCMethodBodyIndex
+from avm2.exceptions import ASReferenceError, ASStackOverflowError, ASThrowException
+from avm2.io import MemoryViewReader
+from avm2.runtime import ASObject, undefined
 from avm2.swf.types import DoABCTag, Tag
-from avm2.vm import VirtualMachine, execute_do_abc_tag, execute_tag
+import avm2.vm
+from avm2.vm import MethodEnvironment, Program, VirtualMachine, execute_do_abc_tag, execute_tag
+from tests.utils import loop_code, make_abc_file, write_int
 
 
 def test_execute_tag(raw_do_abc_tag: Tag):
@@ -36,3 +45,207 @@ def test_call_hitrate_intensity(machine: VirtualMachine):
 
 def test_new_battle_enemy_reward(machine: VirtualMachine):
     machine.new_instance('game.battle.controller.BattleEnemyReward')
+
+
+def test_decoded_code_cache(abc_file: ABCFile):
+    machine = VirtualMachine(abc_file, code_cache_size=1, compile_methods=False)
+    assert machine.call_method('battle.BattleCore.hitrateIntensity', undefined, 4, 8) == 0.5
+    assert machine.call_method('battle.BattleCore.hitrateIntensity', undefined, 0, 100) == 0
+    assert machine.program.decoded_code.hits == 1
+    assert machine.call_method('battle.BattleCore.getElementalPenetration', undefined, 2, 300000) == 1
+    assert len(machine.program.decoded_code) == 1
+    assert machine.program.decoded_code.misses == 2
+
+
+def test_loop():
+    machine = VirtualMachine(make_abc_file([loop_code]), compile_methods=False)
+    assert machine.call_method(0, undefined, 100) == 4950
+    assert machine.call_method(0, undefined, 0) == 0
+
+
+# `n == 0 ? 0 : n + sum(n - 1)`
+sum_code = (
+    b'\xD1\x24\x00\x14\x03\x00\x00'  # getlocal1, pushbyte 0, ifne +3
+    b'\x24\x00\x48'  # pushbyte 0, returnvalue
+    b'\xD1\xD0\xD1\x24\x01\xC6'  # getlocal1, getlocal0, getlocal1, pushbyte 1, subtract_i
+    b'\x44\x00\x01\xA0\x48'  # callstatic 0 1, add, returnvalue
+)
+
+
+def test_deep_recursion():
+    machine = VirtualMachine(make_abc_file([sum_code]), memoize_methods=False)
+    assert machine.call_method(0, undefined, 5000) == 12502500
+    assert machine.interpreted_calls == 5001
+    assert machine.pending_frame is None
+
+
+def test_recursion_memoization():
+    machine = VirtualMachine(make_abc_file([sum_code]))
+    assert machine.call_method(0, undefined, 100) == 5050
+    assert machine.call_method(0, undefined, 200) == 20100
+    assert machine.interpreted_calls == 201
+    assert machine.get_memo_statistics()[0].hits == 1
+
+
+def test_stack_overflow(monkeypatch):
+    monkeypatch.setattr(avm2.vm, 'MAX_CALL_DEPTH', 100)
+    machine = VirtualMachine(make_abc_file([sum_code]), memoize_methods=False)
+    assert machine.call_method(0, undefined, 100) == 5050
+    with raises(ASStackOverflowError):
+        machine.call_method(0, undefined, 101)
+
+
+def test_lazy_script_init():
+    machine = VirtualMachine(make_abc_file([
+        b'\xD0\x24\x2A\x68\x01\x47',  # getlocal0, pushbyte 42, initproperty x, returnvoid
+        b'\xD0\x60\x01\x24\x01\xA0\x68\x02\x47',  # getlocal0, getlex x, pushbyte 1, add, initproperty y, returnvoid
+        b'\x60\x02\x48',  # getlex y, returnvalue
+    ], names=['x', 'y'], scripts=[(0, [1]), (1, [2])]))
+    assert machine.name_to_script == {('', 'x'): 0, ('', 'y'): 1}
+    assert not machine.script_objects
+
+    # Touching `y` initialises its script, which touches `x`.
+    assert machine.call_method(2, undefined) == 43
+    assert machine.call_method(2, undefined) == 43
+    assert machine.script_objects[0].properties == {('', 'x'): 42}
+    assert machine.script_objects[1].properties == {('', 'y'): 43}
+    assert machine.interpreted_calls == 4
+    # The second `getlex y` hits the cached global lookup.
+    assert (machine.inline_cache_hits, machine.inline_cache_misses) == (1, 2)
+
+    timings = machine.script_timings
+    assert timings[1].own_time == approx(timings[1].total_time - timings[0].total_time)
+    assert {name for name, _ in machine.get_init_timings()} == {'script x', 'script y'}
+
+
+def test_undefined_global():
+    machine = VirtualMachine(make_abc_file([b'\x60\x01\x48'], names=['x']))  # getlex x, returnvalue
+    with raises(ASReferenceError) as e:
+        machine.call_method(0, undefined)
+    assert e.value.name == ('', 'x')
+    assert e.value.__suppress_context__
+
+
+def test_script_dependencies(machine: VirtualMachine):
+    script_index = machine.class_to_script[machine.lookup_class('engine.debug.ClickLoger')]
+    program = machine.program
+    assert [program.get_script_name(index) for index in program.get_script_dependencies(script_index)] == [
+        'script game.view.gui.tutorial.ITutorialConditionListener',
+        'script starling.animation.IAnimatable',
+    ]
+
+
+def test_failed_script_init(abc_file: ABCFile):
+    machine = VirtualMachine(abc_file)
+    class_index = machine.lookup_class('com.progrestar.framework.ares.core.Frame')
+    script_index = machine.class_to_script[class_index]
+
+    def fail(index: int, script_object: ASObject):
+        init_script(index, script_object)
+        if index == script_index:
+            raise ASThrowException('failed')
+
+    # The script initialiser fails after it has created the class.
+    init_script = machine._init_script
+    machine._init_script = fail
+    with raises(ASThrowException):
+        machine.init_class(class_index)
+    assert script_index not in machine.script_objects
+    assert class_index not in machine.class_objects
+
+    # Both are initialised again.
+    del machine._init_script
+    class_timing = machine.class_timings.pop(class_index)
+    machine.init_class(class_index)
+    assert machine.class_timings[class_index] is not class_timing
+    assert script_index in machine.script_objects
+
+
+def test_isolates():
+    program = Program(make_abc_file([
+        b'\xD0\x24\x2A\x68\x01\x47',  # getlocal0, pushbyte 42, initproperty x, returnvoid
+        b'\x60\x01\x48',  # getlex x, returnvalue
+    ], names=['x'], scripts=[(0, [1])]), compile_methods=False)
+    machine_1 = VirtualMachine(program)
+    machine_2 = VirtualMachine(program)
+    assert machine_1.call_method(1, undefined) == 42
+
+    # The heaps are separate, the code is shared.
+    assert machine_1.script_objects.keys() == {0}
+    assert not machine_2.script_objects
+    assert machine_2.call_method(1, undefined) == 42
+    assert machine_1.script_objects[0] is not machine_2.script_objects[0]
+    assert program.decoded_code.misses == 2
+
+    # Each has its own inline cache of the global lookup by the shared `getlex`.
+    assert machine_1.scope_caches.keys() == machine_2.scope_caches.keys() == {0}
+    assert machine_1.scope_caches[0][2] is machine_1.script_objects[0]
+    assert machine_2.scope_caches[0][2] is machine_2.script_objects[0]
+
+    machine_1.reset()
+    assert not machine_1.scope_caches
+    assert not machine_1.script_objects
+    assert machine_1.interpreted_calls == 0
+    assert machine_1.call_method(1, undefined) == 42
+    assert program.decoded_code.misses == 2
+
+
+def test_isolate_keyword_arguments():
+    with raises(TypeError):
+        VirtualMachine(Program(make_abc_file([b'\x47'])), compile_methods=False)
+
+
+def test_throw():
+    machine = VirtualMachine(make_abc_file([b'\xD1\x03']))  # getlocal1, throw
+    with raises(ASThrowException) as e:
+        machine.call_method(0, undefined, 42)
+    assert e.value.value == 42
+
+
+def test_lazy_machine(machine: VirtualMachine, lazy_abc_file: ABCFile):
+    lazy_machine = VirtualMachine(lazy_abc_file)
+    assert lazy_machine.method_to_body == machine.method_to_body
+    assert lazy_machine.class_to_script == machine.class_to_script
+    assert lazy_machine.name_to_class == machine.name_to_class
+    assert lazy_machine.name_to_method == machine.name_to_method
+    assert lazy_machine.call_method('battle.BattleCore.hitrateIntensity', undefined, 4, 8) == 0.5
+
+
+def test_get_lex_inline_cache(machine: VirtualMachine):
+    get_lex = GetLex(MemoryViewReader(write_int(65)))  # `Object`
+    get_lex.site = machine.program.get_scope_lookup_site(ABCMethodBodyIndex(-1), 0)
+    object_ = ASObject()
+    environment = MethodEnvironment(registers=[], scope_stack=[machine.global_object, object_])
+    hits, misses = machine.inline_cache_hits, machine.inline_cache_misses
+
+    get_lex.execute(machine, environment)
+    get_lex.execute(machine, environment)
+    assert environment.operand_stack.pop() is machine.global_object.get_property(('', 'Object'))
+    assert (machine.inline_cache_hits - hits, machine.inline_cache_misses - misses) == (1, 1)
+
+    # The property is shadowed now.
+    object_.set_property(('', 'Object'), 42)
+    get_lex.execute(machine, environment)
+    assert environment.operand_stack.pop() == 42
+    assert (machine.inline_cache_hits - hits, machine.inline_cache_misses - misses) == (1, 2)
+
+    # Another virtual machine of the program caches its own objects.
+    other_machine = VirtualMachine(machine.program)
+    other_environment = MethodEnvironment(registers=[], scope_stack=[other_machine.global_object])
+    get_lex.execute(other_machine, other_environment)
+    assert other_machine.scope_caches[get_lex.site][2] is other_machine.global_object
+    assert machine.scope_caches[get_lex.site][2] is object_
+    other_machine.reset()
+    assert not other_machine.scope_caches
+
+
+def test_resolved_names(machine: VirtualMachine):
+    assert machine.resolved_names[0] is None
+    assert machine.resolved_names[65].qname == ('', 'Object')
+    assert machine.resolved_names[21].kind == MultinameKind.MULTINAME
+    assert machine.resolved_names[21].name == 'rule'
+    assert machine.resolved_names[21].namespaces[-1] == 'http://adobe.com/AS3/2006/builtin'
+    assert machine.resolved_names[66].pop_name
+    assert not machine.resolved_names[66].pop_namespace
+    assert machine.resolved_names[432].type_indices == (431, 298)
+    assert machine.resolved_names[21].namespaces is machine.resolved_names[66].namespaces
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+from typing import Iterable, List, Sequence, Tuple
+
+from avm2.abc.types import ABCFile
+from avm2.io import MemoryViewReader
+
+
+def write_int(value: int) -> bytes:
+    """
+    Encode variable-length unsigned integer.
+    """
+    result = bytearray()
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            result.append(byte | 0x80)
+        else:
+            result.append(byte)
+            return bytes(result)
+
+
+def write_string(value: str) -> bytes:
+    encoded = value.encode()
+    return write_int(len(encoded)) + encoded
+
+
+def write_s24(value: int) -> bytes:
+    return (value & 0xFFFFFF).to_bytes(3, 'little')
+
+
+# `sum = 0; i = 0; while (i < n) { sum += i; i += 1 }; return sum` where `n` is the first argument.
+loop_code = (
+    b'\x24\x00\xD6'  # pushbyte 0, setlocal2
+    b'\x24\x00\xD7'  # pushbyte 0, setlocal3
+    b'\x10\x09\x00\x00'  # jump +9
+    b'\xD2\xD3\xA0\xD6'  # getlocal2, getlocal3, add, setlocal2
+    b'\xD3\x24\x01\xA0\xD7'  # getlocal3, pushbyte 1, add, setlocal3
+    b'\xD3\xD1\x15\xF1\xFF\xFF'  # getlocal3, getlocal1, iflt -15
+    b'\xD2\x48'  # getlocal2, returnvalue
+)
+
+
+def make_abc_file(
+    codes: Iterable[bytes],
+    param_count: int = 2,
+    local_count: int = 8,
+    max_stack: int = 8,
+    names: Sequence[str] = (),
+    scripts: Iterable[Tuple[int, Iterable[int]]] = (),
+) -> ABCFile:
+    """
+    Make ABC file with a method with the specified code for each of the codes.
+    Multiname `index + 1` is the public qualified name `names[index]`.
+    A script is specified by its initialiser method index and the multiname indices of its slots.
+    """
+    codes = list(codes)
+    scripts = list(scripts)
+    parts: List[bytes] = [
+        b'\x10\x00\x2E\x00',  # minor and major versions
+        b'\x00' * 3,  # integers, unsigned integers and doubles
+    ]
+    if names:
+        parts.extend([
+            write_int(len(names) + 2),
+            write_string(''),
+            *map(write_string, names),
+            b'\x02\x16\x01',  # the public namespace
+            b'\x00',  # namespace sets
+            write_int(len(names) + 1),
+            *(b'\x07\x01' + write_int(index + 2) for index in range(len(names))),
+        ])
+    else:
+        parts.append(b'\x00' * 4)  # strings, namespaces, namespace sets and multinames
+    parts.extend([
+        write_int(len(codes)),
+        (write_int(param_count) + write_int(0) + write_int(0) * param_count + write_int(0) + b'\x00') * len(codes),
+        b'\x00',  # metadata
+        b'\x00',  # classes
+        write_int(len(scripts)),
+    ])
+    for init_index, slots in scripts:
+        slots = list(slots)
+        parts.extend([write_int(init_index), write_int(len(slots))])
+        parts.extend(write_int(name_index) + b'\x00\x00\x00\x00' for name_index in slots)
+    parts.append(write_int(len(codes)))
+    for index, code in enumerate(codes):
+        parts.extend([
+            write_int(index),
+            write_int(max_stack),
+            write_int(local_count),
+            write_int(0),  # init scope depth
+            write_int(1),  # max scope depth
+            write_int(len(code)),
+            code,
+            b'\x00',  # exceptions
+            b'\x00',  # traits
+        ])
+    return ABCFile(MemoryViewReader(b''.join(parts)))
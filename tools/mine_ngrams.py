@@ -0,0 +1,53 @@
+"""
+Count the most frequent instruction n-grams in the method bodies of the SWF files in `data/`.
+N-grams do not cross basic block boundaries, since only those could be fused, see `avm2.fusion`.
+
+Usage: python -m tools.mine_ngrams [max n] [top count]
+"""
+
+from __future__ import annotations
+
+import sys
+from collections import Counter
+from pathlib import Path
+from typing import Iterable, Tuple
+
+from avm2.abc.instructions import decode_code
+from avm2.abc.types import ABCFile
+from avm2.cfg import build_control_flow_graph
+from avm2.io import MemoryViewReader
+from avm2.swf.enums import TagType
+from avm2.swf.parser import parse_swf_file
+from avm2.swf.types import DoABCTag
+
+data_path = Path(__file__).parent.parent / 'data'
+
+
+def read_abc_files(path: Path) -> Iterable[ABCFile]:
+    for tag in parse_swf_file(path, types={TagType.DO_ABC}):
+        yield ABCFile(MemoryViewReader(DoABCTag(tag.raw).abc_file))
+
+
+def mine_ngrams(abc_file: ABCFile, max_n: int) -> Iterable[Tuple[str, ...]]:
+    for method_body in abc_file.method_bodies:
+        code = decode_code(method_body.code)
+        names = [type(instruction).__name__ for instruction in code.instructions]
+        for block in build_control_flow_graph(method_body, code).blocks:
+            for n in range(2, max_n + 1):
+                for start in range(block.start, block.end - n + 1):
+                    yield tuple(names[start:start + n])
+
+
+def main():
+    max_n = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    top_count = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    counter: Counter[Tuple[str, ...]] = Counter()
+    for path in sorted(data_path.glob('*.swf')):
+        for abc_file in read_abc_files(path):
+            counter.update(mine_ngrams(abc_file, max_n))
+    for ngram, count in counter.most_common(top_count):
+        print(f'{count:>8}  {" ".join(ngram)}')
+
+
+if __name__ == '__main__':
+    main()